@@ -1,10 +1,14 @@
+import uuid
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
-from utils.model_loader import load_models
-from utils.preprocessor import preprocess_input
-from utils.predictor import predict_readmission, get_risk_message
+from utils.drift import DriftMonitor, load_reference, PSI_MAJOR, PSI_MODERATE, SCORE_BINS
+from utils.hot_reload import ModelWatcher
+from utils.predictor import predict_cached, get_risk_message
+from utils.prediction_cache import PredictionCache
+from utils import metrics
+from utils.sensitivity import SWEEP_FIELDS, field_values, sensitivity_grid
 
 # Page configuration
 st.set_page_config(
@@ -62,15 +66,42 @@ st.markdown("""
 
 # Load models
 @st.cache_resource
-def load_all_models():
-    return load_models()
+def get_model_watcher():
+    # Loads, warms up and smoke-tests the current release, then swaps in new ones from models/
+    try:
+        return ModelWatcher('models', interval=10.0).start()
+    except Exception as e:
+        st.error(f"Error loading models: {str(e)}")
+        return None
 
-models_data = load_all_models()
+@st.cache_resource
+def get_prediction_cache():
+    # Shared across sessions; keys include the model version so reloads invalidate entries
+    return PredictionCache(max_size=4096, ttl=3600)
+
+@st.cache_resource
+def get_diagnostics_sessions():
+    # Metrics collection is process-wide, so it stays on while any session shows diagnostics.
+    # Sessions closed with the box ticked expire after 30 minutes without a rerun
+    return metrics.SessionLeases(ttl=1800)
+
+@st.cache_resource(max_entries=2)
+def get_drift_monitor(models_version, _preprocessing):
+    # Shared across sessions; compares traffic with models/drift_reference.json when present.
+    # Keyed on the model version: a reload starts a new monitor on the new preprocessing
+    return DriftMonitor(_preprocessing, load_reference('models'))
+
+model_watcher = get_model_watcher()
+prediction_cache = get_prediction_cache()
 
-if models_data is None:
+if model_watcher is None:
     st.error("Failed to load models. Please ensure all model files are in the 'models/' directory.")
     st.stop()
 
+# One version for the whole script run, even if a reload lands midway
+models_data = model_watcher.current
+drift_monitor = get_drift_monitor(models_data.version, models_data['preprocessing'])
+
 # Header
 st.markdown('<div class="main-header">Hospital Readmission Predictor</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-header">Predict 30-day readmission risk using machine learning</div>', unsafe_allow_html=True)
@@ -113,10 +144,13 @@ with st.sidebar:
     """)
     
     st.markdown("---")
-    st.caption("")
+    show_diagnostics = st.checkbox("Show diagnostics", help="Collect and display per-stage timings")
+    session_id = st.session_state.setdefault('session_id', uuid.uuid4().hex)
+    get_diagnostics_sessions().update(session_id, show_diagnostics)
+    st.caption(f"Model version: {models_data.version}")
 
 # Main content
-tab1, tab2 = st.tabs(["Make Prediction", "Model Comparison"])
+tab1, tab2, tab3, tab4 = st.tabs(["Make Prediction", "Model Comparison", "What-If Analysis", "Drift Monitor"])
 
 with tab1:
     st.subheader("Patient Information")
@@ -169,53 +203,57 @@ with tab1:
     with col_model:
         selected_model = st.selectbox(
             "Select Prediction Model",
-            options=['XGBoost (Recommended)', 'Logistic Regression', 'Neural Network'],
-            help="XGBoost has the best performance with optimal threshold tuning"
+            options=['XGBoost (Recommended)', 'Logistic Regression', 'Neural Network', 'Ensemble (All Models)'],
+            help="XGBoost has the best performance with optimal threshold tuning. "
+                 "Ensemble runs all three models in parallel and averages them weighted by ROC-AUC."
         )
     
     with col_button:
         st.markdown("<br>", unsafe_allow_html=True)
         predict_button = st.button("🔮 Predict Readmission Risk", type="primary", use_container_width=True)
     
+    # Prepare user input (also the base case for the What-If tab)
+    user_input = {
+        'age_group': age_group,
+        'gender': gender,
+        'race': race,
+        'primary_diagnosis': primary_diagnosis,
+        'time_in_hospital': time_in_hospital,
+        'num_medications': num_medications,
+        'num_lab_procedures': num_lab_procedures,
+        'num_procedures': 2,  # Default
+        'number_inpatient': number_inpatient,
+        'number_emergency': number_emergency,
+        'number_outpatient': 0,  # Default
+        'hba1c_category': hba1c_category,
+        'diabetes_med': diabetes_med,
+        'num_medications_prescribed': num_medications,
+        'admission_type_id': 1,  # Default: Emergency
+        'discharge_disposition_id': 1,  # Default: Home
+        'admission_source_id': 7  # Default: Emergency Room
+    }
+    
+    # Map model selection to model name
+    model_mapping = {
+        'XGBoost (Recommended)': 'xgboost',
+        'Logistic Regression': 'logistic_regression',
+        'Neural Network': 'neural_network',
+        'Ensemble (All Models)': 'ensemble'
+    }
+    
     # Make prediction
     if predict_button:
-        # Prepare user input
-        user_input = {
-            'age_group': age_group,
-            'gender': gender,
-            'race': race,
-            'primary_diagnosis': primary_diagnosis,
-            'time_in_hospital': time_in_hospital,
-            'num_medications': num_medications,
-            'num_lab_procedures': num_lab_procedures,
-            'num_procedures': 2,  # Default
-            'number_inpatient': number_inpatient,
-            'number_emergency': number_emergency,
-            'number_outpatient': 0,  # Default
-            'hba1c_category': hba1c_category,
-            'diabetes_med': diabetes_med,
-            'num_medications_prescribed': num_medications,
-            'admission_type_id': 1,  # Default: Emergency
-            'discharge_disposition_id': 1,  # Default: Home
-            'admission_source_id': 7  # Default: Emergency Room
-        }
-        
-        # Map model selection to model name
-        model_mapping = {
-            'XGBoost (Recommended)': 'xgboost',
-            'Logistic Regression': 'logistic_regression',
-            'Neural Network': 'neural_network'
-        }
         model_name = model_mapping[selected_model]
         
         try:
-            # Preprocess input
-            with st.spinner("Preprocessing patient data..."):
-                feature_vector = preprocess_input(user_input, models_data['preprocessing'])
+            # The ensemble needs every model; single models only their own entry
+            model_data = models_data if model_name == 'ensemble' else models_data[model_name]
             
-            # Make prediction
+            # Preprocess input and make prediction (reused if this input was already scored)
             with st.spinner("Analyzing readmission risk..."):
-                result = predict_readmission(models_data[model_name], feature_vector, model_name)
+                result = predict_cached(model_data, user_input, model_name,
+                                        models_data['preprocessing'], prediction_cache, explain=True,
+                                        monitor=drift_monitor)
             
             # Display results
             st.markdown("---")
@@ -237,6 +275,7 @@ with tab1:
             
             with col3:
                 st.metric("Model Used", selected_model.split(' ')[0])
+            st.caption(f"Scored by model version {models_data.version}")
             
             # Probability gauge
             fig = go.Figure(go.Indicator(
@@ -261,20 +300,61 @@ with tab1:
             ))
             
             fig.update_layout(height=300)
-            st.plotly_chart(fig, use_container_width=True)
+            with metrics.timer('render_gauge'):
+                st.plotly_chart(fig, use_container_width=True)
             
-            # Model performance
-            st.markdown("### Model Performance Metrics")
-            perf_col1, perf_col2, perf_col3, perf_col4 = st.columns(4)
+            if model_name == 'ensemble':
+                # Per-model breakdown
+                st.markdown("### Individual Model Predictions")
+                member_labels = {
+                    'logistic_regression': 'Logistic Regression',
+                    'xgboost': 'XGBoost (Optimized)',
+                    'neural_network': 'Neural Network'
+                }
+                members_df = pd.DataFrame([
+                    {
+                        'Model': member_labels[name],
+                        'Probability': f"{member['probability']*100:.1f}%",
+                        'Risk Level': member['risk_level'],
+                        'Ensemble Weight': f"{result['weights'][name]:.3f}",
+                        'ROC-AUC': f"{member['model_performance']['roc_auc']:.4f}"
+                    }
+                    for name, member in result['members'].items()
+                ])
+                st.dataframe(members_df, use_container_width=True, hide_index=True)
+            else:
+                # Model performance
+                st.markdown("### Model Performance Metrics")
+                perf_col1, perf_col2, perf_col3, perf_col4 = st.columns(4)
+                
+                with perf_col1:
+                    st.metric("ROC-AUC", f"{result['model_performance']['roc_auc']:.4f}")
+                with perf_col2:
+                    st.metric("F1-Score", f"{result['model_performance']['f1_score']:.4f}")
+                with perf_col3:
+                    st.metric("Precision", f"{result['model_performance']['precision']:.4f}")
+                with perf_col4:
+                    st.metric("Recall", f"{result['model_performance']['recall']:.4f}")
             
-            with perf_col1:
-                st.metric("ROC-AUC", f"{result['model_performance']['roc_auc']:.4f}")
-            with perf_col2:
-                st.metric("F1-Score", f"{result['model_performance']['f1_score']:.4f}")
-            with perf_col3:
-                st.metric("Precision", f"{result['model_performance']['precision']:.4f}")
-            with perf_col4:
-                st.metric("Recall", f"{result['model_performance']['recall']:.4f}")
+            if result.get('explanation'):
+                # Feature attributions, grouped back onto the form fields
+                st.markdown("### What Drives This Prediction")
+                explanation = result['explanation']
+                top = [c for c in explanation['contributions'] if abs(c['value']) >= 1e-6][:8][::-1]
+                fig = go.Figure(go.Bar(
+                    x=[c['value'] for c in top],
+                    y=[c['label'] for c in top],
+                    orientation='h',
+                    marker_color=['#d9534f' if c['value'] > 0 else '#5cb85c' for c in top]
+                ))
+                fig.update_layout(
+                    height=320,
+                    xaxis_title="Contribution to log-odds of readmission",
+                    margin=dict(l=10, r=10, t=10, b=10)
+                )
+                st.plotly_chart(fig, use_container_width=True)
+                st.caption("Red bars raise the predicted risk, green bars lower it. "
+                           f"Baseline log-odds: {explanation['base_value']:+.3f}.")
         
         except Exception as e:
             st.error(f"Prediction failed: {str(e)}")
@@ -344,4 +424,206 @@ with tab2:
     
     with info_col2:
         st.metric("Test Set Size", f"{dataset_info['test_size']:,}")
-        st.metric("Engineered Features", f"{dataset_info['n_features_engineered']}")
\ No newline at end of file
+        st.metric("Engineered Features", f"{dataset_info['n_features_engineered']}")
+
+with tab3:
+    st.subheader("What-If Analysis")
+    st.markdown("See how the predicted risk for the patient on the **Make Prediction** tab changes "
+                "as one or two of their values vary. The whole grid is scored in one batch per model.")
+    
+    sweep_fields = st.multiselect(
+        "Fields to vary (one or two)",
+        options=list(SWEEP_FIELDS),
+        default=['time_in_hospital', 'number_inpatient'],
+        max_selections=2,
+        format_func=lambda field: SWEEP_FIELDS[field][0]
+    )
+    
+    sweep_models = st.multiselect(
+        "Models",
+        options=list(model_mapping),
+        default=['XGBoost (Recommended)']
+    )
+    
+    sweeps = {}
+    range_cols = st.columns(2)
+    for col, field in zip(range_cols, sweep_fields):
+        label, low, high, step = SWEEP_FIELDS[field]
+        with col:
+            start, stop = st.slider(label, low, high, (low, high), step=step, key=f"sweep_{field}")
+        sweeps[field] = field_values(field, start, stop)
+    
+    if st.button("📈 Run What-If Analysis", disabled=not (sweep_fields and sweep_models)):
+        model_names = [model_mapping[label] for label in sweep_models]
+        try:
+            with st.spinner("Scoring variations..."):
+                analysis = sensitivity_grid(models_data, user_input, sweeps, model_names)
+            
+            n_points = len(analysis['grid'])
+            st.caption(f"{n_points:,} variations × {len(model_names)} model(s)")
+            
+            if len(sweep_fields) == 1:
+                # One field: risk curve per model
+                field = sweep_fields[0]
+                fig = go.Figure()
+                for label, name in zip(sweep_models, model_names):
+                    fig.add_trace(go.Scatter(
+                        x=sweeps[field],
+                        y=analysis['surfaces'][name] * 100,
+                        mode='lines+markers',
+                        name=label
+                    ))
+                fig.add_vline(x=user_input[field], line_dash="dash", line_color="gray")
+                fig.add_hrect(y0=30, y1=60, fillcolor="lightyellow", opacity=0.3, line_width=0)
+                fig.add_hrect(y0=60, y1=100, fillcolor="lightcoral", opacity=0.2, line_width=0)
+                fig.update_layout(
+                    xaxis_title=SWEEP_FIELDS[field][0],
+                    yaxis_title="Readmission Probability (%)",
+                    yaxis_range=[0, 100],
+                    height=450
+                )
+                st.plotly_chart(fig, use_container_width=True)
+            else:
+                # Two fields: one heatmap per model
+                x_field, y_field = sweep_fields
+                for label, name in zip(sweep_models, model_names):
+                    fig = go.Figure(go.Heatmap(
+                        z=analysis['surfaces'][name] * 100,
+                        x=sweeps[y_field],
+                        y=sweeps[x_field],
+                        zmin=0,
+                        zmax=100,
+                        colorscale=[[0, 'lightgreen'], [0.3, 'lightyellow'], [0.6, 'lightcoral'], [1, 'darkred']],
+                        colorbar=dict(title="Risk (%)")
+                    ))
+                    fig.add_trace(go.Scatter(
+                        x=[user_input[y_field]],
+                        y=[user_input[x_field]],
+                        mode='markers',
+                        marker=dict(symbol='x', size=12, color='black'),
+                        name='Current patient',
+                        showlegend=False
+                    ))
+                    fig.update_layout(
+                        title=label,
+                        xaxis_title=SWEEP_FIELDS[y_field][0],
+                        yaxis_title=SWEEP_FIELDS[x_field][0],
+                        height=450
+                    )
+                    st.plotly_chart(fig, use_container_width=True)
+            
+            with st.expander("Grid values"):
+                st.dataframe(analysis['grid'], use_container_width=True, hide_index=True)
+        
+        except Exception as e:
+            st.error(f"What-if analysis failed: {str(e)}")
+
+with tab4:
+    st.subheader("Input and Score Drift")
+    snapshot = drift_monitor.snapshot()
+    
+    if snapshot['rows'] == 0:
+        st.info("No predictions observed yet. Drift statistics accumulate as patients are scored.")
+    else:
+        if snapshot['reference'] == 'profile':
+            st.caption(f"{snapshot['rows']:,} scored inputs compared with a reference profile of "
+                       f"{snapshot['reference_rows']:,} rows. PSI of {PSI_MODERATE} or more is a moderate "
+                       f"shift, {PSI_MAJOR} or more a major one.")
+        else:
+            st.caption(f"{snapshot['rows']:,} scored inputs compared with the training moments "
+                       f"({snapshot['reference_rows']:,} rows). Export a reference profile "
+                       "(python -m utils.drift export) to add PSI and KS.")
+        
+        features_df = pd.DataFrame([
+            {
+                'Feature': feature['feature'],
+                'Mean': feature['mean'],
+                'Training Mean': feature['reference_mean'],
+                'Shift (SD)': feature['mean_shift'],
+                'SD Ratio': feature['std_ratio'],
+                'Median': feature['p50'],
+                'p95': feature['p95'],
+                'PSI': feature.get('psi'),
+                'KS': feature.get('ks'),
+                'Status': feature.get('status', '')
+            }
+            for feature in snapshot['features']
+        ])
+        features_df = features_df.reindex(features_df['Shift (SD)'].abs().sort_values(ascending=False).index)
+        st.markdown("**Numeric features** (largest mean shift first)")
+        st.dataframe(features_df.round(3), use_container_width=True, hide_index=True)
+        
+        st.markdown("**Categorical inputs**")
+        st.dataframe(pd.DataFrame([
+            {
+                'Input': group['group'],
+                'Frequencies': ', '.join(f"{name}: {value:.1%}" for name, value in group['frequencies'].items()),
+                'PSI': group.get('psi'),
+                'Status': group.get('status', '')
+            }
+            for group in snapshot['one_hot']
+        ]), use_container_width=True, hide_index=True)
+        
+        st.markdown("**Predicted probabilities**")
+        bin_labels = [f"{100 * i // SCORE_BINS}-{100 * (i + 1) // SCORE_BINS}%" for i in range(SCORE_BINS)]
+        for name, scores in snapshot['scores'].items():
+            fig = go.Figure(go.Bar(x=bin_labels, y=np.asarray(scores['histogram']) / max(scores['count'], 1),
+                                   name='Live'))
+            if 'reference_histogram' in scores:
+                reference = np.asarray(scores['reference_histogram'], dtype=np.float64)
+                fig.add_trace(go.Bar(x=bin_labels, y=reference / max(reference.sum(), 1), name='Reference'))
+            title = f"{name} (n={scores['count']:,}, mean {scores['mean']:.1%}"
+            title += f", PSI {scores['psi']:.3f})" if scores.get('psi') is not None else ")"
+            fig.update_layout(title=title, yaxis_title="Share of predictions", yaxis_tickformat='.0%',
+                              barmode='group', height=300)
+            st.plotly_chart(fig, use_container_width=True)
+
+# Diagnostics panel
+if show_diagnostics:
+    st.markdown("---")
+    with st.expander("Diagnostics: stage timings", expanded=True):
+        snapshot = metrics.snapshot()
+        
+        if snapshot['stages']:
+            stages_df = pd.DataFrame([
+                {
+                    'Stage': stage['stage'],
+                    'Model': stage['labels'].get('model', ''),
+                    'Calls': stage['count'],
+                    'Mean (ms)': round(stage['mean_ms'], 3),
+                    'p95 (ms)': round(stage['p95_ms'], 3),
+                    'Max (ms)': round(stage['max_ms'], 3),
+                    'Total (ms)': round(stage['total_ms'], 3)
+                }
+                for stage in snapshot['stages']
+            ])
+            st.dataframe(stages_df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No timings recorded yet. Make a prediction to populate this panel.")
+        
+        if snapshot['counters']:
+            st.markdown("**Counters**")
+            st.dataframe(pd.DataFrame([
+                {
+                    'Counter': counter['name'],
+                    'Labels': ', '.join(f"{k}={v}" for k, v in counter['labels'].items()),
+                    'Value': counter['value']
+                }
+                for counter in snapshot['counters']
+            ]), use_container_width=True, hide_index=True)
+        
+        st.markdown("**Prediction cache**")
+        st.json(prediction_cache.stats())
+        
+        st.markdown("**Model reloads**")
+        st.dataframe(pd.DataFrame([
+            {
+                'Time': pd.Timestamp(event['time'], unit='s'),
+                'Version': event['version'] or '',
+                'Status': event['status'],
+                'Detail': event.get('error') or ', '.join(
+                    f"{name} drift {drift:.4f}" for name, drift in event.get('max_drift', {}).items()
+                )
+            }
+            for event in model_watcher.history
+        ]), use_container_width=True, hide_index=True)
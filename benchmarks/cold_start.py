@@ -0,0 +1,51 @@
+"""
+Cold-start latency and peak RSS of model loading
+
+Each scenario runs in a fresh interpreter so import costs (TensorFlow in
+particular) are included. Run from the repository root:
+
+    python benchmarks/cold_start.py
+"""
+
+import json
+import subprocess
+import sys
+
+SCENARIOS = {
+    'registry_only': [],
+    'xgboost': ['xgboost'],
+    'logistic_regression': ['logistic_regression'],
+    'all_models': ['logistic_regression', 'xgboost', 'neural_network'],
+}
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+from utils.model_loader import load_models
+models = load_models()
+for name in {names!r}:
+    models[name]
+print(json.dumps({{
+    'seconds': time.perf_counter() - start,
+    'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'load_times': models.load_times,
+    'tensorflow_imported': 'tensorflow' in sys.modules,
+}}))
+"""
+
+
+def run_scenario(names):
+    proc = subprocess.run(
+        [sys.executable, '-c', CHILD.format(names=names)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    results = {name: run_scenario(names) for name, names in SCENARIOS.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
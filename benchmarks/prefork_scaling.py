@@ -0,0 +1,122 @@
+"""
+Throughput scaling and per-worker memory of pre-fork vs independently loaded workers
+
+Pre-fork workers are forked from a parent that loaded the models once
+(utils.prefork.PreforkPool); naive workers are spawned fresh and each call
+load_models themselves. The same synthetic records are scored in chunks by
+1..N workers of each kind. Memory per worker is read from
+/proc/<pid>/smaps_rollup (Linux): PSS splits shared pages between the processes
+mapping them, USS counts only pages private to the worker. Run from the
+repository root:
+
+    python benchmarks/prefork_scaling.py --workers 1 2 4 --rows 200000
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import generate_frame  # noqa: E402
+from utils.model_loader import load_models  # noqa: E402
+from utils.prefork import PreforkPool, score_records, MODEL_NAMES  # noqa: E402
+
+# Models loaded by each naive worker in its initializer
+_worker_models = None
+
+
+def _naive_init(models_dir, use_bundle):
+    global _worker_models
+    _worker_models = load_models(models_dir, use_bundle=use_bundle)
+    _worker_models.warm_up()
+
+
+def _naive_score(args):
+    return score_records(_worker_models, *args)
+
+
+def _rollup(pid):
+    """PSS and USS in MB for one process, or None where /proc is unavailable"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        'pss_mb': fields.get('Pss', 0) / 1024,
+        'uss_mb': (fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024,
+        'rss_mb': fields.get('Rss', 0) / 1024,
+    }
+
+
+def _memory(pids):
+    samples = [m for m in (_rollup(pid) for pid in pids) if m is not None]
+    if not samples:
+        return None
+    return {key: sum(s[key] for s in samples) / len(samples) for key in samples[0]}
+
+
+def _run(map_fn, chunks):
+    start = time.perf_counter()
+    n_rows = sum(len(result['prediction']) for result in map_fn(chunks))
+    elapsed = time.perf_counter() - start
+    return n_rows / elapsed
+
+
+def bench_prefork(models_data, chunks, workers):
+    with PreforkPool(models_data, workers, MODEL_NAMES) as pool:
+        _run(lambda c: pool.imap(score_records, c[:workers]), chunks)  # warm-up
+        rows_per_second = _run(lambda c: pool.imap(score_records, c), chunks)
+        memory = _memory(pool.pids)
+    return {'rows_per_second': rows_per_second, 'memory_per_worker': memory}
+
+
+def bench_naive(models_dir, use_bundle, chunks, workers):
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(workers, initializer=_naive_init, initargs=(models_dir, use_bundle)) as pool:
+        _run(lambda c: pool.imap(_naive_score, c[:workers]), chunks)  # warm-up
+        rows_per_second = _run(lambda c: pool.imap(_naive_score, c), chunks)
+        memory = _memory([process.pid for process in pool._pool])
+    return {'rows_per_second': rows_per_second, 'memory_per_worker': memory}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default='xgboost', choices=MODEL_NAMES + ['ensemble'])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, nargs='+', default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--legacy', action='store_true', help="Load the individual model files instead of the bundle")
+    args = parser.parse_args()
+
+    frame = generate_frame(args.rows, seed=0)
+    chunks = [(frame.iloc[i:i + args.chunk_size], args.model) for i in range(0, args.rows, args.chunk_size)]
+
+    models_data = load_models(args.models_dir, use_bundle=not args.legacy)
+    parent_memory = _rollup(os.getpid())
+
+    report = {'cpu_count': os.cpu_count(), 'model': args.model, 'rows': args.rows,
+              'parent_memory': parent_memory, 'prefork': {}, 'naive': {}}
+    for workers in args.workers:
+        report['prefork'][str(workers)] = bench_prefork(models_data, chunks, workers)
+        report['naive'][str(workers)] = bench_naive(args.models_dir, not args.legacy, chunks, workers)
+
+    base = report['prefork'][str(args.workers[0])]['rows_per_second']
+    for workers in args.workers:
+        entry = report['prefork'][str(workers)]
+        entry['speedup'] = entry['rows_per_second'] / base
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
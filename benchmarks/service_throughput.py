@@ -0,0 +1,101 @@
+"""
+Throughput of the HTTP scoring service under concurrent load
+
+Requests are driven through the ASGI app in-process (no sockets), so the numbers
+isolate micro-batching and model cost from network overhead. Run from the
+repository root:
+
+    python benchmarks/service_throughput.py --requests 2000 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import generate_records  # noqa: E402
+from utils.model_loader import load_models  # noqa: E402
+from utils.service import ScoringService  # noqa: E402
+
+
+async def asgi_request(app, method, path, payload=None):
+    """Send one request to an ASGI app and return (status, decoded JSON body)"""
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'headers': [], 'query_string': b''}
+    received = False
+    response = {}
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] = message['body']
+
+    await app(scope, receive, send)
+    return response['status'], json.loads(response['body'])
+
+
+async def run_load(app, model, n_requests, concurrency, seed=0):
+    inputs = generate_records(n_requests, seed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_input):
+        async with semaphore:
+            status, _ = await asgi_request(app, 'POST', '/predict', {'model': model, 'input': user_input})
+            return status
+
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(one(x) for x in inputs))
+    elapsed = time.perf_counter() - start
+    return {
+        'requests_per_second': n_requests / elapsed,
+        'errors': sum(s != 200 for s in statuses),
+    }
+
+
+async def main_async(args):
+    models = load_models()
+    models.warm_up([args.model])
+
+    # max_batch_size=1 disables coalescing and serves as the baseline
+    configs = [('unbatched', 0.0, 1)] + [(f'window_{w}ms', w, args.max_batch_size) for w in args.windows]
+
+    report = {}
+    for label, window_ms, max_batch_size in configs:
+        app = ScoringService(models, model_names=[args.model], window_ms=window_ms,
+                             max_batch_size=max_batch_size, warm_up=False)
+        status, ready = await asgi_request(app, 'GET', '/ready')
+        assert status == 200, ready
+        result = await run_load(app, args.model, args.requests, args.concurrency)
+        batcher = app.batchers[args.model]
+        result['mean_batch_size'] = batcher.rows / max(batcher.batches, 1)
+        report[label] = result
+        for b in app.batchers.values():
+            await b.close()
+
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--model', default='xgboost')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--windows', type=float, nargs='+', default=[0.0, 2.0, 5.0])
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+End-to-end latency and throughput suite for the scoring stack
+
+Times model loading, preprocessing, per-model inference, reduced-precision
+scoring and cohort reporting at several batch sizes, reports p50/p95/p99 latency, rows/s and peak traced
+memory as JSON, and compares against a stored baseline. Run from the
+repository root:
+
+    python benchmarks/suite.py                      # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --update-baseline    # record a new baseline
+    python benchmarks/suite.py --output results.json --tolerance 0.5
+
+Exits with status 1 when any p50 latency is more than --tolerance slower than
+the baseline and by more than --min-delta-ms, so microsecond-scale jitter on a
+busy machine does not fail the run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic import generate_frame, generate_records  # noqa: E402
+from utils.model_loader import load_models, MODEL_FILES  # noqa: E402
+from utils.preprocessor import preprocess_input, preprocess_batch, preprocess_sparse  # noqa: E402
+from utils.precision import PRECISIONS, reduced_models  # noqa: E402
+from utils.predictor import predict_batch  # noqa: E402
+from utils.cohort import stratify, threshold_sweep, ward_summary  # noqa: E402
+
+BATCH_SIZES = [1, 64, 4096, 100000]
+MODEL_NAMES = list(MODEL_FILES)
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+# Models with a reduced-precision path of their own, and the batch sizes it is meant for
+REDUCED_MODELS = ['logistic_regression', 'neural_network']
+REDUCED_BATCH_SIZES = [n for n in BATCH_SIZES if n >= 4096]
+
+# Total rows to push through each (stage, batch size) pair, bounded below and above
+TARGET_ROWS = 200000
+MIN_REPEATS = 3
+MAX_REPEATS = 300
+
+
+def _repeats(batch_size):
+    return int(np.clip(TARGET_ROWS // batch_size, MIN_REPEATS, MAX_REPEATS))
+
+
+def measure(fn, rows_per_call, repeats):
+    """Time repeated calls and trace peak memory of one extra call"""
+    fn()  # warm-up
+
+    times = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times[i] = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(times, [50, 95, 99]) * 1000
+    return {
+        'rows': rows_per_call,
+        'repeats': repeats,
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'rows_per_second': float(rows_per_call / np.median(times)),
+        'peak_traced_mb': peak / 2**20,
+    }
+
+
+def bench_loading(models_data):
+    results = {}
+    for name in MODEL_NAMES:
+        def load():
+            # Deserialize only the model, bypassing the registry's cached entry
+            models_data._load(name)
+        results[name] = measure(load, 1, MIN_REPEATS)
+    return results
+
+
+def bench_preprocessing(models_data, frames, records):
+    pipeline = models_data['preprocessing']
+    results = {}
+    for batch_size in BATCH_SIZES:
+        if batch_size == 1:
+            record = records[0]
+            fn = lambda: preprocess_input(record, pipeline)  # noqa: E731
+        else:
+            frame = frames[batch_size]
+            fn = lambda: preprocess_batch(frame, pipeline)  # noqa: E731
+        results[str(batch_size)] = measure(fn, batch_size, _repeats(batch_size))
+    return results
+
+
+def bench_inference(models_data, matrices):
+    results = {}
+    for name in MODEL_NAMES:
+        model_data = models_data[name]
+        results[name] = {}
+        for batch_size in BATCH_SIZES:
+            X = matrices[batch_size]
+            fn = lambda: predict_batch(model_data, X, name)  # noqa: E731
+            results[name][str(batch_size)] = measure(fn, batch_size, _repeats(batch_size))
+    return results
+
+
+def bench_precision(models_data, frames):
+    """preprocess_sparse, then inference on its batches for each reduced precision"""
+    pipeline = models_data['preprocessing']
+    results = {'preprocessing': {}}
+    batches = {}
+    for batch_size in REDUCED_BATCH_SIZES:
+        frame = frames[batch_size]
+        fn = lambda: preprocess_sparse(frame, pipeline)  # noqa: E731
+        results['preprocessing'][str(batch_size)] = measure(fn, batch_size, _repeats(batch_size))
+        batches[batch_size] = fn()
+
+    for precision in PRECISIONS[1:]:
+        reduced = reduced_models(models_data, precision, REDUCED_MODELS)
+        results[precision] = {}
+        for name in REDUCED_MODELS:
+            results[precision][name] = {}
+            for batch_size in REDUCED_BATCH_SIZES:
+                batch = batches[batch_size]
+                fn = lambda: predict_batch(reduced[name], batch, name)  # noqa: E731
+                results[precision][name][str(batch_size)] = measure(fn, batch_size, _repeats(batch_size))
+    return results
+
+
+def bench_cohort(models_data, matrices):
+    """Band counts, threshold sweep and per-ward summary over the largest batch"""
+    batch_size = BATCH_SIZES[-1]
+    result = predict_batch(models_data['xgboost'], matrices[batch_size], 'xgboost')
+    probability = result['probability']
+    rng = np.random.default_rng(0)
+    labels = rng.random(batch_size) < probability
+    wards = rng.integers(0, 40, batch_size)
+
+    def report():
+        stratify(probability)
+        threshold_sweep(probability, labels)
+        ward_summary(probability, wards, labels, result['prediction'])
+
+    return {str(batch_size): measure(report, batch_size, _repeats(batch_size))}
+
+
+def run_suite():
+    records = generate_records(1, seed=0)
+    frames = {n: generate_frame(n, seed=n) for n in BATCH_SIZES}
+
+    models_data = load_models()
+    models_data.warm_up()
+    matrices = {n: preprocess_batch(frames[n], models_data['preprocessing']) for n in BATCH_SIZES}
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'loading': bench_loading(models_data),
+        'preprocessing': bench_preprocessing(models_data, frames, records),
+        'inference': bench_inference(models_data, matrices),
+        'precision': bench_precision(models_data, frames),
+        'cohort': bench_cohort(models_data, matrices),
+    }
+
+
+def _flatten(results, prefix=''):
+    """Yield (path, stats) for every measured entry"""
+    for key, value in results.items():
+        if key == 'environment':
+            continue
+        path = f'{prefix}/{key}' if prefix else key
+        if isinstance(value, dict) and 'p50_ms' in value:
+            yield path, value
+        elif isinstance(value, dict):
+            yield from _flatten(value, path)
+
+
+def compare(results, baseline, tolerance, min_delta_ms=0.0):
+    """List of human-readable regressions beyond tolerance"""
+    base = dict(_flatten(baseline))
+    regressions = []
+    for path, stats in _flatten(results):
+        if path not in base:
+            continue
+        ref = base[path]['p50_ms']
+        slower = stats['p50_ms'] - ref
+        if ref > 0 and stats['p50_ms'] > ref * (1 + tolerance) and slower > min_delta_ms:
+            regressions.append(
+                f"{path}: p50 {stats['p50_ms']:.3f} ms vs baseline {ref:.3f} ms "
+                f"({stats['p50_ms'] / ref - 1:+.0%})"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring stack benchmark suite")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="Write results as the new baseline")
+    parser.add_argument('--output', help="Also write results JSON to this path")
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help="Allowed fractional p50 slowdown before failing (default: 1.0, i.e. 2x)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.1,
+                        help="Ignore slowdowns smaller than this many ms (default: 0.1)")
+    args = parser.parse_args(argv)
+
+    results = run_suite()
+    text = json.dumps(results, indent=2)
+    print(text)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            f.write(text + '\n')
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("PERFORMANCE REGRESSIONS:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+
+    print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""
+Synthetic user_input records for benchmarks
+
+Categorical fields cycle through every value the app offers plus the values
+preprocess_input treats specially (remapped, baseline or unknown categories),
+and some records omit fields so the default branches run too.
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORIES = {
+    'age_group': ['Age_0_30', 'Age_30_60', 'Age_60_plus'],
+    'gender': ['Male', 'Female', 'Unknown/Invalid'],
+    'race': ['Caucasian', 'AfricanAmerican', 'Asian', 'Hispanic', 'Other', 'Unknown'],
+    'primary_diagnosis': ['Circulatory', 'Diabetes', 'Respiratory', 'Digestive', 'Injury',
+                          'Musculoskeletal', 'Genitourinary', 'Neoplasms', 'Other'],
+    'hba1c_category': ['No_HbA1c_Test', 'Normal_HbA1c', 'High_HbA1c_MedChanged', 'High_HbA1c_NoMedChange'],
+    'diabetes_med': ['Yes', 'No'],
+}
+
+# (low, high) inclusive, wide enough to hit both sides of the derived-feature cut-offs
+NUMERIC_RANGES = {
+    'time_in_hospital': (1, 14),
+    'num_medications': (0, 50),
+    'num_lab_procedures': (0, 100),
+    'num_procedures': (0, 6),
+    'number_inpatient': (0, 20),
+    'number_emergency': (0, 20),
+    'number_outpatient': (0, 10),
+    'admission_type_id': (1, 8),
+    'discharge_disposition_id': (1, 28),
+    'admission_source_id': (1, 25),
+}
+
+MISSING_RATE = 0.05
+
+
+def generate_frame(n, seed=0):
+    """DataFrame of n complete records (every column present)"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for key, values in CATEGORIES.items():
+        # Offset cycling guarantees every category appears once n >= len(values)
+        idx = (np.arange(n) + rng.integers(len(values))) % len(values)
+        columns[key] = np.asarray(values, dtype=object)[rng.permutation(idx)]
+    for key, (low, high) in NUMERIC_RANGES.items():
+        columns[key] = rng.integers(low, high + 1, size=n)
+    return pd.DataFrame(columns)
+
+
+def generate_records(n, seed=0):
+    """List of n user_input dicts, a few with fields left out to exercise defaults"""
+    frame = generate_frame(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    drop = rng.random((n, frame.shape[1])) < MISSING_RATE
+    keys = list(frame.columns)
+    records = []
+    for i, row in enumerate(frame.itertuples(index=False, name=None)):
+        records.append({
+            key: (value.item() if hasattr(value, 'item') else value)
+            for key, value, skip in zip(keys, row, drop[i]) if not skip
+        })
+    return records
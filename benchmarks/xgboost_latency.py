@@ -0,0 +1,60 @@
+"""
+Single-row and small-batch latency of the compiled XGBoost tree evaluator
+against the native XGBClassifier.predict_proba path
+
+    python benchmarks/xgboost_latency.py
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.model_loader import load_models  # noqa: E402
+
+BATCH_SIZES = [1, 16, 64, 256]
+N_CALLS = 500
+
+
+def _latencies(fn, X, batch_size, n_calls):
+    rng = np.random.default_rng(0)
+    times = np.empty(n_calls)
+    for i in range(n_calls):
+        start = rng.integers(0, len(X) - batch_size + 1)
+        batch = X[start:start + batch_size]
+        t0 = time.perf_counter()
+        fn(batch)
+        times[i] = time.perf_counter() - t0
+    return times
+
+
+def main():
+    models = load_models()
+    xgb = models['xgboost']
+    native = xgb['model']
+    compiled = xgb['compiled_model']
+
+    # Random rows in the scaled feature space exercise both branches of most splits
+    X = np.random.default_rng(42).normal(size=(10000, len(models['preprocessing']['feature_names'])))
+
+    expected = native.predict_proba(X)[:, 1]
+    actual = compiled.predict_proba(X)[:, 1]
+
+    report = {'max_abs_diff': float(np.abs(expected - actual).max()), 'latency_us': {}}
+    for batch_size in BATCH_SIZES:
+        n_calls = max(20, N_CALLS // batch_size)
+        row = {}
+        for label, fn in [('native', native.predict_proba), ('compiled', compiled.predict_proba)]:
+            t = _latencies(fn, X, batch_size, n_calls) * 1e6
+            row[label] = {'p50': float(np.percentile(t, 50)), 'p99': float(np.percentile(t, 99))}
+        report['latency_us'][batch_size] = row
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from utils.model_loader import open_models
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+
+CATEGORIES = {
+    'age_group': ['Age_0_30', 'Age_30_60', 'Age_60_plus'],
+    'gender': ['Male', 'Female'],
+    'race': ['Caucasian', 'AfricanAmerican', 'Asian', 'Hispanic', 'Other'],
+    'primary_diagnosis': ['Circulatory', 'Diabetes', 'Respiratory', 'Digestive', 'Injury',
+                          'Musculoskeletal', 'Genitourinary', 'Neoplasms', 'Other'],
+    'hba1c_category': ['No_HbA1c_Test', 'Normal_HbA1c', 'High_HbA1c_MedChanged', 'High_HbA1c_NoMedChange'],
+    'diabetes_med': ['Yes', 'No'],
+}
+
+NUMERIC = {
+    'admission_type_id': (1, 8),
+    'discharge_disposition_id': (1, 28),
+    'admission_source_id': (1, 25),
+    'time_in_hospital': (1, 14),
+    'num_lab_procedures': (0, 100),
+    'num_procedures': (0, 6),
+    'num_medications': (0, 50),
+    'number_outpatient': (0, 5),
+    'number_emergency': (0, 20),
+    'number_inpatient': (0, 20),
+    'number_diagnoses': (1, 16),
+}
+
+
+def random_records(n, seed=0):
+    """Valid user_input dicts covering every category, with some fields left at their defaults"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(n):
+        record = {key: rng.choice(values) for key, values in CATEGORIES.items()}
+        record.update({key: rng.randint(low, high) for key, (low, high) in NUMERIC.items()})
+        for key in list(record):
+            if rng.random() < 0.1:
+                del record[key]
+        records.append(record)
+    return records
+
+
+@pytest.fixture(scope='session')
+def records():
+    return random_records(500)
+
+
+@pytest.fixture(scope='session')
+def legacy_models():
+    """Models loaded from the individual .pkl/.npz/.json files"""
+    return open_models(MODELS_DIR, use_bundle=False)
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    """Writable copy of the models directory"""
+    path = tmp_path / 'models'
+    shutil.copytree(MODELS_DIR, path)
+    return str(path)
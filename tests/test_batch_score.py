@@ -0,0 +1,53 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from utils.batch_score import score_file
+
+from conftest import random_records
+
+
+NOTES = [None] * 50 + [f'n{i}' if i % 3 else None for i in range(70)]
+
+
+@pytest.fixture
+def encounters():
+    """Records whose 'note' column is empty for the whole first chunk"""
+    frame = pd.DataFrame(random_records(120, seed=4))
+    frame.insert(0, 'encounter_id', range(len(frame)))
+    frame['note'] = NOTES
+    return frame
+
+
+@pytest.mark.parametrize('input_suffix', ['.csv', '.parquet'])
+def test_parquet_output_keeps_one_schema_across_chunks(tmp_path, legacy_models, encounters, input_suffix):
+    input_path, output_path = str(tmp_path / f'in{input_suffix}'), str(tmp_path / 'out.parquet')
+    if input_suffix == '.csv':
+        encounters.to_csv(input_path, index=False)
+        id_type = note_type = pa.string()
+    else:
+        encounters.to_parquet(input_path, index=False)
+        schema = pq.read_schema(input_path)
+        id_type, note_type = schema.field('encounter_id').type, schema.field('note').type
+
+    n_rows, _ = score_file(input_path, output_path, ['xgboost'], legacy_models, chunk_size=50,
+                           keep_columns=['encounter_id', 'note'])
+    out = pq.read_table(output_path)
+
+    assert n_rows == 120 and out.num_rows == 120
+    assert out.schema.field('encounter_id').type == id_type
+    assert out.schema.field('note').type == note_type
+    assert out.column('note').to_pylist() == NOTES
+    assert out.column('model_version').to_pylist() == [legacy_models.version] * 120
+
+
+def test_csv_output_records_model_version(tmp_path, legacy_models, encounters):
+    input_path, output_path = str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv')
+    encounters.to_csv(input_path, index=False)
+    score_file(input_path, output_path, ['xgboost'], legacy_models, chunk_size=50, keep_columns=['encounter_id'],
+               precision='float32')
+    out = pd.read_csv(output_path)
+
+    assert out.columns[:2].tolist() == ['encounter_id', 'model_version']
+    assert (out['model_version'] == f'{legacy_models.version}-float32').all()
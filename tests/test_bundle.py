@@ -0,0 +1,72 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from utils.bundle import Bundle, export_bundle
+from utils.model_loader import BundleRegistry, ModelRegistry, open_models, source_digests
+from utils.predictor import predict_batch
+from utils.preprocessor import preprocess_batch
+
+from conftest import MODELS_DIR, random_records
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network']
+
+
+@pytest.fixture(scope='module')
+def bundled_models():
+    registry = open_models(MODELS_DIR)
+    assert isinstance(registry, BundleRegistry)
+    return registry
+
+
+def test_committed_bundle_matches_its_sources():
+    bundle = Bundle.open(os.path.join(MODELS_DIR, 'readmission_bundle.npz'), verify=True)
+    assert bundle.stale_sources(source_digests(MODELS_DIR)) == []
+
+
+def test_bundle_preprocessing_matches_legacy(records, legacy_models, bundled_models):
+    np.testing.assert_array_equal(
+        preprocess_batch(records, bundled_models['preprocessing']),
+        preprocess_batch(records, legacy_models['preprocessing']),
+    )
+
+
+@pytest.mark.parametrize('name', MODEL_NAMES)
+@pytest.mark.parametrize('rows', [1, 64, 2000])
+def test_bundle_predictions_match_legacy(legacy_models, bundled_models, name, rows):
+    # Small batches take the compiled tree path for XGBoost, large ones the booster
+    X = preprocess_batch(random_records(rows, seed=rows), legacy_models['preprocessing'])
+    expected = predict_batch(legacy_models[name], X, name)
+    actual = predict_batch(bundled_models[name], X, name)
+
+    np.testing.assert_allclose(actual['probability'], expected['probability'], rtol=0, atol=1e-9)
+    np.testing.assert_array_equal(actual['prediction'], expected['prediction'])
+    np.testing.assert_array_equal(actual['risk_level'], expected['risk_level'])
+
+
+def test_stale_bundle_is_refused(models_dir):
+    path = os.path.join(models_dir, 'xgboost_metadata.json')
+    with open(path) as f:
+        metadata = json.load(f)
+    metadata['optimal_threshold'] = 0.4
+    with open(path, 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    with pytest.warns(RuntimeWarning, match='xgboost_metadata.json changed'):
+        registry = open_models(models_dir)
+    assert not isinstance(registry, BundleRegistry)
+    assert registry['xgboost']['metadata']['optimal_threshold'] == 0.4
+
+    # Re-exporting from the edited files makes the bundle current again
+    export_bundle(registry, os.path.join(models_dir, 'readmission_bundle.npz'), source_digests(models_dir))
+    registry = open_models(models_dir)
+    assert isinstance(registry, BundleRegistry)
+    assert registry['xgboost']['metadata']['optimal_threshold'] == 0.4
+
+
+def test_bundle_without_recorded_sources_is_refused(legacy_models, models_dir):
+    export_bundle(legacy_models, os.path.join(models_dir, 'readmission_bundle.npz'))
+    with pytest.warns(RuntimeWarning):
+        assert type(open_models(models_dir)) is ModelRegistry
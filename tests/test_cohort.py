@@ -0,0 +1,34 @@
+import numpy as np
+
+from utils.cohort import risk_messages, stratify, threshold_curve, threshold_sweep
+from utils.predictor import get_risk_message
+
+
+def test_threshold_sweep_matches_direct_counts():
+    rng = np.random.default_rng(0)
+    probability = np.round(rng.random(2000), 2)
+    labels = rng.random(2000) < probability
+    thresholds = [-1.0, 0.0, 0.25, 0.5, 0.99, 1.0, 1.5]
+
+    sweep = threshold_sweep(probability, labels, thresholds)
+    for t, row in zip(thresholds, sweep.itertuples()):
+        flagged = probability >= t
+        assert row.flagged == flagged.sum()
+        assert row.tp == (flagged & labels).sum()
+        assert row.fn == (~flagged & labels).sum()
+        assert row.tn == (~flagged & ~labels).sum()
+
+
+def test_threshold_curve_has_one_row_per_distinct_probability():
+    probability = np.array([0.9, 0.2, 0.9, 0.5, 0.2])
+    curve = threshold_curve(probability, [1, 0, 0, 1, 0])
+    assert curve['threshold'].tolist() == [0.9, 0.5, 0.2]
+    assert curve['flagged'].tolist() == [2, 3, 5]
+    assert curve['tp'].tolist() == [1, 2, 2]
+
+
+def test_risk_messages_match_get_risk_message():
+    probability = np.random.default_rng(1).random(300)
+    levels = stratify(probability)['risk_level']
+    expected = [get_risk_message(str(level), p) for level, p in zip(levels, probability)]
+    assert risk_messages(probability).tolist() == expected
@@ -0,0 +1,99 @@
+import math
+
+import numpy as np
+import pytest
+
+from utils.drift import GRID_LOW, GRID_WIDTH, N_GRID_BINS, SCORE_BINS, DriftMonitor, ks, psi
+from utils.preprocessor import preprocess_batch
+
+from conftest import random_records
+
+
+@pytest.fixture(scope='module')
+def traffic(legacy_models):
+    X = preprocess_batch(random_records(700, seed=2), legacy_models['preprocessing'])
+    rng = np.random.default_rng(2)
+    X[:, :33] = rng.normal(1.0, 3.0, size=(len(X), 33))
+    X[:5, :33] = [[-50.0], [50.0], [GRID_LOW - 1e-9], [0.0], [12.0]]
+    return X
+
+
+def _observe_in_pieces(monitor, X):
+    # Uneven batches, including single rows (the fast path)
+    for start, stop in [(0, 1), (1, 2), (2, 200), (200, 201), (201, 590), (590, 700)]:
+        monitor.observe(X[start:stop])
+
+
+def test_merged_moments_match_numpy(legacy_models, traffic):
+    monitor = DriftMonitor(legacy_models['preprocessing'])
+    _observe_in_pieces(monitor, traffic)
+    profile = monitor.profile()
+    Z = traffic[:, :33]
+
+    assert profile['rows'] == len(traffic)
+    np.testing.assert_allclose(profile['mean'], Z.mean(axis=0), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(profile['var'], Z.var(axis=0), rtol=1e-10)
+    np.testing.assert_array_equal(monitor._min, Z.min(axis=0))
+    np.testing.assert_array_equal(monitor._max, Z.max(axis=0))
+    np.testing.assert_array_equal(profile['one_hot'], np.count_nonzero(traffic[:, 33:], axis=0))
+
+
+def test_histogram_uses_the_fixed_grid(legacy_models, traffic):
+    monitor = DriftMonitor(legacy_models['preprocessing'])
+    _observe_in_pieces(monitor, traffic)
+    histogram = np.asarray(monitor.profile()['histogram'])
+
+    # Bin 0 is underflow, the last bin overflow; bin b covers [low + (b - 1) * width, low + b * width)
+    edges = GRID_LOW + GRID_WIDTH * np.arange(N_GRID_BINS - 1)
+    for j in range(33):
+        expected = np.bincount(np.digitize(traffic[:, j], edges), minlength=N_GRID_BINS)
+        np.testing.assert_array_equal(histogram[j], expected)
+    assert histogram[0, 0] >= 2 and histogram[0, -1] >= 2
+
+
+def test_score_histogram_single_and_batch(legacy_models):
+    single, batch = DriftMonitor(legacy_models['preprocessing']), DriftMonitor(legacy_models['preprocessing'])
+    probability = np.array([0.0, 0.049, 0.05, 0.5, 0.999, 1.0])
+    for p in probability:
+        single.observe_scores('xgboost', [p])
+    batch.observe_scores('xgboost', probability)
+
+    expected = np.zeros(SCORE_BINS, dtype=int)
+    for b in [0, 0, 1, 10, 19, 19]:
+        expected[b] += 1
+    assert single.profile()['scores']['xgboost'] == batch.profile()['scores']['xgboost'] == expected.tolist()
+
+
+def test_psi_and_ks_by_hand():
+    # p = (.1, .3, .6), q = (.2, .3, .5)
+    assert psi([10, 30, 60], [20, 30, 50]) == pytest.approx(-0.1 * math.log(0.5) + 0.1 * math.log(1.2))
+    assert psi([0.1, 0.3, 0.6], [20, 30, 50]) == pytest.approx(psi([10, 30, 60], [2, 3, 5]))
+    assert ks([10, 30, 60], [20, 30, 50]) == pytest.approx(0.1)
+
+    # Empty bins are floored at 1e-4 so PSI stays finite
+    assert psi([0, 10], [5, 5]) == pytest.approx((1e-4 - 0.5) * math.log(1e-4 / 0.5) + 0.5 * math.log(2))
+    assert ks([0, 10], [5, 5]) == pytest.approx(0.5)
+    assert psi([0, 0], [5, 5]) is None and ks([1, 1], [0, 0]) is None
+
+
+def test_snapshot_against_a_reference(legacy_models, traffic):
+    reference = DriftMonitor(legacy_models['preprocessing'])
+    reference.observe(traffic, 'xgboost', np.linspace(0, 1, len(traffic)))
+
+    same = DriftMonitor(legacy_models['preprocessing'], reference.profile())
+    _observe_in_pieces(same, traffic)
+    same.observe_scores('xgboost', np.linspace(0, 1, len(traffic)))
+    snapshot = same.snapshot()
+    assert all(f['psi'] == pytest.approx(0) and f['ks'] == pytest.approx(0) for f in snapshot['features'])
+    assert all(g['psi'] == pytest.approx(0) for g in snapshot['one_hot'])
+    assert snapshot['scores']['xgboost']['psi'] == pytest.approx(0)
+
+    shifted = DriftMonitor(legacy_models['preprocessing'], reference.profile())
+    moved = traffic.copy()
+    moved[:, 0] += 3.0
+    shifted.observe(moved)
+    feature = shifted.snapshot()['features'][0]
+    hist = np.asarray(shifted.profile()['histogram'][0])
+    assert feature['psi'] == pytest.approx(psi(hist, reference.profile()['histogram'][0]))
+    assert feature['status'] == 'major'
+    assert feature['mean_shift'] == pytest.approx(3.0 / np.sqrt(reference.profile()['var'][0]))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from utils.predictor import (
+    ENSEMBLE, ENSEMBLE_MODELS, DEFAULT_THRESHOLD, RISK_LEVELS, assign_risk, ensemble_weights, predict_batch,
+    predict_ensemble,
+)
+from utils.preprocessor import preprocess_batch
+
+
+@pytest.fixture(scope='module')
+def feature_matrix(records, legacy_models):
+    return preprocess_batch(records, legacy_models['preprocessing'])
+
+
+def _member_probabilities(models, X):
+    return {name: predict_batch(models[name], X, name)['probability'] for name in ENSEMBLE_MODELS}
+
+
+def test_weights_follow_test_roc_auc(legacy_models):
+    comparison = legacy_models['comparison']['model_comparison']
+    weights = ensemble_weights(legacy_models['comparison'])
+    auc = {name: comparison[key]['roc_auc'] for name, key in ENSEMBLE_MODELS.items()}
+
+    assert sum(weights.values()) == pytest.approx(1.0)
+    for name in ENSEMBLE_MODELS:
+        assert weights[name] == pytest.approx(auc[name] / sum(auc.values()))
+    assert ensemble_weights(legacy_models['comparison'], 'mean') == pytest.approx(
+        {name: 1 / 3 for name in ENSEMBLE_MODELS})
+
+
+@pytest.mark.parametrize('rows', [1, 7, 500])
+def test_ensemble_is_weighted_average_of_members(legacy_models, feature_matrix, rows):
+    X = feature_matrix[:rows]
+    members = _member_probabilities(legacy_models, X)
+    weights = ensemble_weights(legacy_models['comparison'])
+    expected = sum(weights[name] * members[name] for name in ENSEMBLE_MODELS)
+
+    result = predict_batch(legacy_models, X, ENSEMBLE)
+    np.testing.assert_allclose(result['probability'], expected, rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(result['prediction'], (expected > DEFAULT_THRESHOLD).astype(np.int64))
+    np.testing.assert_array_equal(result['risk_level'], RISK_LEVELS[assign_risk(expected)])
+    for name in ENSEMBLE_MODELS:
+        np.testing.assert_array_equal(result['members'][name]['probability'], members[name])
+
+
+def test_mean_ensemble_and_serial_path(legacy_models, feature_matrix):
+    members = _member_probabilities(legacy_models, feature_matrix)
+    expected = np.mean([members[name] for name in ENSEMBLE_MODELS], axis=0)
+
+    result = predict_ensemble(legacy_models, feature_matrix, method='mean', parallel=False)
+    np.testing.assert_allclose(result['probability'], expected, rtol=0, atol=1e-12)
+
+    parallel = predict_ensemble(legacy_models, feature_matrix, parallel=True)
+    serial = predict_ensemble(legacy_models, feature_matrix, parallel=False)
+    np.testing.assert_array_equal(parallel['probability'], serial['probability'])
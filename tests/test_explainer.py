@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from xgboost import DMatrix
+
+from utils.explainer import explain_batch, explain_prediction, feature_contributions
+from utils.preprocessor import preprocess_batch, preprocess_input
+
+
+@pytest.fixture(scope='module')
+def feature_matrix(records, legacy_models):
+    return preprocess_batch(records[:200], legacy_models['preprocessing'])
+
+
+def _margin(models, X, model_name):
+    model = models[model_name]['model']
+    if model_name == 'logistic_regression':
+        return X @ model.coef_[0] + model.intercept_[0]
+    booster = model.get_booster()
+    return booster.predict(DMatrix(X, feature_names=booster.feature_names), output_margin=True).astype(np.float64)
+
+
+@pytest.mark.parametrize('model_name, approximate', [
+    ('logistic_regression', False), ('xgboost', False), ('xgboost', True),
+])
+def test_contributions_sum_to_the_margin(legacy_models, feature_matrix, model_name, approximate):
+    preprocessing = legacy_models['preprocessing']
+    margin = _margin(legacy_models, feature_matrix, model_name)
+    contributions, base = feature_contributions(legacy_models[model_name], feature_matrix, model_name, approximate)
+    explained = explain_batch(legacy_models[model_name], feature_matrix, model_name, preprocessing, approximate)
+
+    np.testing.assert_allclose(base + contributions.sum(axis=1), margin, rtol=0, atol=1e-4)
+    np.testing.assert_allclose(explained['logit'], base + contributions.sum(axis=1), rtol=0, atol=1e-9)
+    # Folding columns onto form fields keeps every column's contribution
+    np.testing.assert_allclose(explained['contributions'].sum(axis=1), contributions.sum(axis=1), rtol=0, atol=1e-9)
+    if model_name == 'logistic_regression':
+        model = legacy_models[model_name]['model']
+        np.testing.assert_allclose(explained['logit'], model.decision_function(feature_matrix), rtol=0, atol=1e-9)
+
+
+def test_single_prediction_is_ordered_by_size(records, legacy_models):
+    preprocessing = legacy_models['preprocessing']
+    X = preprocess_input(records[0], preprocessing)
+    explanation = explain_prediction(legacy_models['xgboost'], X, 'xgboost', preprocessing)
+    values = [c['value'] for c in explanation['contributions']]
+
+    assert explanation['base_value'] + sum(values) == pytest.approx(explanation['logit'], abs=1e-9)
+    assert explanation['logit'] == pytest.approx(_margin(legacy_models, X, 'xgboost')[0], abs=1e-4)
+    assert np.all(np.diff(np.abs(values)) <= 0)
+
+
+def test_neural_network_is_not_explained(legacy_models, feature_matrix):
+    with pytest.raises(ValueError):
+        feature_contributions(legacy_models['neural_network'], feature_matrix, 'neural_network')
@@ -0,0 +1,47 @@
+import json
+import os
+import warnings
+
+import joblib
+import pytest
+
+from utils.hot_reload import ModelWatcher
+from utils.model_loader import BundleRegistry
+
+
+@pytest.fixture
+def watcher(models_dir):
+    return ModelWatcher(models_dir, interval=60)
+
+
+def test_new_threshold_next_to_bundle_is_picked_up(watcher, models_dir):
+    assert isinstance(watcher.current, BundleRegistry)
+    assert watcher.current['xgboost']['metadata']['optimal_threshold'] == pytest.approx(0.53)
+    assert not watcher.check()
+
+    path = os.path.join(models_dir, 'xgboost_metadata.json')
+    with open(path) as f:
+        metadata = json.load(f)
+    metadata['optimal_threshold'] = 0.4
+    with open(path, 'w') as f:
+        json.dump(metadata, f, indent=4)
+
+    with pytest.warns(RuntimeWarning, match='changed since it was exported'):
+        assert watcher.check()
+    assert watcher.current['xgboost']['metadata']['optimal_threshold'] == 0.4
+    assert watcher.history[-1]['status'] == 'active'
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        assert not watcher.check()
+
+
+def test_retrained_model_file_is_picked_up(watcher, models_dir):
+    version = watcher.version
+    model = watcher.current['xgboost']['model']
+    model.set_params(n_jobs=1)
+    joblib.dump(model, os.path.join(models_dir, 'xgboost_model.pkl'))
+
+    with pytest.warns(RuntimeWarning, match='xgboost_model.pkl'):
+        assert watcher.check()
+    assert watcher.version != version
+    assert not isinstance(watcher.current, BundleRegistry)
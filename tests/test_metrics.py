@@ -0,0 +1,89 @@
+import pytest
+
+from utils import metrics
+from utils.metrics import BUCKETS, Histogram, MetricsRegistry, SessionLeases
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    was_enabled = metrics.is_enabled()
+    metrics.disable()
+    metrics.reset()
+    yield
+    metrics.reset()
+    (metrics.enable if was_enabled else metrics.disable)()
+
+
+@metrics.timed('work', model='xgboost')
+def _work(x):
+    return x * 2
+
+
+def test_disabled_timers_record_nothing():
+    assert metrics.timer('stage') is metrics.timer('other', model='x')
+    with metrics.timer('stage'):
+        pass
+    assert _work(3) == 6
+    metrics.increment('rows', 5)
+    assert metrics.snapshot() == {'enabled': False, 'stages': [], 'counters': []}
+    assert metrics.prometheus_text() == '\n'
+
+
+def test_enabled_timers_record_each_call():
+    metrics.enable()
+    for _ in range(3):
+        with metrics.timer('stage'):
+            pass
+    assert _work(3) == 6 and _work.__name__ == '_work'
+    metrics.increment('rows', 5, model='xgboost')
+    metrics.increment('rows', 2, model='xgboost')
+
+    snapshot = metrics.snapshot()
+    assert [(s['stage'], s['labels'], s['count']) for s in snapshot['stages']] == [
+        ('stage', {}, 3), ('work', {'model': 'xgboost'}, 1)]
+    assert snapshot['counters'] == [{'name': 'rows', 'labels': {'model': 'xgboost'}, 'value': 7}]
+
+
+def test_histogram_buckets_are_inclusive_upper_bounds():
+    histogram = Histogram()
+    for seconds in [BUCKETS[0], BUCKETS[0] * 1.1, BUCKETS[5], 20.0]:
+        histogram.observe(seconds)
+
+    assert histogram.counts[0] == 1 and histogram.counts[1] == 1 and histogram.counts[5] == 1
+    assert histogram.counts[-1] == 1 and len(histogram.counts) == len(BUCKETS) + 1
+    assert histogram.count == 4 and histogram.max == 20.0
+    assert histogram.sum == pytest.approx(BUCKETS[0] * 2.1 + BUCKETS[5] + 20.0)
+    assert histogram.quantile(0.5) == BUCKETS[1]
+    assert histogram.quantile(1.0) == 20.0
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_prometheus_text():
+    registry = MetricsRegistry()
+    registry.observe('predict', 0.003, model='xgboost')
+    registry.observe('predict', 0.02, model='xgboost')
+    registry.increment('rows_scored', 64, model='lr "v2"')
+
+    lines = registry.prometheus_text().splitlines()
+    metric = 'readmission_stage_seconds'
+    assert lines[:2] == [f'# HELP {metric} Time spent in each scoring stage', f'# TYPE {metric} histogram']
+    buckets = {line.split('le="')[1].split('"')[0]: int(line.rsplit(' ', 1)[1])
+               for line in lines if line.startswith(f'{metric}_bucket')}
+    assert buckets['0.0025'] == 0 and buckets['0.005'] == 1 and buckets['0.025'] == 2 and buckets['+Inf'] == 2
+    assert len(buckets) == len(BUCKETS) + 1
+    assert f'{metric}_bucket{{stage="predict",model="xgboost",le="0.005"}} 1' in lines
+    assert f'{metric}_count{{stage="predict",model="xgboost"}} 2' in lines
+    assert f'{metric}_sum{{stage="predict",model="xgboost"}} {0.003 + 0.02!r}' in lines
+    assert lines[-2:] == ['# TYPE readmission_rows_scored_total counter',
+                          'readmission_rows_scored_total{model="lr \\"v2\\""} 64']
+
+
+def test_session_leases_expire():
+    leases = SessionLeases(ttl=60)
+    assert leases.update('a', True, now=0) == 1 and metrics.is_enabled()
+    assert leases.update('b', True, now=10) == 2
+    assert leases.update('b', False, now=20) == 1 and metrics.is_enabled()
+
+    # 'a' closed with the box ticked and stopped renewing
+    assert leases.update('c', False, now=61) == 0
+    assert not metrics.is_enabled()
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from utils.model_loader import MODEL_FILES, open_models
+
+from conftest import MODELS_DIR
+
+
+@pytest.mark.parametrize('use_bundle', [False, True])
+def test_models_load_on_first_access(use_bundle):
+    registry = open_models(MODELS_DIR, use_bundle=use_bundle)
+
+    assert list(registry) == ['preprocessing', *MODEL_FILES, 'comparison']
+    assert 'xgboost' in registry and len(registry) == len(MODEL_FILES) + 2
+    assert not any(registry.is_loaded(name) for name in MODEL_FILES)
+
+    entry = registry['logistic_regression']
+    assert registry['logistic_regression'] is entry
+    assert [name for name in MODEL_FILES if registry.is_loaded(name)] == ['logistic_regression']
+    assert set(registry.load_times) == {'preprocessing', 'logistic_regression'}
+
+
+def test_each_model_loads_once_under_its_own_lock():
+    registry = open_models(MODELS_DIR, use_bundle=False)
+    load = registry._load
+    calls = []
+    started, release = threading.Event(), threading.Event()
+
+    def slow_load(name):
+        calls.append(name)
+        if name == 'xgboost':
+            started.set()
+            assert release.wait(10)
+        return load(name)
+
+    registry._load = slow_load
+    entries = []
+    threads = [threading.Thread(target=lambda: entries.append(registry['xgboost'])) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+
+    # Another model loads while xgboost is still loading
+    assert started.wait(10)
+    registry['logistic_regression']
+    assert not registry.is_loaded('xgboost')
+
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert sorted(calls) == ['logistic_regression', 'xgboost']
+    assert len(entries) == 8 and all(entry is entries[0] for entry in entries)
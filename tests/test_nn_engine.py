@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+import pytest
+
+from utils.model_loader import _model_path
+from utils.nn_engine import NumpyMLP, QuantizedMLP, exported_source, file_sha256
+from utils.preprocessor import preprocess_batch
+
+from conftest import MODELS_DIR
+
+WEIGHTS = os.path.join(MODELS_DIR, 'neural_network_weights.npz')
+KERAS_MODEL = os.path.join(MODELS_DIR, 'neural_network_model.h5')
+
+
+def test_numpy_forward_matches_keras(records, legacy_models):
+    keras = pytest.importorskip('tensorflow').keras
+    model = keras.models.load_model(KERAS_MODEL)
+    mlp = NumpyMLP.load(WEIGHTS)
+
+    X = np.vstack([
+        preprocess_batch(records, legacy_models['preprocessing']),
+        np.random.default_rng(0).normal(size=(2000, model.input_shape[-1])),
+    ])
+    expected = np.asarray(model(X.astype(np.float32), training=False), dtype=np.float64)[:, 0]
+    np.testing.assert_allclose(mlp.predict_proba(X)[:, 1], expected, rtol=0, atol=1e-5)
+
+
+def test_committed_export_matches_its_source():
+    assert exported_source(WEIGHTS) == file_sha256(KERAS_MODEL)
+
+
+@pytest.mark.parametrize('source_sha256', [None, '0' * 64])
+def test_stale_export_falls_back_to_keras_model(models_dir, source_sha256):
+    assert _model_path(models_dir, 'neural_network').endswith('.npz')
+
+    weights = os.path.join(models_dir, 'neural_network_weights.npz')
+    NumpyMLP.load(weights).save(weights, source_sha256=source_sha256)
+    with pytest.warns(RuntimeWarning, match='not exported from the current'):
+        assert _model_path(models_dir, 'neural_network').endswith('.h5')
+
+
+def test_quantized_save_round_trips(tmp_path, records, legacy_models):
+    features = preprocess_batch(records, legacy_models['preprocessing'])
+    quantized = QuantizedMLP.load(WEIGHTS)
+    path = str(tmp_path / 'quantized.npz')
+    quantized.save(path)
+
+    loaded = QuantizedMLP.load(path)
+    for kernel, expected in zip(loaded.kernels, quantized.kernels):
+        assert kernel.dtype == np.int8
+        np.testing.assert_array_equal(kernel, expected)
+    np.testing.assert_array_equal(loaded.predict_proba(features), quantized.predict_proba(features))
+    assert os.path.getsize(path) < os.path.getsize(WEIGHTS) / 2
+    with pytest.raises(ValueError, match='int8'):
+        NumpyMLP.load(path)
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from utils.nn_engine import ACTIVATIONS, NumpyMLP, QuantizedMLP
+from utils.precision import SparseLogistic, precision_report
+from utils.predictor import RISK_LEVELS, assign_risk, predict_batch
+from utils.preprocessor import preprocess_batch, preprocess_sparse
+
+from conftest import MODELS_DIR, random_records
+
+MODELS = ['logistic_regression', 'xgboost', 'neural_network']
+
+
+@pytest.fixture(scope='module')
+def features(legacy_models):
+    records = random_records(2000, seed=11)
+    return records, preprocess_batch(records, legacy_models['preprocessing'])
+
+
+def _direct_probability(legacy_models, name, X, precision):
+    """The reduced model's probabilities computed straight from the float64 features"""
+    model = legacy_models[name]['model']
+    X32 = X.astype(np.float32)
+    if name == 'logistic_regression':
+        z = X32.astype(np.float64) @ model.coef_.astype(np.float32).astype(np.float64).ravel() + model.intercept_[0]
+        return 1.0 / (1.0 + np.exp(-z))
+    if name == 'neural_network':
+        if precision == 'float32':
+            weights = model.kernels
+        else:
+            quantized = QuantizedMLP.from_mlp(model)
+            weights = [k.astype(np.float32) * s for k, s in zip(quantized.kernels, quantized.scales)]
+        h = X32.astype(np.float64)
+        for w, b, activation in zip(weights, model.biases, model.activations):
+            h = ACTIVATIONS[activation](h @ w.astype(np.float32).astype(np.float64) + b.astype(np.float32))
+        return h[:, 0]
+    return model.predict_proba(X32)[:, 1]
+
+
+@pytest.mark.parametrize('precision', ['float32', 'int8'])
+def test_report_agrees_with_direct_comparison(legacy_models, features, precision):
+    records, X = features
+    report = precision_report(legacy_models, records, MODELS, precision)
+
+    for name in MODELS:
+        metadata = legacy_models[name]['metadata']
+        expected = predict_batch(legacy_models[name], X, name)
+        direct = _direct_probability(legacy_models, name, X, precision)
+        deviation = np.abs(direct - expected['probability'])
+        band_flips = RISK_LEVELS[assign_risk(direct, metadata.get('risk_thresholds'))] != expected['risk_level']
+        threshold = metadata.get('optimal_threshold')
+        direct_prediction = direct >= threshold if threshold is not None else direct > 0.5
+        prediction_flips = direct_prediction != expected['prediction'].astype(bool)
+
+        result = report[name]
+        assert result['rows'] == len(X)
+        assert result['max_deviation'] == pytest.approx(deviation.max(), abs=1e-5)
+        assert result['mean_deviation'] == pytest.approx(deviation.mean(), abs=1e-6)
+        assert result['band_flips'] == band_flips.sum()
+        assert result['prediction_flips'] == prediction_flips.sum()
+
+    assert report['logistic_regression']['max_deviation'] < 1e-5
+    if precision == 'int8':
+        assert report['neural_network']['max_deviation'] > report['logistic_regression']['max_deviation']
+
+
+def test_sparse_logistic_matches_sklearn(legacy_models, features):
+    records, X = features
+    model = legacy_models['logistic_regression']['model']
+    batch = preprocess_sparse(records, legacy_models['preprocessing'])
+    np.testing.assert_allclose(SparseLogistic.from_sklearn(model).predict_proba(batch), model.predict_proba(X),
+                               atol=1e-5)
+
+
+def test_quantized_kernels_stay_int8(legacy_models, features):
+    _, X = features
+    mlp = NumpyMLP.load(f'{MODELS_DIR}/neural_network_weights.npz')
+    quantized = QuantizedMLP.from_mlp(mlp)
+    assert all(k.dtype == np.int8 for k in quantized.kernels)
+    for k, s, original in zip(quantized.kernels, quantized.scales, mlp.kernels):
+        # Each weight is within half a quantization step of the float kernel
+        assert np.all(np.abs(k * s.astype(np.float64) - original) <= s * 0.5 + 1e-6)
+    np.testing.assert_allclose(quantized.predict_proba(X), mlp.predict_proba(X), atol=0.05)
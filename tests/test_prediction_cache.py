@@ -0,0 +1,52 @@
+import copy
+import os
+
+import joblib
+import numpy as np
+
+from utils.bundle import export_bundle
+from utils.model_loader import open_bundle, open_models
+from utils.prediction_cache import PredictionCache
+from utils.predictor import ENSEMBLE, predict_cached
+
+
+def test_cached_results_are_not_shared(legacy_models, records):
+    cache = PredictionCache()
+    pp = legacy_models['preprocessing']
+    first = predict_cached(legacy_models, records[0], ENSEMBLE, pp, cache)
+    first['members']['xgboost']['probability'] = -1.0
+    first['weights'].clear()
+
+    second = predict_cached(legacy_models, records[0], ENSEMBLE, pp, cache)
+    assert cache.hits == 1
+    assert second['members']['xgboost']['probability'] >= 0.0
+    assert second['weights']
+
+
+def _shifted_scaler(preprocessing):
+    shifted = dict(preprocessing)
+    shifted['scaler'] = copy.deepcopy(preprocessing['scaler'])
+    shifted['scaler'].mean_ = shifted['scaler'].mean_ + 1.0
+    shifted.pop('feature_layout', None)
+    return shifted
+
+
+def test_model_versions_change_with_preprocessing(models_dir):
+    before = open_models(models_dir, use_bundle=False)
+    path = os.path.join(models_dir, 'preprocessing_pipeline.pkl')
+    joblib.dump(_shifted_scaler(before['preprocessing']), path)
+    after = open_models(models_dir, use_bundle=False)
+
+    for name in ['logistic_regression', 'xgboost', 'neural_network']:
+        assert before[name]['version'] != after[name]['version']
+
+
+def test_bundle_model_versions_change_with_preprocessing(legacy_models, tmp_path):
+    export_bundle(legacy_models, tmp_path / 'a.npz')
+    shifted = {**legacy_models, 'preprocessing': _shifted_scaler(legacy_models['preprocessing'])}
+    export_bundle(shifted, tmp_path / 'b.npz')
+    a, b = open_bundle(str(tmp_path / 'a.npz')), open_bundle(str(tmp_path / 'b.npz'))
+
+    assert a.bundle.model_meta('xgboost')['version'] == b.bundle.model_meta('xgboost')['version']
+    assert a['xgboost']['version'] != b['xgboost']['version']
+    np.testing.assert_array_equal(b['preprocessing']['scaler'].mean_, a['preprocessing']['scaler'].mean_ + 1.0)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.predictor import predict_probabilities
+from utils.preprocessor import get_feature_layout, preprocess_batch, preprocess_input, preprocess_sparse
+
+from conftest import random_records
+
+
+def _sklearn_features(records, preprocessing):
+    """Unscaled encoding followed by the fitted StandardScaler, as before the scaler was folded"""
+    layout = get_feature_layout(preprocessing)
+    X = np.zeros((len(records), layout.n_features))
+    for record, row in zip(records, X):
+        layout.encode_record(record, row)
+    X[:, layout.scaled] = preprocessing['scaler'].transform(X[:, layout.scaled])
+    return X
+
+
+def test_folded_scaler_matches_standard_scaler(records, legacy_models):
+    preprocessing = legacy_models['preprocessing']
+    expected = _sklearn_features(records, preprocessing)
+
+    np.testing.assert_allclose(preprocess_batch(records, preprocessing), expected, rtol=0, atol=1e-12)
+    for record, row in zip(records[:20], expected):
+        np.testing.assert_allclose(preprocess_input(record, preprocessing)[0], row, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize('name', ['logistic_regression', 'xgboost', 'neural_network'])
+def test_folded_scaler_predictions_match(records, legacy_models, name):
+    preprocessing = legacy_models['preprocessing']
+    model = legacy_models[name]['model']
+    expected = predict_probabilities(model, _sklearn_features(records, preprocessing), name)
+    actual = predict_probabilities(model, preprocess_batch(records, preprocessing), name)
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-9)
+
+
+def _loc_preprocess_input(user_input, preprocessing_pipeline):
+    """
+    The original DataFrame/.loc implementation of preprocess_input, kept as the reference
+
+    Only change: number_diagnoses is read from the input (default 9), as it has
+    been since the input schema was added.
+    """
+    feature_names = preprocessing_pipeline['feature_names']
+    feature_vector = pd.DataFrame(0.0, index=[0], columns=feature_names)
+
+    for key, default in [('admission_type_id', 1), ('discharge_disposition_id', 1), ('admission_source_id', 7),
+                         ('time_in_hospital', 4), ('medical_specialty', 0), ('num_lab_procedures', 45),
+                         ('num_procedures', 2), ('num_medications', 15), ('number_outpatient', 0),
+                         ('number_emergency', 0), ('number_inpatient', 0), ('number_diagnoses', 9.0)]:
+        feature_vector.loc[0, key] = float(user_input.get(key, default))
+    feature_vector.loc[0, 'num_medications_prescribed'] = float(user_input.get('num_medications', 15))
+    feature_vector.loc[0, 'num_medications_changed'] = 0.0
+
+    long_stay = user_input.get('time_in_hospital', 4) > 7
+    high_proc = user_input.get('num_procedures', 2) > 3
+    feature_vector.loc[0, 'long_stay_high_procedures'] = 1.0 if (long_stay and high_proc) else 0.0
+    is_elderly = user_input.get('age_group', 'Age_60_plus') == 'Age_60_plus'
+    many_meds = user_input.get('num_medications', 15) >= 5
+    feature_vector.loc[0, 'elderly_polypharmacy'] = 1.0 if (is_elderly and many_meds) else 0.0
+
+    race = user_input.get('race', 'Caucasian')
+    if race == 'AfricanAmerican':
+        race = 'Other'
+    if f'race_{race}' in feature_vector.columns:
+        feature_vector.loc[0, f'race_{race}'] = 1.0
+
+    gender = user_input.get('gender', 'Male')
+    if gender != 'Female' and f'gender_{gender}' in feature_vector.columns:
+        feature_vector.loc[0, f'gender_{gender}'] = 1.0
+
+    if 'payer_code_MC' in feature_vector.columns:
+        feature_vector.loc[0, 'payer_code_MC'] = 1.0
+    if user_input.get('diabetes_med', 'Yes') == 'Yes':
+        feature_vector.loc[0, 'diabetesMed_Yes'] = 1.0
+
+    hba1c_cat = user_input.get('hba1c_category', 'No_HbA1c_Test')
+    if hba1c_cat in ('High_HbA1c_NoMedChange', 'Normal_HbA1c'):
+        if f'HbA1c_category_{hba1c_cat}' in feature_vector.columns:
+            feature_vector.loc[0, f'HbA1c_category_{hba1c_cat}'] = 1.0
+
+    primary_diag = user_input.get('primary_diagnosis', 'Diabetes')
+    diag_1 = 'Other' if primary_diag == 'Circulatory' else primary_diag
+    for col in (f'diag_1_grouped_{diag_1}', f'diag_2_grouped_{primary_diag}', f'diag_3_grouped_{primary_diag}'):
+        if col in feature_vector.columns:
+            feature_vector.loc[0, col] = 1.0
+
+    age_group = user_input.get('age_group', 'Age_60_plus')
+    if age_group in ('Age_30_60', 'Age_60_plus') and f'age_group_{age_group}' in feature_vector.columns:
+        feature_vector.loc[0, f'age_group_{age_group}'] = 1.0
+
+    if hba1c_cat in ('High_HbA1c_MedChanged', 'High_HbA1c_NoMedChange', 'Normal_HbA1c'):
+        interaction_col = f'HbA1c_Diag_interaction_{hba1c_cat}_{primary_diag}'
+        if interaction_col in feature_vector.columns:
+            feature_vector.loc[0, interaction_col] = 1.0
+
+    first_33_features = feature_names[:33]
+    feature_vector[first_33_features] = preprocessing_pipeline['scaler'].transform(
+        feature_vector[first_33_features].values)
+    return feature_vector[feature_names].values
+
+
+@pytest.fixture(scope='module')
+def mixed_records():
+    """Random records with missing keys, plus unknown categories and out-of-form values"""
+    records = random_records(2000, seed=9)
+    unusual = [('race', 'Martian'), ('gender', 'Unknown/Invalid'), ('age_group', 'Age_90_plus'),
+               ('primary_diagnosis', 'Mental'), ('hba1c_category', 'Pending'), ('diabetes_med', 'Maybe'),
+               ('time_in_hospital', 30), ('num_procedures', 12)]
+    for i, (key, value) in enumerate(unusual * 10):
+        records[i * 7][key] = value
+    records.append({})
+    return records
+
+
+def test_batch_and_sparse_match_per_record_path(mixed_records, legacy_models):
+    preprocessing = legacy_models['preprocessing']
+    expected = np.vstack([preprocess_input(record, preprocessing) for record in mixed_records])
+
+    np.testing.assert_array_equal(preprocess_batch(mixed_records, preprocessing), expected)
+    np.testing.assert_array_equal(preprocess_batch(pd.DataFrame(mixed_records), preprocessing), expected)
+    np.testing.assert_array_equal(preprocess_sparse(mixed_records, preprocessing, np.float64).toarray(), expected)
+    np.testing.assert_array_equal(preprocess_sparse(mixed_records, preprocessing).toarray(np.float64),
+                                  expected.astype(np.float32))
+
+
+def test_matches_original_loc_implementation(mixed_records, legacy_models):
+    preprocessing = legacy_models['preprocessing']
+    expected = np.vstack([_loc_preprocess_input(record, preprocessing) for record in mixed_records])
+    actual = preprocess_batch(mixed_records, preprocessing)
+
+    # One-hot and constant columns are set identically; the scaled block differs
+    # only by the folded scaler's rounding (see test_folded_scaler_matches_standard_scaler)
+    np.testing.assert_array_equal(actual[:, 33:], expected[:, 33:])
+    np.testing.assert_allclose(actual[:, :33], expected[:, :33], rtol=0, atol=1e-12)
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.preprocessor import get_feature_layout, preprocess_batch, preprocess_input
+from utils.schema import ERROR_KINDS, WARNING_KINDS, validate_batch
+
+from conftest import random_records
+
+FULL_RECORD = {
+    'age_group': 'Age_60_plus', 'gender': 'Female', 'race': 'Caucasian', 'primary_diagnosis': 'Diabetes',
+    'hba1c_category': 'Normal_HbA1c', 'diabetes_med': 'Yes', 'admission_type_id': 1,
+    'discharge_disposition_id': 1, 'admission_source_id': 7, 'time_in_hospital': 4, 'medical_specialty': 0,
+    'num_lab_procedures': 45, 'num_procedures': 2, 'num_medications': 15, 'number_outpatient': 0,
+    'number_emergency': 0, 'number_inpatient': 0, 'number_diagnoses': 9,
+}
+
+CASES = [
+    # (changes to FULL_RECORD, keys removed, expected errors, expected warnings)
+    ({}, [], {}, {}),
+    ({'time_in_hospital': 'three'}, [], {'time_in_hospital': 'invalid'}, {}),
+    ({'num_lab_procedures': float('inf')}, [], {'num_lab_procedures': 'invalid'}, {}),
+    ({'number_inpatient': 50}, [], {'number_inpatient': 'out_of_range'}, {}),
+    ({'admission_type_id': 0}, [], {'admission_type_id': 'out_of_range'}, {}),
+    ({}, ['num_medications'], {}, {'num_medications': 'missing'}),
+    ({'race': None}, [], {}, {'race': 'missing'}),
+    ({}, ['medical_specialty', 'number_diagnoses'], {}, {}),
+    ({'race': 'Martian'}, [], {'race': 'unknown_category'}, {}),
+    ({'race': 'AfricanAmerican'}, [], {}, {'race': 'remapped'}),
+    ({'primary_diagnosis': 'Circulatory'}, [], {}, {'primary_diagnosis': 'remapped'}),
+]
+
+
+def _case_records():
+    records = []
+    for changes, removed, _, _ in CASES:
+        record = {**FULL_RECORD, **changes}
+        for key in removed:
+            del record[key]
+        records.append(record)
+    return records
+
+
+@pytest.mark.parametrize('as_frame', [False, True])
+def test_issues_per_kind(legacy_models, as_frame):
+    records = _case_records()
+    result = validate_batch(pd.DataFrame(records) if as_frame else records, legacy_models['preprocessing'])
+
+    for i, (_, _, errors, warnings) in enumerate(CASES):
+        assert result.row_issues(i) == {'errors': errors, 'warnings': warnings}
+    assert result.errors.tolist() == [bool(case[2]) for case in CASES]
+    assert result.warnings.tolist() == [bool(case[3]) for case in CASES]
+    # Optional fields left out are counted, but not flagged as warnings
+    assert result.counts()['missing'] == {'num_medications': 1, 'race': 1, 'medical_specialty': 1,
+                                          'number_diagnoses': 1}
+
+
+@pytest.mark.parametrize('as_frame', [False, True])
+def test_defaults_substituted(legacy_models, as_frame):
+    records = _case_records()
+    result = validate_batch(pd.DataFrame(records) if as_frame else records, legacy_models['preprocessing'])
+    normalized = pd.DataFrame(result.records) if not as_frame else result.records
+
+    assert normalized['time_in_hospital'].tolist()[:4] == [4, 4, 4, 4]
+    assert normalized['num_lab_procedures'][2] == 45
+    assert normalized['number_inpatient'][3] == 50
+    assert normalized['num_medications'][5] == 15
+    assert normalized['race'][6] == 'Caucasian'
+    assert normalized['number_diagnoses'][7] == 9
+    assert result.defaults_used() == {'time_in_hospital': 1, 'num_lab_procedures': 1, 'num_medications': 1,
+                                      'race': 1, 'medical_specialty': 1, 'number_diagnoses': 1}
+
+
+def test_frame_and_record_paths_agree(legacy_models):
+    records = random_records(2000, seed=5)
+    rng = np.random.default_rng(5)
+    bad_values = [('time_in_hospital', 'three'), ('number_inpatient', 99), ('race', 'Martian'),
+                  ('gender', 'Unknown'), ('num_medications', None), ('age_group', None), ('num_procedures', -1),
+                  ('num_lab_procedures', float('inf')), ('number_emergency', '-inf')]
+    for i in rng.choice(len(records), 300, replace=False):
+        key, value = bad_values[i % len(bad_values)]
+        records[i][key] = value
+
+    by_record = validate_batch(records, legacy_models['preprocessing'])
+    by_frame = validate_batch(pd.DataFrame(records), legacy_models['preprocessing'])
+
+    for kind in ERROR_KINDS + WARNING_KINDS:
+        np.testing.assert_array_equal(by_record.bits[kind], by_frame.bits[kind], err_msg=kind)
+    assert by_record.summary() == by_frame.summary()
+    assert by_record.labels(ERROR_KINDS).tolist() == by_frame.labels(ERROR_KINDS).tolist()
+    assert by_frame.counts()['invalid']['time_in_hospital'] > 0
+    pd.testing.assert_frame_equal(pd.DataFrame(by_record.records)[by_frame.fields],
+                                  by_frame.records[by_frame.fields].reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_number_diagnoses_is_read_from_the_input(legacy_models):
+    preprocessing = legacy_models['preprocessing']
+    column = get_feature_layout(preprocessing).feature_names.index('number_diagnoses')
+    record = {key: value for key, value in FULL_RECORD.items() if key != 'number_diagnoses'}
+
+    default = preprocess_input(record, preprocessing)
+    explicit = preprocess_batch([dict(record, number_diagnoses=9), dict(record, number_diagnoses=5)], preprocessing)
+
+    np.testing.assert_array_equal(explicit[0], default[0])
+    changed = np.flatnonzero(explicit[1] != default[0])
+    assert changed.tolist() == [column]
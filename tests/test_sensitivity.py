@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from utils.predictor import ENSEMBLE, predict_batch
+from utils.preprocessor import preprocess_input
+from utils.sensitivity import build_grid, field_values, sensitivity_grid
+
+from conftest import random_records
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network', ENSEMBLE]
+
+
+def _point_probability(models, user_input, model_name):
+    X = preprocess_input(user_input, models['preprocessing'])
+    model_data = models if model_name == ENSEMBLE else models[model_name]
+    return predict_batch(model_data, X, model_name)['probability'][0]
+
+
+@pytest.mark.parametrize('sweeps', [
+    {'time_in_hospital': field_values('time_in_hospital')},
+    {'num_medications': field_values('num_medications', 0, 30, 5),
+     'number_inpatient': field_values('number_inpatient', 0, 4)},
+])
+def test_grid_matches_per_point_predictions(legacy_models, sweeps):
+    base = dict(random_records(1, seed=3)[0], num_medications_prescribed=12)
+    result = sensitivity_grid(legacy_models, base, sweeps, MODEL_NAMES)
+    grid = result['grid']
+    shape = tuple(len(values) for values in sweeps.values())
+
+    assert result['fields'] == list(sweeps) and len(grid) == np.prod(shape)
+    for i, row in enumerate(grid[list(sweeps)].itertuples(index=False)):
+        point = dict(base, **row._asdict())
+        if 'num_medications' in sweeps:
+            point['num_medications_prescribed'] = point['num_medications']
+        for model_name in MODEL_NAMES:
+            expected = _point_probability(legacy_models, point, model_name)
+            assert grid[f'{model_name}_probability'].iat[i] == pytest.approx(expected, abs=1e-6)
+            assert result['surfaces'][model_name][np.unravel_index(i, shape)] == grid[f'{model_name}_probability'].iat[i]
+
+
+def test_first_field_varies_slowest():
+    grid = build_grid({'race': 'Asian'}, {'time_in_hospital': [1, 2], 'number_inpatient': [0, 5, 9]})
+    assert grid['time_in_hospital'].tolist() == [1, 1, 1, 2, 2, 2]
+    assert grid['number_inpatient'].tolist() == [0, 5, 9, 0, 5, 9]
+    assert (grid['race'] == 'Asian').all()
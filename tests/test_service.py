@@ -0,0 +1,162 @@
+import asyncio
+import copy
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from utils.drift import DriftMonitor
+from utils.model_loader import open_models
+from utils.predictor import predict_batch
+from utils.preprocessor import preprocess_batch
+from utils.service import ScoringService
+
+
+async def _request(app, method, path, body=None):
+    """Call the ASGI app in-process and return (status, parsed JSON body)"""
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b''
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    response = {}
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] = response.get('body', b'') + message['body']
+
+    await app({'type': 'http', 'method': method, 'path': path, 'headers': []}, receive, send)
+    return response['status'], json.loads(response['body'])
+
+
+def _run(app, *requests):
+    """Send the requests concurrently, then stop the app's batchers"""
+    async def main():
+        try:
+            return await asyncio.gather(*(_request(app, *request) for request in requests))
+        finally:
+            for batcher in app.batchers.values():
+                await batcher.close()
+    return asyncio.run(main())
+
+
+@pytest.fixture
+def app(legacy_models):
+    return ScoringService(legacy_models, window_ms=20, warm_up=False)
+
+
+def _expected(models, records, name):
+    return predict_batch(models[name], preprocess_batch(records, models['preprocessing']), name)
+
+
+def test_single_prediction_matches_predict_batch(app, legacy_models, records):
+    [(status, result)] = _run(app, ('POST', '/predict', {'model': 'xgboost', 'input': records[0]}))
+    expected = _expected(legacy_models, records[:1], 'xgboost')
+
+    assert status == 200
+    assert result['prediction'] == expected['prediction'][0]
+    assert result['risk_level'] == expected['risk_level'][0]
+    assert result['probability'] == pytest.approx(expected['probability'][0], abs=1e-12)
+    assert result['model_version'] == legacy_models.version
+
+
+@pytest.mark.parametrize('name', ['logistic_regression', 'xgboost', 'neural_network'])
+def test_batch_prediction_matches_predict_batch(app, legacy_models, records, name):
+    [(status, body)] = _run(app, ('POST', '/predict/batch', {'model': name, 'inputs': records[:50]}))
+    expected = _expected(legacy_models, records[:50], name)
+
+    assert status == 200
+    np.testing.assert_allclose([r['probability'] for r in body['results']], expected['probability'], atol=1e-12)
+    assert [r['prediction'] for r in body['results']] == expected['prediction'].tolist()
+
+
+def test_concurrent_requests_are_coalesced(app, legacy_models, records):
+    responses = _run(app, *(('POST', '/predict', {'model': 'xgboost', 'input': r}) for r in records[:20]))
+    expected = _expected(legacy_models, records[:20], 'xgboost')
+
+    assert [status for status, _ in responses] == [200] * 20
+    np.testing.assert_allclose([r['probability'] for _, r in responses], expected['probability'], atol=1e-12)
+    assert app.batchers['xgboost'].batches < 20
+    assert app.batchers['xgboost'].rows == 20
+
+
+def test_batches_never_exceed_max_batch_size(legacy_models, records):
+    app = ScoringService(legacy_models, window_ms=20, max_batch_size=8, warm_up=False)
+    batcher = app.batchers['xgboost']
+    sizes = []
+    score_fn = batcher.score_fn
+    batcher.score_fn = lambda batch: sizes.append(len(batch)) or score_fn(batch)
+
+    requests = [('POST', '/predict/batch', {'model': 'xgboost', 'inputs': records[:21]})]
+    requests += [('POST', '/predict/batch', {'model': 'xgboost', 'inputs': records[21:26]}),
+                 ('POST', '/predict/batch', {'model': 'xgboost', 'inputs': records[26:31]})]
+    requests += [('POST', '/predict', {'model': 'xgboost', 'input': r}) for r in records[31:40]]
+    responses = _run(app, *requests)
+    expected = _expected(legacy_models, records[:40], 'xgboost')['probability']
+
+    assert max(sizes) <= 8 and sum(sizes) == 40
+    probabilities = [r['probability'] for r in responses[0][1]['results'] + responses[1][1]['results']
+                     + responses[2][1]['results']] + [r['probability'] for _, r in responses[3:]]
+    np.testing.assert_allclose(probabilities, expected, atol=1e-12)
+
+
+def test_validation_errors(app, records):
+    bad = dict(records[0], time_in_hospital='three', race='Martian')
+    (status, result), (batch_status, body) = _run(
+        app,
+        ('POST', '/predict', {'model': 'xgboost', 'input': bad}),
+        ('POST', '/predict/batch', {'model': 'xgboost', 'inputs': [records[1], bad]}),
+    )
+
+    assert status == 422
+    assert result['error'] == 'Invalid input'
+    assert 'prediction' not in result
+    assert set(result['validation']['errors']) >= {'time_in_hospital', 'race'}
+
+    assert batch_status == 200
+    assert 'prediction' in body['results'][0]
+    assert body['results'][1]['error'] == 'Invalid input'
+
+
+@pytest.mark.parametrize('method, path, body, status', [
+    ('POST', '/predict', b'{not json', 400),
+    ('POST', '/predict', {'model': 'random_forest', 'input': {}}, 400),
+    ('POST', '/predict/batch', {'inputs': 'abc'}, 400),
+    ('GET', '/predict', None, 405),
+    ('GET', '/nowhere', None, 404),
+    ('GET', '/health', None, 200),
+])
+def test_request_errors(app, method, path, body, status):
+    [(actual, _)] = _run(app, (method, path, body))
+    assert actual == status
+
+
+class _Watcher:
+    def __init__(self, current):
+        self.current = current
+
+
+def test_drift_monitor_follows_reloads(legacy_models, models_dir, records):
+    path = os.path.join(models_dir, 'preprocessing_pipeline.pkl')
+    preprocessing = dict(legacy_models['preprocessing'])
+    preprocessing['scaler'] = copy.deepcopy(preprocessing['scaler'])
+    preprocessing['scaler'].mean_ = preprocessing['scaler'].mean_ + 1.0
+    joblib.dump(preprocessing, path)
+    reloaded = open_models(models_dir, use_bundle=False)
+
+    watcher = _Watcher(legacy_models)
+    app = ScoringService(watcher, window_ms=20, warm_up=False,
+                         drift_monitor=DriftMonitor(legacy_models['preprocessing']))
+    _run(app, ('POST', '/predict', {'model': 'xgboost', 'input': records[0]}))
+    assert app.drift_monitor.rows == 1
+
+    watcher.current = reloaded
+    [_, (status, snapshot)] = _run(app, ('POST', '/predict', {'model': 'xgboost', 'input': records[1]}),
+                                   ('GET', '/drift'))
+    assert status == 200
+    assert snapshot['rows'] == 1
+    np.testing.assert_array_equal(app.drift_monitor._raw_mean, preprocessing['scaler'].mean_)
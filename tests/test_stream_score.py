@@ -0,0 +1,112 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from utils import stream_score
+from utils.stream_score import StreamScorer
+
+from conftest import random_records
+
+
+def _write_feed(path, records, extra_lines=()):
+    with open(path, 'wb') as f:
+        for record in records:
+            f.write(json.dumps(record).encode() + b'\n')
+        for line in extra_lines:
+            f.write(line)
+    return os.path.getsize(path)
+
+
+def _drain(feed, output, models):
+    scorer = StreamScorer(feed, output, models, ['xgboost'], max_batch_rows=64, keep_columns=['encounter_id'])
+    try:
+        return scorer.run(once=True), scorer.checkpoint
+    finally:
+        scorer.close()
+
+
+def test_invalid_records_are_scored_and_flagged(tmp_path, legacy_models):
+    records = [dict(r, encounter_id=i) for i, r in enumerate(random_records(100))]
+    records[10]['time_in_hospital'] = 'three'
+    records[20]['race'] = 'Martian'
+    extra = [
+        b'{"encounter_id": 100,\r"age_group": "Age_60_plus"}\n',   # bare \r is JSON whitespace
+        b'not json\n',
+    ]
+    feed, output = str(tmp_path / 'feed.jsonl'), str(tmp_path / 'scores.csv')
+    size = _write_feed(feed, records, extra)
+
+    stats, checkpoint = _drain(feed, output, legacy_models)
+    out = pd.read_csv(output)
+
+    assert stats['rows'] == 101 and stats['skipped_lines'] == 1 and stats['rejected_rows'] == 0
+    assert checkpoint.offsets == {'feed.jsonl': size}
+    assert out['encounter_id'].tolist() == list(range(101))
+    errors = out.set_index('encounter_id')['input_errors']
+    assert 'time_in_hospital' in errors[10] and 'race' in errors[20]
+    assert out['xgboost_probability'].between(0, 1).all()
+    assert (out['model_version'] == legacy_models.version).all()
+
+    # Nothing is scored again after a restart
+    stats, _ = _drain(feed, output, legacy_models)
+    assert stats['rows'] == 0 and len(pd.read_csv(output)) == 101
+
+
+def test_rows_that_fail_to_score_are_rejected(tmp_path, legacy_models, monkeypatch):
+    score_chunk = stream_score.score_chunk
+
+    def failing_score_chunk(models_data, chunk, *args, **kwargs):
+        if (chunk['encounter_id'] == 7).any():
+            raise ValueError('poison')
+        return score_chunk(models_data, chunk, *args, **kwargs)
+
+    monkeypatch.setattr(stream_score, 'score_chunk', failing_score_chunk)
+    records = [dict(r, encounter_id=i) for i, r in enumerate(random_records(30))]
+    feed, output = str(tmp_path / 'feed.jsonl'), str(tmp_path / 'scores.jsonl')
+    size = _write_feed(feed, records)
+
+    stats, checkpoint = _drain(feed, output, legacy_models)
+    with open(output + '.rejects.jsonl') as f:
+        rejects = [json.loads(line) for line in f]
+
+    assert stats['rows'] == 29 and stats['rejected_rows'] == 1
+    assert [r['error'] for r in rejects] == ['poison']
+    assert rejects[0]['source'] == 'feed.jsonl'
+    assert rejects[0]['offset'] == sum(len(json.dumps(r)) + 1 for r in records[:7])
+    assert checkpoint.offsets == {'feed.jsonl': size}
+    assert checkpoint.rejects_bytes == os.path.getsize(output + '.rejects.jsonl')
+    assert 7 not in pd.read_json(output, lines=True)['encounter_id'].tolist()
+
+
+def test_malformed_csv_lines_are_skipped(tmp_path, legacy_models):
+    feed, output = str(tmp_path / 'feed.csv'), str(tmp_path / 'scores.csv')
+    with open(feed, 'w') as f:
+        f.write('encounter_id,time_in_hospital\n1,3\n2,"unterminated\n3,5\n')
+    stats, checkpoint = _drain(feed, output, legacy_models)
+    assert checkpoint.offsets == {'feed.csv': os.path.getsize(feed)}
+    assert stats['rows'] == 2 and stats['skipped_lines'] == 1
+
+
+@pytest.mark.parametrize('body, kept, skipped', [
+    ('1,[50-60)\n\n2,[60-70)\n \n4,[70-80)\n', [1, 2, 4], 2),
+    ('1,[50-60)\n\n2,[60-70)\n3,"unterminated\n4,[70-80)\n', [1, 2, 4], 2),
+])
+def test_blank_csv_lines_are_skipped(tmp_path, legacy_models, body, kept, skipped):
+    feed, output = str(tmp_path / 'feed.csv'), str(tmp_path / 'scores.csv')
+    with open(feed, 'w') as f:
+        f.write('encounter_id,age\n' + body)
+    stats, checkpoint = _drain(feed, output, legacy_models)
+    out = pd.read_csv(output)
+
+    assert checkpoint.offsets == {'feed.csv': os.path.getsize(feed)}
+    assert stats['rows'] == len(kept) and stats['skipped_lines'] == skipped
+    assert out['encounter_id'].tolist() == kept
+    with open(feed, 'rb') as f:
+        data = f.read()
+    assert out['offset'].tolist() == [data.index(f'\n{i},'.encode()) + 1 for i in kept]
+
+    # A restart resumes after them instead of failing on the same bytes
+    stats, _ = _drain(feed, output, legacy_models)
+    assert stats['rows'] == 0
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from utils.preprocessor import preprocess_batch
+from utils.tree_engine import TreeEnsemble
+
+
+@pytest.fixture(scope='module')
+def xgboost(legacy_models):
+    model = legacy_models['xgboost']['model']
+    return model, TreeEnsemble.from_xgboost(model)
+
+
+def _random_rows(n, n_features, seed, missing=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(scale=2.0, size=(n, n_features))
+    X[rng.random(X.shape) < missing] = np.nan
+    return X
+
+
+@pytest.mark.parametrize('n_rows', [1, 2, 7, 64, 1000])
+@pytest.mark.parametrize('missing', [0.0, 0.2])
+def test_matches_booster_on_random_rows(xgboost, n_rows, missing):
+    model, trees = xgboost
+    X = _random_rows(n_rows, model.n_features_in_, seed=n_rows, missing=missing)
+    np.testing.assert_allclose(trees.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+
+def test_matches_booster_on_preprocessed_records(xgboost, records, legacy_models):
+    model, trees = xgboost
+    X = preprocess_batch(records, legacy_models['preprocessing'])
+    np.testing.assert_allclose(trees.predict_proba(X), model.predict_proba(X), atol=1e-6)
+    for i in range(5):
+        np.testing.assert_allclose(trees.predict_proba(X[i:i + 1]), model.predict_proba(X[i:i + 1]), atol=1e-6)
+
+
+def test_rows_with_only_missing_values_follow_default_directions(xgboost):
+    model, trees = xgboost
+    X = np.full((3, model.n_features_in_), np.nan)
+    np.testing.assert_allclose(trees.predict_proba(X), model.predict_proba(X), atol=1e-6)
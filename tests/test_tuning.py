@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from utils.calibration import calibrate, fit_calibration
+from utils.tuning import holdout_split, tune_model
+
+
+@pytest.fixture
+def outcomes():
+    rng = np.random.default_rng(3)
+    probability = rng.random(4000)
+    labels = rng.random(4000) < probability ** 2
+    return probability, labels
+
+
+def test_holdout_split_is_stratified_and_seeded(outcomes):
+    _, labels = outcomes
+    held_out = holdout_split(labels, 0.25, seed=1)
+
+    assert held_out[labels].sum() == round(0.25 * labels.sum())
+    assert held_out[~labels].sum() == round(0.25 * (~labels).sum())
+    np.testing.assert_array_equal(held_out, holdout_split(labels, 0.25, seed=1))
+    assert not np.array_equal(held_out, holdout_split(labels, 0.25, seed=2))
+    with pytest.raises(ValueError):
+        holdout_split(labels, 1.0)
+
+
+@pytest.mark.parametrize('calibration', ['platt', 'isotonic'])
+def test_fits_on_one_part_and_reports_on_the_other(outcomes, calibration):
+    from sklearn.metrics import roc_auc_score
+
+    probability, labels = outcomes
+    metadata = {'optimal_threshold': 0.5}
+    updated, report, curve = tune_model(probability, labels, metadata, calibration, band_shares=[0.5, 0.3, 0.2],
+                                        holdout=0.3, seed=4)
+    held_out = holdout_split(labels, 0.3, seed=4)
+    fitted = fit_calibration(probability[~held_out], labels[~held_out], calibration)
+    assert updated['calibration'] == fitted
+
+    calibrated = calibrate(probability[held_out], fitted)
+    test_labels = labels[held_out]
+    assert report['holdout_rows'] == held_out.sum() == curve['flagged'].iloc[-1]
+    assert report['brier']['calibrated'] == pytest.approx(np.mean((calibrated - test_labels) ** 2))
+    assert report['roc_auc'] == pytest.approx(roc_auc_score(test_labels, calibrated))
+    assert updated['tuning']['roc_auc'] == report['roc_auc']
+
+    f1 = report['optima']['f1']
+    flagged = calibrated >= f1['threshold']
+    assert f1['threshold'] == updated['optimal_threshold']
+    assert f1['flagged'] == flagged.sum()
+    assert f1['recall'] == pytest.approx((flagged & test_labels).sum() / test_labels.sum())
+    assert sum(band['patients'] for band in report['bands'].values()) == held_out.sum()
+
+
+def test_needs_both_outcomes_in_the_holdout():
+    labels = np.zeros(100, dtype=bool)
+    labels[0] = True
+    with pytest.raises(ValueError, match='held-out'):
+        tune_model(np.linspace(0, 1, 100), labels, {}, 'platt', holdout=0.3)
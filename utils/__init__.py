@@ -2,14 +2,29 @@
 Utility functions for Diabetes Readmission Prediction App
 """
 
-from .model_loader import load_models, get_feature_names
-from .preprocessor import preprocess_input
-from .predictor import predict_readmission, get_risk_message
+from .model_loader import load_models, get_feature_names, ModelRegistry
+from .preprocessor import preprocess_input, preprocess_batch, FeatureLayout
+from .predictor import predict_readmission, predict_batch, predict_cached, get_risk_message
+from .prediction_cache import PredictionCache
+from .explainer import explain_batch, explain_prediction
+from .cohort import cohort_report, stratify, threshold_sweep, ward_summary
 
 __all__ = [
     'load_models',
     'get_feature_names',
+    'ModelRegistry',
     'preprocess_input',
+    'preprocess_batch',
+    'FeatureLayout',
     'predict_readmission',
-    'get_risk_message'
+    'predict_batch',
+    'predict_cached',
+    'PredictionCache',
+    'get_risk_message',
+    'explain_batch',
+    'explain_prediction',
+    'cohort_report',
+    'stratify',
+    'threshold_sweep',
+    'ward_summary'
 ]
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+Headless bulk scoring of encounter files
+
+Usage:
+    python -m utils.batch_score in.csv out.parquet --model xgboost
+    python -m utils.batch_score in.parquet out.csv --model all --keep-columns encounter_id
+    python -m utils.batch_score in.csv out.csv --validate
+    python -m utils.batch_score in.parquet out.parquet --model all --precision float32
+
+Input rows use the same keys as the app's user_input dict. Files are read and
+written in fixed-size chunks so memory stays bounded regardless of file size.
+With --validate, rows are first checked against the input schema (utils.schema):
+input_errors / input_warnings name each row's flagged fields, and per-field
+counts are reported at the end. --precision float32 / int8 scores in reduced
+precision (see utils.precision, which also checks a mode against float64).
+Every output row carries the model_version (release) that scored it.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import pandas as pd
+
+from .model_loader import load_models
+from .precision import DEFAULT_PRECISION, PRECISIONS, encode, reduced_models
+from .predictor import predict_batch, ENSEMBLE
+from .schema import ERROR_KINDS, WARNING_KINDS, validate_batch
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network']
+
+
+def read_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if os.path.splitext(path)[1].lower() == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """
+    Append scored chunks to a CSV or Parquet file without holding them in memory
+
+    Parquet output takes its schema from the first chunk, with column_types
+    (column -> pyarrow type) overriding the inferred types and all-null columns
+    written as strings. Later chunks are cast to that schema, so a column that
+    is empty in one chunk and filled in the next keeps one type.
+    """
+
+    def __init__(self, path, column_types=None):
+        self.path = path
+        self.is_parquet = os.path.splitext(path)[1].lower() == '.parquet'
+        self.column_types = column_types or {}
+        self.schema = None
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, df):
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._writer is None:
+                self.schema = pa.schema([
+                    pa.field(field.name, self.column_types.get(
+                        field.name, pa.string() if pa.types.is_null(field.type) else field.type))
+                    for field in table.schema
+                ])
+                self._writer = pq.ParquetWriter(self.path, self.schema)
+            self._writer.write_table(table.select(self.schema.names).cast(self.schema))
+        else:
+            df.to_csv(self.path, mode='a' if self._wrote_header else 'w', header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def output_column_types(input_path, keep_columns):
+    """
+    Parquet output types for model_version and the kept columns
+
+    Kept columns take their type from a Parquet input's schema. CSV input is
+    typed chunk by chunk, so there they are written as strings.
+    """
+    import pyarrow as pa
+    types = {'model_version': pa.string()}
+    if os.path.splitext(input_path)[1].lower() == '.parquet':
+        import pyarrow.parquet as pq
+        schema = pq.read_schema(input_path)
+        types.update({col: schema.field(col).type for col in keep_columns if col in schema.names})
+    else:
+        types.update({col: pa.string() for col in keep_columns})
+    return types
+
+
+def score_chunk(models_data, chunk, model_names, keep_columns=(), validate=False, precision=DEFAULT_PRECISION):
+    """
+    Score one DataFrame chunk with every selected model into an output DataFrame
+
+    With validate=True the chunk is scored from its normalized records, the output
+    gains input_errors / input_warnings columns, and out.attrs['validation'] holds
+    the chunk's ValidationResult.summary(). A reduced precision expects models_data
+    from utils.precision.reduced_models.
+    """
+    records = chunk
+    if validate:
+        validation = validate_batch(chunk, models_data['preprocessing'])
+        records = validation.records
+    feature_matrix = encode(records, models_data['preprocessing'], precision)
+
+    out = pd.DataFrame({col: chunk[col].to_numpy() for col in keep_columns})
+    if validate:
+        out['input_errors'] = validation.labels(ERROR_KINDS)
+        out['input_warnings'] = validation.labels(WARNING_KINDS)
+        out.attrs['validation'] = validation.summary()
+    for model_name in model_names:
+        model_data = models_data if model_name == ENSEMBLE else models_data[model_name]
+        result = predict_batch(model_data, feature_matrix, model_name)
+        for key in ['probability', 'prediction', 'risk_level']:
+            out[f'{model_name}_{key}'] = result[key]
+    return out
+
+
+def _scored_chunks_prefork(chunks, model_names, models_data, keep_columns, workers, validate=False,
+                           precision=DEFAULT_PRECISION):
+    """Score chunks on forked workers, in order, with at most 2 chunks in flight per worker"""
+    from .prefork import PreforkPool
+
+    with PreforkPool(models_data, workers, model_names) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk, model_names, keep_columns, validate, precision))
+            if len(pending) >= 2 * pool.workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def _merge_counts(total, counts):
+    """Add nested {key: count or {key: count}} dicts into total"""
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            _merge_counts(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def score_file(input_path, output_path, model_names, models_data, chunk_size=50000, keep_columns=None, log=None,
+               workers=1, validate=False, precision=DEFAULT_PRECISION):
+    """
+    Stream input_path through the selected models and write results to output_path
+
+    With workers > 1, chunks are scored in pre-forked worker processes that share
+    the loaded models (see utils.prefork); output order is unchanged. Every
+    row records the model_version that scored it (the registry's version, with
+    the precision appended when reduced). With
+    validate=True every chunk is checked against the input schema first and the
+    file-wide validation summary is passed to log at the end. precision 'float32'
+    or 'int8' scores with reduced_models(models_data, precision).
+
+    Returns:
+        Tuple of (rows scored, elapsed seconds)
+    """
+
+    keep_columns = keep_columns or []
+    writer = ChunkWriter(output_path)
+    if writer.is_parquet:
+        writer.column_types = output_column_types(input_path, keep_columns)
+    n_rows = 0
+    start = time.perf_counter()
+
+    version = getattr(models_data, 'version', None)
+    if precision != DEFAULT_PRECISION:
+        models_data = reduced_models(models_data, precision, model_names)
+        version = f"{version}-{precision}"
+
+    chunks = read_chunks(input_path, chunk_size)
+    if workers > 1:
+        scored = _scored_chunks_prefork(chunks, model_names, models_data, keep_columns, workers, validate, precision)
+    else:
+        scored = (score_chunk(models_data, chunk, model_names, keep_columns, validate, precision) for chunk in chunks)
+
+    validation = {}
+    try:
+        for out in scored:
+            if validate:
+                _merge_counts(validation, out.attrs.pop('validation'))
+            out.insert(len(keep_columns), 'model_version', version)
+            writer.write(out)
+            n_rows += len(out)
+            if log is not None:
+                log(f"scored {n_rows:,} rows")
+    finally:
+        writer.close()
+
+    if validate and log is not None:
+        log(f"validation: {json.dumps(validation)}")
+
+    return n_rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an encounter file with the readmission models")
+    parser.add_argument('input', help="Input .csv or .parquet file")
+    parser.add_argument('output', help="Output .csv or .parquet file")
+    parser.add_argument('--model', default='xgboost', choices=MODEL_NAMES + [ENSEMBLE, 'all'])
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk (default: 50000)")
+    parser.add_argument('--keep-columns', default='', help="Comma-separated input columns to copy to the output")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes sharing one model load (default: 1)")
+    parser.add_argument('--validate', action='store_true',
+                        help="Check rows against the input schema and add input_errors/input_warnings columns")
+    parser.add_argument('--precision', choices=PRECISIONS, default=DEFAULT_PRECISION,
+                        help="Scoring precision (default: float64; check others with python -m utils.precision)")
+    args = parser.parse_args(argv)
+
+    models_data = load_models(args.models_dir)
+    if models_data is None:
+        print("Failed to load models", file=sys.stderr)
+        return 1
+
+    model_names = MODEL_NAMES if args.model == 'all' else [args.model]
+    keep_columns = [col for col in args.keep_columns.split(',') if col]
+
+    n_rows, elapsed = score_file(
+        args.input, args.output, model_names, models_data,
+        chunk_size=args.chunk_size,
+        keep_columns=keep_columns,
+        log=lambda msg: print(msg, file=sys.stderr),
+        workers=args.workers,
+        validate=args.validate,
+        precision=args.precision,
+    )
+
+    rate = n_rows / elapsed if elapsed > 0 else float('inf')
+    print(f"Scored {n_rows:,} rows with {', '.join(model_names)} in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Single-file model bundle loaded with memory-mapped arrays
+
+The bundle is an uncompressed .npz holding everything the scoring stack needs:
+scaler parameters, feature names, logistic regression coefficients, the XGBoost
+booster in native UBJSON plus its flattened trees, the folded neural network
+weights, and the metadata/comparison JSON. Because members are stored rather
+than deflated, each array is mapped straight from the file, so several worker
+processes serving the same bundle share its pages instead of each holding a
+heap copy.
+
+Every member is covered by a SHA-256 content hash, and each model carries a
+short version derived from its own members. The bundle also records the
+SHA-256 of every legacy file it was exported from; the model loader refuses a
+bundle whose sources have changed since (see stale_sources), so a retrained
+model or edited metadata file is never shadowed by an old export.
+
+Export from the legacy artifacts (checks predictions against them afterwards):
+    python -m utils.bundle models models/readmission_bundle.npz
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import zipfile
+
+import numpy as np
+
+from .nn_engine import NumpyMLP, fold_keras_model
+
+BUNDLE_FILE = 'readmission_bundle.npz'
+BUNDLE_FORMAT = 1
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network']
+
+# TreeEnsemble attributes stored as arrays, in constructor order
+TREE_ARRAYS = ['feature', 'threshold', 'left', 'right', 'default_left', 'value', 'roots']
+
+# Members the preprocessing pipeline is rebuilt from (plus the feature layout in meta)
+PREPROCESSING_MEMBERS = ['scaler_mean', 'scaler_scale', 'scaler_var']
+
+# Zip local file header; the last two fields are the file name and extra field lengths
+_ZIP_LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+
+def _json_array(obj):
+    return np.frombuffer(json.dumps(obj, sort_keys=True).encode(), dtype=np.uint8)
+
+
+def _digest(arrays, names):
+    digest = hashlib.sha256()
+    for name in sorted(names):
+        array = np.ascontiguousarray(arrays[name])
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def model_members(arrays, name):
+    """Names of the bundle arrays that belong to one model"""
+    prefix = {'logistic_regression': 'lr_', 'xgboost': 'xgb_', 'neural_network': 'nn_'}[name]
+    return [key for key in arrays if key.startswith(prefix)]
+
+
+def content_hash(arrays):
+    """SHA-256 over every member except the stored hash itself"""
+    return _digest(arrays, [key for key in arrays if key != 'content_hash'])
+
+
+def build_arrays(models_data, sources=None):
+    """
+    Flatten loaded models (a ModelRegistry or equivalent dict) into bundle arrays
+
+    sources maps each legacy file name the models were loaded from to its SHA-256
+    (see model_loader.source_digests).
+    """
+    preprocessing = models_data['preprocessing']
+    scaler = preprocessing['scaler']
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'scaler_var': np.asarray(scaler.var_, dtype=np.float64),
+    }
+
+    lr = models_data['logistic_regression']['model']
+    arrays['lr_coef'] = np.asarray(lr.coef_, dtype=np.float64)
+    arrays['lr_intercept'] = np.asarray(lr.intercept_, dtype=np.float64)
+    arrays['lr_classes'] = np.asarray(lr.classes_)
+
+    from .tree_engine import TreeEnsemble
+    xgb_entry = models_data['xgboost']
+    booster = xgb_entry['model'].get_booster()
+    arrays['xgb_booster'] = np.frombuffer(bytes(booster.save_raw('ubj')), dtype=np.uint8)
+    trees = xgb_entry.get('compiled_model') or TreeEnsemble.from_xgboost(booster)
+    for attr in TREE_ARRAYS:
+        arrays[f'xgb_tree_{attr}'] = np.ascontiguousarray(getattr(trees, attr))
+
+    nn = models_data['neural_network']['model']
+    if not isinstance(nn, NumpyMLP):
+        nn = fold_keras_model(nn)
+    # float64 so NumpyMLP uses the mapped arrays as-is instead of converting them
+    for i, (kernel, bias) in enumerate(zip(nn.kernels, nn.biases)):
+        arrays[f'nn_kernel_{i}'] = np.asarray(kernel, dtype=np.float64)
+        arrays[f'nn_bias_{i}'] = np.asarray(bias, dtype=np.float64)
+
+    models = {
+        name: {'metadata': models_data[name]['metadata']}
+        for name in MODEL_NAMES
+    }
+    models['logistic_regression']['params'] = {
+        key: value for key, value in lr.get_params().items()
+        if value is None or isinstance(value, (bool, int, float, str))
+    }
+    models['xgboost']['tree'] = {'base_margin': trees.base_margin, 'max_depth': trees.max_depth}
+    models['neural_network']['activations'] = list(nn.activations)
+    for name in MODEL_NAMES:
+        member_arrays = {key: arrays[key] for key in model_members(arrays, name)}
+        member_arrays['metadata'] = _json_array(models[name])
+        models[name]['version'] = _digest(member_arrays, member_arrays)[:12]
+
+    meta = {
+        'format': BUNDLE_FORMAT,
+        'feature_names': list(preprocessing['feature_names']),
+        'n_scaled': int(getattr(scaler, 'n_features_in_', len(arrays['scaler_mean']))),
+        'optimal_threshold_xgb': float(preprocessing.get('optimal_threshold_xgb', 0.5)),
+        'comparison': models_data['comparison'],
+        'models': models,
+        'sources': dict(sources or {}),
+    }
+    arrays['meta'] = _json_array(meta)
+    arrays['content_hash'] = np.frombuffer(content_hash(arrays).encode(), dtype=np.uint8)
+    return arrays
+
+
+def write_bundle(arrays, path):
+    """
+    Write arrays as an uncompressed .npz (np.savez stores members without deflate)
+
+    The file is written next to path and renamed over it, so processes that
+    still map a previous bundle at path keep reading the old, unchanged file.
+    """
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _map_members(path):
+    """Memory-map every .npy member of an uncompressed .npz, read-only"""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Bundle member {info.filename} is compressed and cannot be mapped")
+
+            f.seek(info.header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(f.read(_ZIP_LOCAL_HEADER.size))
+            name_length, extra_length = header[-2:]
+            f.seek(info.header_offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"Bundle member {info.filename} holds Python objects")
+
+            name = info.filename[:-len('.npy')]
+            order = 'F' if fortran_order else 'C'
+            if int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype, order=order)
+            else:
+                # Plain ndarray view of the mapping: avoids memmap subclass overhead on every take()
+                arrays[name] = np.asarray(np.memmap(f, dtype=dtype, mode='r', offset=f.tell(), shape=shape, order=order))
+    return arrays
+
+
+class Bundle:
+    """An opened bundle: parsed metadata plus memory-mapped arrays"""
+
+    def __init__(self, path, arrays):
+        self.path = path
+        self.arrays = arrays
+        self.meta = json.loads(arrays['meta'].tobytes())
+        if self.meta.get('format') != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle format {self.meta.get('format')} in {path}")
+        self.content_hash = arrays['content_hash'].tobytes().decode()
+
+    @classmethod
+    def open(cls, path, verify=False):
+        """Map a bundle file; verify=True re-hashes every member (touches all pages)"""
+        bundle = cls(path, _map_members(path))
+        if verify:
+            bundle.verify()
+        return bundle
+
+    def verify(self):
+        actual = content_hash(self.arrays)
+        if actual != self.content_hash:
+            raise ValueError(f"Bundle {self.path} is corrupt: content hash {actual} != {self.content_hash}")
+
+    def stale_sources(self, digests):
+        """
+        Names of legacy files that differ from the ones the bundle was exported from
+
+        digests maps the files currently present to their SHA-256. A recorded
+        source that is absent does not count: the bundle may be deployed alone.
+        """
+        recorded = self.meta.get('sources', {})
+        return sorted(name for name, digest in digests.items() if recorded.get(name) != digest)
+
+    def model_meta(self, name):
+        return self.meta['models'][name]
+
+    def preprocessing_version(self):
+        """Short hash of the scaler parameters and feature layout"""
+        arrays = {name: self.arrays[name] for name in PREPROCESSING_MEMBERS}
+        arrays['layout'] = _json_array([self.meta['feature_names'], self.meta['n_scaled']])
+        return _digest(arrays, arrays)[:12]
+
+    def preprocessing(self):
+        """Preprocessing pipeline dict equivalent to preprocessing_pipeline.pkl"""
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler()
+        scaler.mean_ = self.arrays['scaler_mean']
+        scaler.scale_ = self.arrays['scaler_scale']
+        scaler.var_ = self.arrays['scaler_var']
+        scaler.n_features_in_ = self.meta['n_scaled']
+        return {
+            'scaler': scaler,
+            'feature_names': list(self.meta['feature_names']),
+            'optimal_threshold_xgb': self.meta['optimal_threshold_xgb'],
+        }
+
+    def logistic_regression(self):
+        from sklearn.linear_model import LogisticRegression
+        model = LogisticRegression(**self.model_meta('logistic_regression')['params'])
+        model.coef_ = self.arrays['lr_coef']
+        model.intercept_ = self.arrays['lr_intercept']
+        model.classes_ = self.arrays['lr_classes']
+        model.n_features_in_ = model.coef_.shape[1]
+        return model
+
+    def xgboost(self):
+        """Native XGBClassifier rebuilt from the stored booster"""
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(bytearray(self.arrays['xgb_booster']))
+        return model
+
+    def tree_ensemble(self):
+        from .tree_engine import TreeEnsemble
+        tree = self.model_meta('xgboost')['tree']
+        return TreeEnsemble(
+            *(self.arrays[f'xgb_tree_{attr}'] for attr in TREE_ARRAYS),
+            base_margin=tree['base_margin'],
+            max_depth=tree['max_depth'],
+        )
+
+    def neural_network(self):
+        activations = self.model_meta('neural_network')['activations']
+        kernels = [self.arrays[f'nn_kernel_{i}'] for i in range(len(activations))]
+        biases = [self.arrays[f'nn_bias_{i}'] for i in range(len(activations))]
+        return NumpyMLP(kernels, biases, activations)
+
+
+def export_bundle(models_data, path, sources=None):
+    """Write the bundle for loaded models and return the content hash"""
+    arrays = build_arrays(models_data, sources)
+    write_bundle(arrays, path)
+    return arrays['content_hash'].tobytes().decode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the models into a single memory-mappable bundle")
+    parser.add_argument('models_dir', help="Directory with the legacy .pkl/.h5/.json artifacts")
+    parser.add_argument('output', help=f"Output bundle (conventionally <models_dir>/{BUNDLE_FILE})")
+    parser.add_argument('--check-rows', type=int, default=10000,
+                        help="Random rows used to compare predictions with the legacy loader (default: 10000, 0 to skip)")
+    args = parser.parse_args(argv)
+
+    from .model_loader import load_models, open_bundle, resolve_artifacts, source_digests
+    from .predictor import predict_batch
+
+    legacy = load_models(args.models_dir, use_bundle=False)
+    if legacy is None:
+        print(f"Failed to load models from {args.models_dir}", file=sys.stderr)
+        return 1
+
+    digest = export_bundle(legacy, args.output, source_digests(resolve_artifacts(args.models_dir)[0]))
+    print(f"Wrote {args.output} (content hash {digest})", file=sys.stderr)
+
+    bundled = open_bundle(args.output, verify=True)
+    if not args.check_rows:
+        return 0
+
+    legacy_layout = legacy['preprocessing']['feature_layout']
+    bundled_layout = bundled['preprocessing']['feature_layout']
+    status = 0
+    if (legacy_layout.feature_names != bundled_layout.feature_names
+            or not np.array_equal(legacy_layout.scale_mean, bundled_layout.scale_mean)
+            or not np.array_equal(legacy_layout.scale_std, bundled_layout.scale_std)):
+        print("Preprocessing parameters differ from the legacy pipeline", file=sys.stderr)
+        status = 1
+
+    X = np.random.default_rng(0).normal(size=(args.check_rows, legacy_layout.n_features))
+    for name in MODEL_NAMES:
+        # Small batches take the compiled tree path for XGBoost, so check both sizes
+        for rows in sorted({min(64, len(X)), len(X)}):
+            expected = predict_batch(legacy[name], X[:rows], name)
+            actual = predict_batch(bundled[name], X[:rows], name)
+            diff = float(np.abs(expected['probability'] - actual['probability']).max())
+            mismatched = int((expected['prediction'] != actual['prediction']).sum())
+            print(f"{name} ({rows} rows): max abs difference {diff:.2e}, "
+                  f"{mismatched} differing predictions", file=sys.stderr)
+            if diff > 1e-6 or mismatched:
+                status = 1
+
+    if status:
+        print("Bundle predictions do not match the legacy artifacts", file=sys.stderr)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Cohort-level risk stratification and reporting
+
+Vectorized counterparts of the per-patient helpers in predictor: risk bands,
+band counts, risk messages, precision/recall threshold sweeps and per-ward
+summaries are all computed with NumPy array operations over the whole cohort.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .predictor import ENSEMBLE, RISK_LEVELS, RISK_MESSAGES, RISK_THRESHOLDS, assign_risk, predict_batch
+
+DEFAULT_SWEEP = np.round(np.arange(0.05, 1.0, 0.05), 2)
+
+
+def stratify(probability, band_thresholds=None):
+    """
+    Risk bands for a cohort (band_thresholds: cut-offs, default RISK_THRESHOLDS)
+
+    Returns:
+        Dictionary with per-patient band index and risk_level, plus band counts
+        and fractions keyed by RISK_LEVELS
+    """
+    probability = np.asarray(probability, dtype=np.float64)
+    risk = assign_risk(probability, band_thresholds)
+    counts = np.bincount(risk, minlength=len(RISK_LEVELS))
+    total = max(len(probability), 1)
+    return {
+        'risk': risk,
+        'risk_level': RISK_LEVELS[risk],
+        'counts': dict(zip(RISK_LEVELS.tolist(), counts.tolist())),
+        'fractions': dict(zip(RISK_LEVELS.tolist(), (counts / total).tolist())),
+    }
+
+
+def risk_messages(probability, risk=None):
+    """get_risk_message for every patient, built with vectorized string operations"""
+    probability = np.asarray(probability, dtype=np.float64)
+    risk = assign_risk(probability) if risk is None else np.asarray(risk)
+    # The shared templates split around the formatted percentage
+    parts = [RISK_MESSAGES[level].split('{percent}') for level in RISK_LEVELS]
+    prefixes = np.array([prefix for prefix, _ in parts])
+    suffixes = np.array([suffix for _, suffix in parts])
+    percent = np.char.mod('%.1f', probability * 100)
+    return np.char.add(np.char.add(prefixes[risk], percent), suffixes[risk])
+
+
+def threshold_curve(probability, labels):
+    """
+    Confusion counts at every distinct probability (positive when p >= threshold)
+
+    Covers every threshold that changes a decision: the scores are sorted once
+    in descending order and the counts at the end of each run of equal scores
+    come from a cumulative sum. threshold_sweep reads fixed thresholds off it.
+
+    Returns:
+        DataFrame with one row per distinct probability, highest first
+    """
+    probability = np.asarray(probability, dtype=np.float64)
+    labels = np.asarray(labels).astype(bool)
+
+    order = np.argsort(-probability, kind='stable')
+    sorted_probability = probability[order]
+    ends = np.append(np.flatnonzero(np.diff(sorted_probability)), len(probability) - 1)
+    if len(probability) == 0:
+        ends = np.empty(0, dtype=np.intp)
+
+    n = len(probability)
+    n_positive = int(labels.sum())
+    tp = np.cumsum(labels[order])[ends]
+    flagged = ends + 1
+    fp = flagged - tp
+    fn = n_positive - tp
+    tn = n - flagged - fn
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = tp / flagged
+        recall = tp / n_positive if n_positive else np.zeros(len(tp))
+        fpr = fp / (n - n_positive) if n > n_positive else np.zeros(len(fp))
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return pd.DataFrame({
+        'threshold': sorted_probability[ends],
+        'flagged': flagged,
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'tn': tn,
+        'precision': precision,
+        'recall': recall,
+        'fpr': fpr,
+        'f1': f1,
+    })
+
+
+def threshold_sweep(probability, labels, thresholds=None):
+    """
+    Confusion counts, precision, recall and F1 at each threshold (positive when p >= t)
+
+    Read off threshold_curve: the counts at t are those at the lowest distinct
+    probability still >= t, found with one searchsorted over the curve.
+
+    Returns:
+        DataFrame with one row per threshold
+    """
+    labels = np.asarray(labels).astype(bool)
+    thresholds = DEFAULT_SWEEP if thresholds is None else np.asarray(thresholds, dtype=np.float64)
+    curve = threshold_curve(probability, labels)
+
+    n = len(labels)
+    n_positive = int(labels.sum())
+    # Curve thresholds descend, so negate them for searchsorted; 0 rows means nothing is flagged
+    rows = np.searchsorted(-curve['threshold'].to_numpy(), -thresholds, side='right')
+    flagged = np.concatenate([[0], curve['flagged'].to_numpy()])[rows]
+    tp = np.concatenate([[0], curve['tp'].to_numpy()])[rows]
+    fp = flagged - tp
+    fn = n_positive - tp
+    tn = n - flagged - fn
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(flagged > 0, tp / flagged, 0.0)
+        recall = np.where(n_positive > 0, tp / max(n_positive, 1), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+    return pd.DataFrame({
+        'threshold': thresholds,
+        'flagged': flagged,
+        'flagged_rate': flagged / max(n, 1),
+        'tp': tp,
+        'fp': fp,
+        'fn': fn,
+        'tn': tn,
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+    })
+
+
+def ward_summary(probability, wards, labels=None, prediction=None, band_thresholds=None):
+    """
+    Per-ward cohort summary
+
+    Args:
+        probability: Readmission probabilities
+        wards: Ward (or any grouping) label per patient
+        labels: Optional observed 30-day readmission flags
+        prediction: Optional thresholded predictions
+        band_thresholds: Risk band cut-offs (default: RISK_THRESHOLDS)
+
+    Returns:
+        DataFrame indexed by ward with patient count, mean probability, expected
+        readmissions, band counts and, when given, predicted/observed rates
+    """
+    probability = np.asarray(probability, dtype=np.float64)
+    ward_names, ward_index = np.unique(np.asarray(wards), return_inverse=True)
+    n_wards = len(ward_names)
+    risk = assign_risk(probability, band_thresholds)
+
+    patients = np.bincount(ward_index, minlength=n_wards)
+    expected = np.bincount(ward_index, weights=probability, minlength=n_wards)
+    bands = np.bincount(ward_index * len(RISK_LEVELS) + risk, minlength=n_wards * len(RISK_LEVELS))
+    bands = bands.reshape(n_wards, len(RISK_LEVELS))
+
+    summary = pd.DataFrame({
+        'patients': patients,
+        'mean_probability': expected / np.maximum(patients, 1),
+        'expected_readmissions': expected,
+    }, index=pd.Index(ward_names, name='ward'))
+    for i, level in enumerate(RISK_LEVELS):
+        summary[f'{level.lower()}_risk'] = bands[:, i]
+    summary['high_risk_rate'] = bands[:, -1] / np.maximum(patients, 1)
+
+    if prediction is not None:
+        flagged = np.bincount(ward_index, weights=np.asarray(prediction, dtype=np.float64), minlength=n_wards)
+        summary['predicted_positive_rate'] = flagged / np.maximum(patients, 1)
+    if labels is not None:
+        observed = np.bincount(ward_index, weights=np.asarray(labels, dtype=np.float64), minlength=n_wards)
+        summary['observed_readmissions'] = observed
+        summary['observed_rate'] = observed / np.maximum(patients, 1)
+
+    return summary
+
+
+def cohort_report(model_data, feature_matrix, model_name, wards=None, labels=None, thresholds=None):
+    """
+    Score a cohort and summarize it in one pass
+
+    Args:
+        model_data: Model entry (or all loaded models for 'ensemble'), as for predict_batch
+        feature_matrix: Preprocessed (N, 116) feature matrix
+        model_name: Model to score with
+        wards: Optional ward per patient for the per-ward summary
+        labels: Optional observed outcomes for the threshold sweep
+        thresholds: Thresholds to sweep (default: 0.05 to 0.95 in steps of 0.05)
+
+    Returns:
+        Dictionary with the predict_batch result, band counts/fractions, and
+        'sweep' / 'wards' DataFrames when labels / wards are given
+    """
+    result = predict_batch(model_data, feature_matrix, model_name)
+    probability = result['probability']
+    # The model's own band cut-offs when it was re-tuned (the ensemble has none)
+    band_thresholds = RISK_THRESHOLDS if model_name == ENSEMBLE else model_data['metadata'].get(
+        'risk_thresholds', RISK_THRESHOLDS)
+    bands = stratify(probability, band_thresholds)
+
+    report = {
+        'model': model_name,
+        'patients': len(probability),
+        'result': result,
+        'band_thresholds': np.asarray(band_thresholds).tolist(),
+        'counts': bands['counts'],
+        'fractions': bands['fractions'],
+        'mean_probability': float(probability.mean()) if len(probability) else 0.0,
+        'predicted_positive': int(result['prediction'].sum()),
+    }
+    if labels is not None:
+        report['sweep'] = threshold_sweep(probability, labels, thresholds)
+    if wards is not None:
+        report['wards'] = ward_summary(probability, wards, labels, result['prediction'], band_thresholds)
+    return report
@@ -0,0 +1,398 @@
+"""
+Online feature-drift and score-distribution monitoring
+
+DriftMonitor keeps constant-memory statistics of the scored traffic and never
+stores the rows it sees. All numbers are accumulated in one vectorized pass
+per observed batch, which costs tens of microseconds for a single request.
+It tracks:
+
+- per scaled feature (the first 33 columns, already standardized with the
+  training scaler): count, running mean and variance (merged per batch with
+  Chan's parallel update), min/max, and a fixed-grid histogram in
+  training-standard-deviation units. The histogram doubles as the quantile
+  sketch.
+- per one-hot column: how often it is set.
+- per model: a histogram of predicted probabilities.
+
+Drift is measured against a reference profile. Without one, the training
+moments from the scaler (mean 0, variance 1 in scaled space) give mean shifts
+and variance ratios. A full reference, which is the state of a monitor that
+observed the training inputs, adds PSI and KS for every feature, one-hot group
+and model score. Export a reference with:
+
+    python -m utils.drift export training_inputs.csv models/drift_reference.json
+    python -m utils.drift report todays_inputs.csv --reference models/drift_reference.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from .preprocessor import get_feature_layout
+
+REFERENCE_FILE = 'drift_reference.json'
+PROFILE_FORMAT = 1
+
+# Histogram grid for scaled features, in training standard deviations; values
+# outside [GRID_LOW, GRID_HIGH) land in an underflow / overflow bin
+GRID_LOW = -4.0
+GRID_HIGH = 12.0
+GRID_WIDTH = 0.25
+N_GRID_BINS = int(round((GRID_HIGH - GRID_LOW) / GRID_WIDTH)) + 2
+
+SCORE_BINS = 20
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Conventional PSI bands: below 0.1 stable, 0.1-0.25 moderate shift, above 0.25 major shift
+PSI_MODERATE = 0.1
+PSI_MAJOR = 0.25
+_PSI_FLOOR = 1e-4
+
+
+def psi(actual, expected):
+    """Population stability index between two histograms (counts or fractions)"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if actual.sum() == 0 or expected.sum() == 0:
+        return None
+    p = np.maximum(actual / actual.sum(), _PSI_FLOOR)
+    q = np.maximum(expected / expected.sum(), _PSI_FLOOR)
+    return float(np.sum((p - q) * np.log(p / q)))
+
+
+def ks(actual, expected):
+    """Kolmogorov-Smirnov distance between two histograms on the same bins (exact at bin edges)"""
+    actual = np.asarray(actual, dtype=np.float64)
+    expected = np.asarray(expected, dtype=np.float64)
+    if actual.sum() == 0 or expected.sum() == 0:
+        return None
+    return float(np.abs(np.cumsum(actual) / actual.sum() - np.cumsum(expected) / expected.sum()).max())
+
+
+def psi_status(value):
+    if value is None:
+        return 'n/a'
+    if value >= PSI_MAJOR:
+        return 'major'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+def _number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _one_hot_groups(layout):
+    """(name, columns) for each one-hot encoded input, columns relative to the unscaled block"""
+    groups = []
+    for key, lookup in layout.one_hot:
+        columns = sorted(set(lookup.values()))
+        # Column names are <prefix>_<category>; name the group by its prefix
+        name = next((layout.feature_names[i][:-len(category)].rstrip('_')
+                     for category, i in lookup.items() if layout.feature_names[i].endswith(category)), key)
+        groups.append((name, [i - layout.scaled.stop for i in columns]))
+    return groups
+
+
+class DriftMonitor:
+    """
+    Constant-memory running statistics of scored feature matrices and probabilities
+
+    Args:
+        preprocessing_pipeline: Loaded preprocessing pipeline (for feature names and scaler)
+        reference: Optional reference profile (a dict from DriftMonitor.profile(),
+            or a path to one saved as JSON)
+    """
+
+    def __init__(self, preprocessing_pipeline, reference=None):
+        layout = get_feature_layout(preprocessing_pipeline)
+        self.n_scaled = layout.scaled.stop
+        self.feature_names = layout.feature_names[:self.n_scaled]
+        self.one_hot_names = layout.feature_names[self.n_scaled:]
+        self.one_hot_groups = _one_hot_groups(layout)
+        # Raw-unit conversion for reporting: x = z * std + mean
+        self._raw_mean = layout.scale_mean if layout.scale_mean is not None else np.zeros(self.n_scaled)
+        self._raw_std = layout.scale_std if layout.scale_std is not None else np.ones(self.n_scaled)
+        self._training_rows = int(getattr(preprocessing_pipeline['scaler'], 'n_samples_seen_', 0) or 0)
+
+        if isinstance(reference, (str, os.PathLike)):
+            with open(reference, 'r') as f:
+                reference = json.load(f)
+        if reference is not None and reference.get('format') != PROFILE_FORMAT:
+            raise ValueError(f"Unsupported drift profile format {reference.get('format')}")
+        self.reference = reference
+
+        self._bin_offsets = np.arange(self.n_scaled) * N_GRID_BINS
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.rows = 0
+            self._mean = np.zeros(self.n_scaled)
+            self._m2 = np.zeros(self.n_scaled)
+            self._min = np.full(self.n_scaled, np.inf)
+            self._max = np.full(self.n_scaled, -np.inf)
+            self._hist = np.zeros((self.n_scaled, N_GRID_BINS), dtype=np.int64)
+            self._one_hot = np.zeros(len(self.one_hot_names), dtype=np.int64)
+            self._scores = {}
+
+    def observe(self, feature_matrix, model_name=None, probability=None):
+        """
+        Add a preprocessed (N, 116) batch, and optionally its probabilities from one model
+
+        Safe to call from several threads; nothing is kept beyond the fixed-size counters.
+        """
+        X = np.asarray(feature_matrix, dtype=np.float64)
+        if X.ndim != 2 or len(X) == 0:
+            return
+        n = len(X)
+        Z = X[:, :self.n_scaled]
+        # Bin b covers [GRID_LOW + (b - 1) * GRID_WIDTH, GRID_LOW + b * GRID_WIDTH)
+        bins = np.floor(Z * (1 / GRID_WIDTH) + (1 - GRID_LOW / GRID_WIDTH))
+        np.clip(bins, 0, N_GRID_BINS - 1, out=bins)
+        bins = bins.astype(np.intp) + self._bin_offsets
+
+        if n == 1:
+            # Single requests: the row is its own mean, min and max, and its bins are distinct
+            batch_mean = batch_low = batch_high = Z[0]
+            batch_m2 = 0.0
+            hist = bins[0]
+            one_hot = X[0, self.n_scaled:] != 0
+        else:
+            batch_mean = Z.mean(axis=0)
+            batch_m2 = ((Z - batch_mean) ** 2).sum(axis=0)
+            batch_low, batch_high = Z.min(axis=0), Z.max(axis=0)
+            hist = np.bincount(bins.ravel(), minlength=self._hist.size)
+            one_hot = np.count_nonzero(X[:, self.n_scaled:], axis=0)
+
+        with self._lock:
+            total = self.rows + n
+            delta = batch_mean - self._mean
+            self._mean += delta * (n / total)
+            self._m2 += batch_m2 + delta ** 2 * (self.rows * n / total)
+            self.rows = total
+            np.minimum(self._min, batch_low, out=self._min)
+            np.maximum(self._max, batch_high, out=self._max)
+            if n == 1:
+                self._hist.ravel()[hist] += 1
+            else:
+                self._hist += hist.reshape(self._hist.shape)
+            self._one_hot += one_hot
+
+        if model_name is not None and probability is not None:
+            self.observe_scores(model_name, probability)
+
+    def observe_scores(self, model_name, probability):
+        """Add predicted probabilities to the model's score histogram"""
+        p = np.asarray(probability, dtype=np.float64).ravel()
+        if len(p) == 1:
+            counts = min(max(int(p[0] * SCORE_BINS), 0), SCORE_BINS - 1)
+        else:
+            counts = np.bincount(np.clip((p * SCORE_BINS).astype(np.intp), 0, SCORE_BINS - 1), minlength=SCORE_BINS)
+        with self._lock:
+            if model_name not in self._scores:
+                self._scores[model_name] = np.zeros(SCORE_BINS, dtype=np.int64)
+            if len(p) == 1:
+                self._scores[model_name][counts] += 1
+            else:
+                self._scores[model_name] += counts
+
+    def profile(self):
+        """Raw counters as a JSON-serializable dict; save one of training inputs as the reference"""
+        with self._lock:
+            return {
+                'format': PROFILE_FORMAT,
+                'rows': int(self.rows),
+                'grid': [GRID_LOW, GRID_HIGH, GRID_WIDTH],
+                'features': self.feature_names,
+                'mean': self._mean.tolist(),
+                'var': (self._m2 / max(self.rows, 1)).tolist(),
+                'histogram': self._hist.tolist(),
+                'one_hot_features': self.one_hot_names,
+                'one_hot': self._one_hot.tolist(),
+                'scores': {name: counts.tolist() for name, counts in self._scores.items()},
+            }
+
+    def _quantiles(self, hist, low, high):
+        """Quantiles in scaled units by interpolating within histogram bins"""
+        cumulative = np.cumsum(hist)
+        if cumulative[-1] == 0:
+            return [np.nan] * len(QUANTILES)
+        edges = GRID_LOW + GRID_WIDTH * (np.arange(N_GRID_BINS + 1) - 1.0)
+        edges[0], edges[-1] = min(low, edges[1]), max(high, edges[-2])
+        values = []
+        for q in QUANTILES:
+            target = q * cumulative[-1]
+            b = int(np.searchsorted(cumulative, target))
+            before = cumulative[b - 1] if b > 0 else 0
+            fraction = (target - before) / max(hist[b], 1)
+            values.append(float(np.clip(edges[b] + fraction * (edges[b + 1] - edges[b]), low, high)))
+        return values
+
+    def snapshot(self):
+        """
+        Current statistics and drift against the reference
+
+        Returns:
+            Dictionary with 'rows', 'reference_rows', 'features' (one dict per
+            scaled feature, in raw units, with mean_shift in training standard
+            deviations, std_ratio and, with a full reference, psi/ks/status),
+            'one_hot' (per one-hot input group frequencies and psi) and 'scores'
+            (per model histogram, mean and, when the reference has it, psi/ks).
+            Quantiles are p5/p25/p50/p75/p95, read off the histogram
+        """
+        with self._lock:
+            rows = self.rows
+            mean, var = self._mean.copy(), self._m2 / max(rows, 1)
+            lows, highs = self._min.copy(), self._max.copy()
+            hist, one_hot = self._hist.copy(), self._one_hot.copy()
+            scores = {name: counts.copy() for name, counts in self._scores.items()}
+
+        ref = self.reference
+        if ref is not None:
+            ref_mean, ref_var = np.asarray(ref['mean']), np.asarray(ref['var'])
+            ref_hist, ref_rows = np.asarray(ref['histogram']), ref['rows']
+        else:
+            ref_mean, ref_var = np.zeros(self.n_scaled), np.ones(self.n_scaled)
+            ref_hist, ref_rows = None, self._training_rows
+
+        # Raw units for reporting; shifts and ratios in training standard deviations
+        to_raw = lambda z: np.asarray(z, dtype=np.float64) * self._raw_std + self._raw_mean  # noqa: E731
+        ref_std = np.sqrt(ref_var)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean_shift = np.where(ref_std > 0, (mean - ref_mean) / ref_std, np.nan)
+            std_ratio = np.where(ref_std > 0, np.sqrt(var) / ref_std, np.nan)
+        quantiles = to_raw(np.array([self._quantiles(hist[j], lows[j], highs[j]) for j in range(self.n_scaled)]).T)
+        columns = {
+            'mean': to_raw(mean),
+            'std': np.sqrt(var) * self._raw_std,
+            'min': to_raw(lows),
+            'max': to_raw(highs),
+            'reference_mean': to_raw(ref_mean),
+            'mean_shift': mean_shift,
+            'std_ratio': std_ratio,
+        }
+        columns.update({f'p{round(q * 100)}': values for q, values in zip(QUANTILES, quantiles)})
+
+        features = []
+        for j, name in enumerate(self.feature_names):
+            entry = {'feature': name, 'count': rows}
+            if rows:
+                entry.update({key: _number(values[j]) for key, values in columns.items()})
+                if ref_hist is not None:
+                    entry['psi'] = psi(hist[j], ref_hist[j])
+                    entry['ks'] = ks(hist[j], ref_hist[j])
+                    entry['status'] = psi_status(entry['psi'])
+            features.append(entry)
+
+        groups = []
+        for name, columns in self.one_hot_groups:
+            counts = one_hot[columns]
+            # Rows with none of the group's columns set are the baseline category
+            live = np.append(counts, max(rows - counts.sum(), 0))
+            entry = {
+                'group': name,
+                'frequencies': dict(zip((self.one_hot_names[c] for c in columns), (counts / max(rows, 1)).tolist())),
+            }
+            if ref is not None and rows:
+                ref_counts = np.asarray(ref['one_hot'])[columns]
+                entry['psi'] = psi(live, np.append(ref_counts, max(ref['rows'] - ref_counts.sum(), 0)))
+                entry['status'] = psi_status(entry['psi'])
+            groups.append(entry)
+
+        score_report = {}
+        for name, counts in scores.items():
+            centers = (np.arange(SCORE_BINS) + 0.5) / SCORE_BINS
+            entry = {
+                'count': int(counts.sum()),
+                'histogram': counts.tolist(),
+                'mean': float(counts @ centers / max(counts.sum(), 1)),
+            }
+            if ref is not None and name in ref.get('scores', {}):
+                entry['reference_histogram'] = ref['scores'][name]
+                entry['psi'] = psi(counts, ref['scores'][name])
+                entry['ks'] = ks(counts, ref['scores'][name])
+                entry['status'] = psi_status(entry['psi'])
+            score_report[name] = entry
+
+        return {
+            'rows': rows,
+            'reference_rows': ref_rows,
+            'reference': 'profile' if ref is not None else 'scaler',
+            'features': features,
+            'one_hot': groups,
+            'scores': score_report,
+        }
+
+
+def load_reference(models_dir='models'):
+    """The saved reference profile under models_dir, or None when there is none"""
+    path = os.path.join(models_dir, REFERENCE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def monitor_file(input_path, models_data, model_names, chunk_size=50000, reference=None):
+    """Observe every row of a CSV/Parquet file of user_inputs, scored with model_names"""
+    from .batch_score import read_chunks
+    from .predictor import ENSEMBLE, predict_batch
+    from .preprocessor import preprocess_batch
+
+    monitor = DriftMonitor(models_data['preprocessing'], reference)
+    for chunk in read_chunks(input_path, chunk_size):
+        feature_matrix = preprocess_batch(chunk, models_data['preprocessing'])
+        monitor.observe(feature_matrix)
+        for name in model_names:
+            model_data = models_data if name == ENSEMBLE else models_data[name]
+            monitor.observe_scores(name, predict_batch(model_data, feature_matrix, name)['probability'])
+    return monitor
+
+
+def main(argv=None):
+    from .model_loader import load_models
+    from .predictor import ENSEMBLE, ENSEMBLE_MODELS
+
+    parser = argparse.ArgumentParser(description="Build drift reference profiles and drift reports from input files")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Save the profile of a file of (training) inputs as the reference")
+    export.add_argument('input', help="Input .csv or .parquet file of user_input records")
+    export.add_argument('output', help=f"Profile JSON (conventionally <models_dir>/{REFERENCE_FILE})")
+    report = sub.add_parser('report', help="Print the drift snapshot of a file against the reference")
+    report.add_argument('input', help="Input .csv or .parquet file of user_input records")
+    report.add_argument('--reference', help=f"Reference profile (default: <models_dir>/{REFERENCE_FILE} when present)")
+    for command in (export, report):
+        command.add_argument('--models-dir', default='models')
+        command.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args(argv)
+
+    models_data = load_models(args.models_dir)
+    if models_data is None:
+        print(f"Failed to load models from {args.models_dir}", file=sys.stderr)
+        return 1
+    model_names = list(ENSEMBLE_MODELS) + [ENSEMBLE]
+
+    if args.command == 'export':
+        monitor = monitor_file(args.input, models_data, model_names, args.chunk_size)
+        with open(args.output, 'w') as f:
+            json.dump(monitor.profile(), f)
+        print(f"Wrote {args.output} ({monitor.rows} rows)", file=sys.stderr)
+        return 0
+
+    reference = args.reference or load_reference(args.models_dir)
+    monitor = monitor_file(args.input, models_data, model_names, args.chunk_size, reference)
+    json.dump(monitor.snapshot(), sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Per-prediction feature attributions in log-odds space
+
+Logistic regression contributions are exact: coefficient x scaled feature
+value, with the intercept as base value. XGBoost contributions are TreeSHAP
+values from the booster's native pred_contribs, computed for the whole batch
+in one call. Exact TreeSHAP costs far more than scoring (roughly 0.5 ms per row
+per core for this model), so large cohorts can pass approximate=True for the
+per-path (Saabas) attribution, which is a few times the cost of scoring.
+Either way base value + contributions sums to the model's logit.
+
+The 116 model columns are then folded back onto the app's form fields
+(FeatureLayout.field_matrix), so an explanation reads "Primary diagnosis
++0.42" rather than listing one-hot columns.
+"""
+
+import numpy as np
+
+from .preprocessor import get_feature_layout
+
+EXPLAINABLE_MODELS = ('logistic_regression', 'xgboost')
+
+# Display names for FeatureLayout.fields
+FIELD_LABELS = {
+    'admission_type_id': 'Admission type',
+    'discharge_disposition_id': 'Discharge disposition',
+    'admission_source_id': 'Admission source',
+    'time_in_hospital': 'Time in hospital',
+    'medical_specialty': 'Medical specialty',
+    'num_lab_procedures': 'Lab procedures',
+    'num_procedures': 'Procedures',
+    'num_medications': 'Medications',
+    'number_outpatient': 'Outpatient visits',
+    'number_emergency': 'Emergency visits',
+    'number_inpatient': 'Inpatient visits',
+    'number_diagnoses': 'Diagnoses',
+    'race': 'Race',
+    'gender': 'Gender',
+    'diabetes_med': 'Diabetes medication',
+    'hba1c_category': 'HbA1c result',
+    'primary_diagnosis': 'Primary diagnosis',
+    'age_group': 'Age group',
+    'other': 'Other (fixed) features',
+}
+
+
+def supports_explanations(model_name):
+    return model_name in EXPLAINABLE_MODELS
+
+
+def feature_contributions(model_data, feature_matrix, model_name, approximate=False):
+    """
+    Per-column log-odds contributions for a batch
+
+    approximate=True uses XGBoost's approx_contribs instead of exact TreeSHAP
+    (no effect on logistic regression, which is always exact).
+
+    Returns:
+        Tuple of (contributions of shape (N, n_features), base values of shape (N,))
+    """
+    X = np.asarray(feature_matrix, dtype=np.float64)
+    model = model_data['model']
+
+    if model_name == 'logistic_regression':
+        contributions = X * np.asarray(model.coef_[0])
+        base = np.full(len(X), float(model.intercept_[0]))
+        return contributions, base
+
+    if model_name == 'xgboost':
+        from xgboost import DMatrix
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        shap = booster.predict(
+            DMatrix(X, feature_names=booster.feature_names),
+            pred_contribs=True,
+            approx_contribs=approximate,
+        )
+        return shap[:, :-1].astype(np.float64), shap[:, -1].astype(np.float64)
+
+    raise ValueError(f"No feature attributions for model: {model_name}")
+
+
+def explain_batch(model_data, feature_matrix, model_name, preprocessing_pipeline, approximate=False):
+    """
+    Form-field attributions for many patients
+
+    Args:
+        model_data: Model entry for a model in EXPLAINABLE_MODELS
+        feature_matrix: Preprocessed (N, 116) feature matrix
+        model_name: 'logistic_regression' or 'xgboost'
+        preprocessing_pipeline: Loaded preprocessing pipeline (for the field layout)
+        approximate: Use per-path XGBoost attributions instead of exact TreeSHAP
+
+    Returns:
+        Dictionary with 'fields' (names), 'contributions' (N, n_fields),
+        'base_value' (N,) and 'logit' (N,) arrays
+    """
+    layout = get_feature_layout(preprocessing_pipeline)
+    contributions, base = feature_contributions(model_data, feature_matrix, model_name, approximate)
+    by_field = contributions @ layout.field_matrix
+    return {
+        'fields': list(layout.fields),
+        'contributions': by_field,
+        'base_value': base,
+        'logit': base + contributions.sum(axis=1),
+    }
+
+
+def explain_prediction(model_data, feature_vector, model_name, preprocessing_pipeline):
+    """
+    Form-field attributions for one patient
+
+    Returns:
+        Dictionary with 'base_value', 'logit' and 'contributions', a list of
+        {'field', 'label', 'value'} ordered by absolute contribution
+    """
+    batch = explain_batch(model_data, feature_vector, model_name, preprocessing_pipeline)
+    values = batch['contributions'][0]
+    order = np.argsort(-np.abs(values), kind='stable')
+    return {
+        'base_value': float(batch['base_value'][0]),
+        'logit': float(batch['logit'][0]),
+        'contributions': [
+            {
+                'field': batch['fields'][j],
+                'label': FIELD_LABELS.get(batch['fields'][j], batch['fields'][j]),
+                'value': float(values[j]),
+            }
+            for j in order
+        ],
+    }
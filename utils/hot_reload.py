@@ -0,0 +1,196 @@
+"""
+Zero-downtime model reloads
+
+ModelWatcher serves one registry (see model_loader.open_models) at a time and
+polls models_dir for a new release: a replaced manifest.json, bundle, or legacy
+model/metadata file (such as a retrained xgboost_model.pkl or a new
+optimal_threshold). Legacy files are watched even next to a bundle, since
+editing one makes the bundle stale and open_models then serves the files. The
+candidate is loaded, warmed up and smoke-tested on the golden inputs in a
+background thread while the current version keeps serving, and only swapped in
+when it passes; a rejected candidate is not retried until the files change
+again.
+
+Callers take `watcher.current` once per request and use that registry
+throughout, so a request never mixes two versions and requests in flight
+finish on the version they started with.
+
+Publish new artifacts by writing them to a temporary name (or a new release
+directory) and renaming them into place, so a poll never sees a half-written
+file.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from . import metrics
+from .model_loader import MODEL_FILES, artifact_fingerprint, open_models
+from .preprocessor import preprocess_batch
+from .predictor import ENSEMBLE, predict_batch
+
+# user_input records scored by every candidate before it is swapped in
+GOLDEN_FILE = 'golden_inputs.json'
+SMOKE_MODELS = list(MODEL_FILES) + [ENSEMBLE]
+HISTORY_SIZE = 20
+
+
+def load_golden_inputs(models_dir='models'):
+    with open(os.path.join(models_dir, GOLDEN_FILE), 'r') as f:
+        return json.load(f)
+
+
+def smoke_test(models_data, golden_inputs, reference=None, max_drift=None):
+    """
+    Score the golden inputs with every model and check the results are usable
+
+    Args:
+        models_data: Loaded models (as returned by open_models)
+        golden_inputs: List of user_input dicts
+        reference: Optional previous smoke_test result to measure drift against
+        max_drift: Largest allowed absolute probability change vs reference (None: report only)
+
+    Returns:
+        Dictionary of model name -> golden-set 'probability' array and, with a
+        reference, 'max_drift'
+
+    Raises:
+        RuntimeError: describing the first check that failed
+    """
+    feature_names = models_data['preprocessing']['feature_names']
+    feature_matrix = preprocess_batch(golden_inputs, models_data['preprocessing'])
+    if feature_matrix.shape != (len(golden_inputs), len(feature_names)):
+        raise RuntimeError(f"Preprocessing produced shape {feature_matrix.shape}, "
+                           f"expected ({len(golden_inputs)}, {len(feature_names)})")
+    if not np.all(np.isfinite(feature_matrix)):
+        raise RuntimeError("Preprocessing produced non-finite features")
+
+    results = {}
+    for model_name in SMOKE_MODELS:
+        model_data = models_data if model_name == ENSEMBLE else models_data[model_name]
+        probability = np.asarray(predict_batch(model_data, feature_matrix, model_name)['probability'],
+                                 dtype=np.float64)
+        if probability.shape != (len(golden_inputs),):
+            raise RuntimeError(f"{model_name} returned {probability.shape} probabilities "
+                               f"for {len(golden_inputs)} inputs")
+        if not np.all((probability >= 0) & (probability <= 1)):
+            raise RuntimeError(f"{model_name} returned probabilities outside [0, 1] (or NaN)")
+
+        results[model_name] = {'probability': probability}
+        if reference is not None and model_name in reference:
+            drift = float(np.abs(probability - reference[model_name]['probability']).max())
+            results[model_name]['max_drift'] = drift
+            if max_drift is not None and drift > max_drift:
+                raise RuntimeError(f"{model_name} golden-set probabilities moved by {drift:.4f} "
+                                   f"(limit {max_drift})")
+    return results
+
+
+class ModelWatcher:
+    """
+    The active model registry plus a background poller that swaps in new releases
+
+    The initial version is loaded, warmed up and smoke-tested in the constructor
+    (errors propagate); later candidates that fail leave the active one in place.
+    """
+
+    def __init__(self, models_dir='models', interval=5.0, use_bundle=True, golden_inputs=None, max_drift=None):
+        self.models_dir = models_dir
+        self.interval = interval
+        self.use_bundle = use_bundle
+        self.max_drift = max_drift
+        self.golden_inputs = load_golden_inputs(models_dir) if golden_inputs is None else golden_inputs
+        self.history = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._rejected = None
+
+        fingerprint = artifact_fingerprint(models_dir, use_bundle)
+        registry, smoke = self._prepare(None)
+        # (registry, fingerprint, smoke results) replaced as one reference
+        self._active = (registry, fingerprint, smoke)
+        self._record(registry.version, 'active')
+
+    @property
+    def current(self):
+        """The registry to serve from; take it once per request"""
+        return self._active[0]
+
+    @property
+    def version(self):
+        return self._active[0].version
+
+    def _prepare(self, reference):
+        registry = open_models(self.models_dir, self.use_bundle)
+        registry.warm_up()
+        with metrics.timer('smoke_test'):
+            smoke = smoke_test(registry, self.golden_inputs, reference, self.max_drift)
+        return registry, smoke
+
+    def _record(self, version, status, **details):
+        self.history.append({'version': version, 'status': status, 'time': time.time(), **details})
+        del self.history[:-HISTORY_SIZE]
+
+    def check(self):
+        """Reload if the artifacts changed since the active or last rejected version; True when swapped"""
+        try:
+            fingerprint = artifact_fingerprint(self.models_dir, self.use_bundle)
+        except OSError:
+            # Files mid-replacement; look again on the next poll
+            return False
+        if fingerprint in (self._active[1], self._rejected):
+            return False
+        return self.reload(fingerprint)
+
+    def reload(self, fingerprint=None):
+        """
+        Load, warm up and smoke-test the current artifacts, then swap them in
+
+        Returns:
+            True when the new version is now active, False when it was rejected
+        """
+        with self._reload_lock:
+            if fingerprint is None:
+                fingerprint = artifact_fingerprint(self.models_dir, self.use_bundle)
+            start = time.perf_counter()
+            try:
+                registry, smoke = self._prepare(self._active[2])
+            except Exception as e:
+                self._rejected = fingerprint
+                self._record(None, 'rejected', error=str(e))
+                metrics.increment('model_reloads', result='rejected')
+                return False
+
+            previous = self._active[0].version
+            self._active = (registry, fingerprint, smoke)
+            self._rejected = None
+            drift = {name: result['max_drift'] for name, result in smoke.items() if 'max_drift' in result}
+            self._record(registry.version, 'active', previous=previous, max_drift=drift,
+                         seconds=time.perf_counter() - start)
+            metrics.increment('model_reloads', result='swapped')
+            return True
+
+    def start(self):
+        """Start polling in a daemon thread (no-op when already running); returns self"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name='model-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                self._record(None, 'error', error=str(e))
@@ -0,0 +1,261 @@
+"""
+Lightweight stage timers and counters for the scoring stack
+
+Disabled by default. While disabled, timer() hands back a shared no-op context
+manager and the @timed wrapper does a single flag check, so instrumented code
+costs essentially nothing. Enable with enable() or READMISSION_METRICS=1.
+
+    with metrics.timer('predict', model='xgboost'):
+        ...
+    metrics.increment('rows_scored', n, model='xgboost')
+
+    metrics.snapshot()          # JSON-friendly dict
+    metrics.prometheus_text()   # Prometheus text exposition format
+
+SessionLeases switches collection on and off for several sessions sharing the
+process, such as the app's diagnostics checkbox.
+"""
+
+import bisect
+import contextlib
+import functools
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds (10 us .. 10 s)
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+PREFIX = 'readmission'
+
+# Set from the environment: collection stays on for the life of the process
+ENABLED_BY_ENV = os.environ.get('READMISSION_METRICS', '').lower() in ('1', 'true', 'yes')
+_enabled = ENABLED_BY_ENV
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-quantile (approximate)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, n in zip(BUCKETS + (self.max,), self.counts):
+            running += n
+            if running >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """Thread-safe store of stage histograms and counters, keyed by name and labels"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def observe(self, stage, seconds, **labels):
+        key = self._key(stage, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        with self._lock:
+            stages = [
+                {
+                    'stage': stage,
+                    'labels': dict(labels),
+                    'count': h.count,
+                    'total_ms': h.sum * 1000,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p95_ms': h.quantile(0.95) * 1000,
+                    'max_ms': h.max * 1000,
+                }
+                for (stage, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return {'enabled': _enabled, 'stages': stages, 'counters': counters}
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        if histograms:
+            metric = f'{PREFIX}_stage_seconds'
+            lines.append(f'# HELP {metric} Time spent in each scoring stage')
+            lines.append(f'# TYPE {metric} histogram')
+            for (stage, labels), h in histograms:
+                base = (('stage', stage),) + labels
+                running = 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    running += n
+                    lines.append(f'{metric}_bucket{_format_labels(base + (("le", repr(bound)),))} {running}')
+                lines.append(f'{metric}_bucket{_format_labels(base + (("le", "+Inf"),))} {h.count}')
+                lines.append(f'{metric}_sum{_format_labels(base)} {h.sum!r}')
+                lines.append(f'{metric}_count{_format_labels(base)} {h.count}')
+
+        names = sorted({name for (name, _), _ in counters})
+        for name in names:
+            metric = f'{PREFIX}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (counter_name, labels), value in counters:
+                if counter_name == name:
+                    lines.append(f'{metric}{_format_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+class SessionLeases:
+    """
+    Keeps collection on while any session wants it, as for the app's diagnostics box
+
+    Each session renews its lease on every rerun. A session that goes away
+    without unticking the box stops renewing, and its lease expires after ttl
+    seconds, so collection does not stay on for the life of the process.
+    """
+
+    def __init__(self, ttl=1800.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._renewed = {}
+
+    def update(self, session_id, active, now=None):
+        """Record whether session_id wants metrics, then enable or disable collection; returns the live sessions"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if active:
+                self._renewed[session_id] = now
+            else:
+                self._renewed.pop(session_id, None)
+            for expired in [s for s, renewed in self._renewed.items() if now - renewed > self.ttl]:
+                del self._renewed[expired]
+            live = len(self._renewed)
+            if live or ENABLED_BY_ENV:
+                enable()
+            else:
+                disable()
+        return live
+
+
+class _Timer:
+    __slots__ = ('stage', 'labels', 'start')
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.stage, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timer(stage, **labels):
+    """Context manager recording the block's duration under stage (no-op when disabled)"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage, labels)
+
+
+def timed(stage, **labels):
+    """Decorator form of timer() for whole functions"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Timer(stage, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter (no-op when disabled)"""
+    if _enabled:
+        REGISTRY.increment(name, value, **labels)
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+
+def reset():
+    REGISTRY.reset()
@@ -1,52 +1,316 @@
+import hashlib
 import joblib
 import json
 import os
-from tensorflow import keras
+import threading
+import time
+import warnings
+from collections.abc import Mapping
 import streamlit as st
+from . import metrics
+from .bundle import BUNDLE_FILE, Bundle
+from .preprocessor import FeatureLayout
+from .nn_engine import NumpyMLP, exported_source, file_sha256
+from .tree_engine import TreeEnsemble
 
-@st.cache_resource
-def load_models():
-    """Load all models and preprocessing pipeline"""
-    
-    models_dir = 'models'
-    
-    try:
+# Model name -> (candidate model files in order of preference, metadata file) under models_dir.
+# Earlier candidates are exports of the last one and are only used while they match it.
+MODEL_FILES = {
+    'logistic_regression': (['logistic_regression_model.pkl'], 'logistic_regression_metadata.json'),
+    'xgboost': (['xgboost_model.pkl'], 'xgboost_metadata.json'),
+    'neural_network': (['neural_network_weights.npz', 'neural_network_model.h5'], 'neural_network_metadata.json'),
+}
+
+# Optional release pointer under models_dir: {"version": "...", "path": "<artifact dir relative to models_dir>"}
+MANIFEST_FILE = 'manifest.json'
+
+def _load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _artifact_version(*paths):
+    """Short fingerprint of the files' size and modification time"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+def _combined_version(*versions):
+    """Short fingerprint of several versions taken together"""
+    return hashlib.sha1(':'.join(versions).encode()).hexdigest()[:12]
+
+def _load_model_file(path):
+    """Deserialize one model, importing TensorFlow only for Keras files"""
+    if path.endswith('.npz'):
+        return NumpyMLP.load(path)
+    if path.endswith(('.h5', '.keras')):
+        from tensorflow import keras
+        return keras.models.load_model(path)
+    return joblib.load(path)
+
+def _export_is_current(path, source):
+    """False when source exists and the export at path was not produced from its current contents"""
+    if not os.path.exists(source):
+        return True
+    if exported_source(path) == file_sha256(source):
+        return True
+    warnings.warn(f"Ignoring {path}: it was not exported from the current {os.path.basename(source)}; "
+                  f"re-export it to serve the NumPy network again", RuntimeWarning)
+    return False
+
+def _model_path(models_dir, name):
+    """First existing, up-to-date candidate file for a model (the last candidate when none exist)"""
+    paths = [os.path.join(models_dir, f) for f in MODEL_FILES[name][0]]
+    source = paths[-1]
+    for path in paths[:-1]:
+        if os.path.exists(path) and _export_is_current(path, source):
+            return path
+    return source
+
+def resolve_artifacts(models_dir):
+    """
+    Directory holding the artifacts to serve, and the release version when declared
+
+    Without a manifest that is models_dir itself. With one, it is the manifest's
+    'path' (relative to models_dir), so a release is published by writing its
+    artifacts to a new directory and then replacing the manifest.
+    """
+    manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return models_dir, None
+    manifest = _load_json(manifest_path)
+    return os.path.join(models_dir, manifest.get('path', '.')), manifest.get('version')
+
+def source_files(artifact_dir):
+    """Legacy artifacts present in artifact_dir, i.e. everything a bundle is exported from"""
+    names = ['preprocessing_pipeline.pkl', 'model_comparison.json']
+    for candidates, metadata_file in MODEL_FILES.values():
+        names += candidates + [metadata_file]
+    paths = [os.path.join(artifact_dir, name) for name in names]
+    return [path for path in paths if os.path.exists(path)]
+
+def source_digests(artifact_dir):
+    """File name -> SHA-256 of each legacy artifact in artifact_dir"""
+    return {os.path.basename(path): file_sha256(path) for path in source_files(artifact_dir)}
+
+def artifact_files(models_dir, use_bundle=True):
+    """
+    Files whose contents determine what open_models would serve
+
+    The legacy files are always included, even with a bundle: editing one makes
+    the bundle stale, and open_models then serves the files instead.
+    """
+    manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+    files = [manifest_path] if os.path.exists(manifest_path) else []
+    artifact_dir, _ = resolve_artifacts(models_dir)
+    files += source_files(artifact_dir)
+
+    bundle_path = os.path.join(artifact_dir, BUNDLE_FILE)
+    if use_bundle and os.path.exists(bundle_path):
+        files.append(bundle_path)
+    return files
+
+def artifact_fingerprint(models_dir, use_bundle=True):
+    """Cheap stat-based fingerprint of artifact_files, for polling for new releases"""
+    return _artifact_version(*artifact_files(models_dir, use_bundle))
+
+class ModelRegistry(Mapping):
+    """
+    Dict-like view of the loaded artifacts that deserializes each model on first access
+
+    Keys match the dict load_models used to return: 'preprocessing', 'comparison' and
+    one entry per model name holding {'model': ..., 'metadata': ...}. version
+    identifies the set of artifacts as a whole (see open_models). Each model
+    entry's 'version' also covers preprocessing_version, since the same model
+    scores differently after a scaler or feature layout change.
+    """
+
+    def __init__(self, models_dir, preprocessing, comparison, preprocessing_version=None):
+        self.models_dir = models_dir
+        self.version = None
+        self.preprocessing_version = preprocessing_version
+        self.load_times = {}
+        self._entries = {'preprocessing': preprocessing, 'comparison': comparison}
+        self._locks = {name: threading.Lock() for name in MODEL_FILES}
+
+    def __getitem__(self, key):
+        if key in self._entries:
+            return self._entries[key]
+        if key not in MODEL_FILES:
+            raise KeyError(key)
+
+        with self._locks[key]:
+            if key not in self._entries:
+                self._entries[key] = self._load(key)
+        return self._entries[key]
+
+    def __contains__(self, key):
+        return key in self._entries or key in MODEL_FILES
+
+    def __iter__(self):
+        yield 'preprocessing'
+        yield from MODEL_FILES
+        yield 'comparison'
+
+    def __len__(self):
+        return len(MODEL_FILES) + 2
+
+    def _load(self, name):
+        path = _model_path(self.models_dir, name)
+        metadata_path = os.path.join(self.models_dir, MODEL_FILES[name][1])
+        start = time.perf_counter()
+        with metrics.timer('model_load', model=name):
+            model = _load_model_file(path)
+            metadata = _load_json(metadata_path)
+            entry = {
+                'model': model,
+                'metadata': metadata,
+                'version': _combined_version(_artifact_version(path, metadata_path), self.preprocessing_version),
+            }
+            if name == 'xgboost':
+                # Flat-array trees for low-latency small batches; the booster stays the reference path
+                entry['compiled_model'] = TreeEnsemble.from_xgboost(model)
+        self.load_times[name] = time.perf_counter() - start
+        return entry
+
+    def is_loaded(self, name):
+        """True once the model has been deserialized"""
+        return name in self._entries
+
+    def warm_up(self, names=None, background=False):
+        """
+        Load the given models (default: all) ahead of first use
+
+        With background=True the loads run in a daemon thread, which is returned;
+        requests for a model still loading simply wait for it.
+        """
+        names = list(MODEL_FILES) if names is None else list(names)
+
+        def _run():
+            for name in names:
+                self[name]
+
+        if not background:
+            _run()
+            return None
+
+        thread = threading.Thread(target=_run, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+class BundleRegistry(ModelRegistry):
+    """
+    ModelRegistry backed by a single memory-mapped bundle (see utils.bundle)
+
+    Weights are mapped read-only from the bundle file, so processes serving the
+    same bundle share its pages. Model versions come from the bundle's content
+    hashes rather than file timestamps.
+    """
+
+    def __init__(self, bundle):
+        self.bundle = bundle
+        self.content_hash = bundle.content_hash
+        preprocessing = bundle.preprocessing()
+        preprocessing['feature_layout'] = FeatureLayout.from_pipeline(preprocessing)
+        super().__init__(os.path.dirname(bundle.path), preprocessing, bundle.meta['comparison'],
+                         bundle.preprocessing_version())
+        self.version = self.content_hash[:12]
+
+    def _load(self, name):
+        start = time.perf_counter()
+        with metrics.timer('model_load', model=name):
+            model_meta = self.bundle.model_meta(name)
+            entry = {
+                'model': getattr(self.bundle, name)(),
+                'metadata': model_meta['metadata'],
+                'version': _combined_version(model_meta['version'], self.preprocessing_version),
+            }
+            if name == 'xgboost':
+                entry['compiled_model'] = self.bundle.tree_ensemble()
+        self.load_times[name] = time.perf_counter() - start
+        return entry
+
+def open_bundle(path, verify=False):
+    """BundleRegistry over a bundle file; verify=True checks its content hash first"""
+    return BundleRegistry(Bundle.open(path, verify=verify))
+
+def _current_bundle(artifact_dir):
+    """The bundle in artifact_dir when there is one and it matches the legacy files next to it"""
+    bundle_path = os.path.join(artifact_dir, BUNDLE_FILE)
+    if not os.path.exists(bundle_path):
+        return None
+    bundle = Bundle.open(bundle_path)
+    stale = bundle.stale_sources(source_digests(artifact_dir))
+    if stale:
+        warnings.warn(f"Ignoring {bundle_path}: {', '.join(stale)} changed since it was exported; "
+                      f"re-export it with python -m utils.bundle", RuntimeWarning)
+        return None
+    return bundle
+
+def open_models(models_dir='models', use_bundle=True):
+    """
+    Build the registry for the artifacts under models_dir (uncached; raises on failure)
+
+    The bundle is only used while it matches the legacy files it was exported
+    from; otherwise those files are loaded directly. The registry's version is
+    the manifest's release version when there is one, else the bundle's content
+    hash, else a fingerprint of the legacy files.
+    """
+    start = time.perf_counter()
+    artifact_dir, release = resolve_artifacts(models_dir)
+
+    bundle = _current_bundle(artifact_dir) if use_bundle else None
+    if bundle is not None:
+        registry = BundleRegistry(bundle)
+    else:
         # Load preprocessing pipeline
-        preprocessing = joblib.load(os.path.join(models_dir, 'preprocessing_pipeline.pkl'))
-        
-        # Load Logistic Regression
-        lr_model = joblib.load(os.path.join(models_dir, 'logistic_regression_model.pkl'))
-        with open(os.path.join(models_dir, 'logistic_regression_metadata.json'), 'r') as f:
-            lr_metadata = json.load(f)
-        
-        # Load XGBoost
-        xgb_model = joblib.load(os.path.join(models_dir, 'xgboost_model.pkl'))
-        with open(os.path.join(models_dir, 'xgboost_metadata.json'), 'r') as f:
-            xgb_metadata = json.load(f)
-        
-        # Load Neural Network
-        nn_model = keras.models.load_model(os.path.join(models_dir, 'neural_network_model.h5'))
-        with open(os.path.join(models_dir, 'neural_network_metadata.json'), 'r') as f:
-            nn_metadata = json.load(f)
-        
+        preprocessing_path = os.path.join(artifact_dir, 'preprocessing_pipeline.pkl')
+        preprocessing_version = _artifact_version(preprocessing_path)
+        preprocessing = joblib.load(preprocessing_path)
+        preprocessing['feature_layout'] = FeatureLayout.from_pipeline(preprocessing)
+
         # Load model comparison
-        with open(os.path.join(models_dir, 'model_comparison.json'), 'r') as f:
-            comparison = json.load(f)
-        
-        return {
-            'preprocessing': preprocessing,
-            'logistic_regression': {'model': lr_model, 'metadata': lr_metadata},
-            'xgboost': {'model': xgb_model, 'metadata': xgb_metadata},
-            'neural_network': {'model': nn_model, 'metadata': nn_metadata},
-            'comparison': comparison
-        }
-    
+        comparison = _load_json(os.path.join(artifact_dir, 'model_comparison.json'))
+
+        registry = ModelRegistry(artifact_dir, preprocessing, comparison, preprocessing_version)
+        registry.version = artifact_fingerprint(models_dir, use_bundle=False)
+    if release is not None:
+        registry.version = str(release)
+    registry.load_times['preprocessing'] = time.perf_counter() - start
+    return registry
+
+@st.cache_resource
+@metrics.timed('load_models')
+def load_models(models_dir='models', warm_up=False, use_bundle=True):
+    """
+    Load the preprocessing pipeline and model comparison, with models loaded lazily
+
+    When models_dir contains an up-to-date readmission_bundle.npz (and use_bundle
+    is set) the artifacts come from that single memory-mapped file. Otherwise each model is
+    deserialized from its own file the first time it is requested; the neural
+    network is then served from its exported NumPy weights when present, falling
+    back to the Keras .h5 file (and a TensorFlow import). A manifest.json in
+    models_dir redirects both to the release directory it names. Pass
+    warm_up=True to start loading all models in a background thread right away.
+
+    The result is cached for the life of the process; use utils.hot_reload.ModelWatcher
+    to pick up new artifacts without a restart.
+    """
+
+    try:
+        registry = open_models(models_dir, use_bundle)
+
+        if warm_up:
+            registry.warm_up(background=True)
+
+        return registry
+
     except Exception as e:
         st.error(f"Error loading models: {str(e)}")
         return None
 
-def get_feature_names():
+def get_feature_names(models_dir='models'):
     """Get feature names from preprocessing pipeline"""
-    models_dir = 'models'
     preprocessing = joblib.load(os.path.join(models_dir, 'preprocessing_pipeline.pkl'))
-    return preprocessing['feature_names']
\ No newline at end of file
+    return preprocessing['feature_names']
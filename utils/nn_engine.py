@@ -0,0 +1,230 @@
+"""
+Pure-NumPy inference for the Keras readmission network
+
+The exported .npz holds one (kernel, bias, activation) triple per Dense layer.
+Dropout is dropped (inference semantics) and BatchNormalization is folded into
+the Dense layer that follows it, so serving needs no TensorFlow at all.
+
+Export once from the trained model:
+    python -m utils.nn_engine models/neural_network_model.h5 models/neural_network_weights.npz
+
+The export records the SHA-256 of the Keras file it came from, and the model
+loader ignores an export whose source has since changed (see exported_source).
+QuantizedMLP.save writes the same layout with int8 kernels and a scale_<i>
+array per layer; read it back with QuantizedMLP.load.
+"""
+
+import argparse
+import hashlib
+import sys
+
+import numpy as np
+
+ACTIVATIONS = {
+    'linear': lambda z: z,
+    'relu': lambda z: np.maximum(z, 0.0, out=z),
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-z)),
+}
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def exported_source(path):
+    """SHA-256 of the Keras file an exported .npz was folded from (None if not recorded)"""
+    with np.load(path, allow_pickle=False) as data:
+        return str(data['source_sha256']) if 'source_sha256' in data.files else None
+
+
+class NumpyMLP:
+    """Feed-forward network of Dense layers evaluated with NumPy matmuls"""
+
+    def __init__(self, kernels, biases, activations, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.kernels = [np.asarray(k, dtype=self.dtype) for k in kernels]
+        self.biases = [np.asarray(b, dtype=self.dtype) for b in biases]
+        self.activations = list(activations)
+        for name in self.activations:
+            if name not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {name}")
+
+    @classmethod
+    def load(cls, path, dtype=np.float64):
+        """Load weights written by export_keras_model"""
+        with np.load(path, allow_pickle=False) as data:
+            if 'scale_0' in data.files:
+                raise ValueError(f"{path} holds int8 kernels; load it with QuantizedMLP.load")
+            n_layers = int(data['n_layers'])
+            kernels = [data[f'kernel_{i}'] for i in range(n_layers)]
+            biases = [data[f'bias_{i}'] for i in range(n_layers)]
+            activations = [str(a) for a in data['activations']]
+        return cls(kernels, biases, activations, dtype)
+
+    def save(self, path, source_sha256=None):
+        arrays = {'n_layers': np.array(len(self.kernels)), 'activations': np.array(self.activations)}
+        if source_sha256 is not None:
+            arrays['source_sha256'] = np.array(source_sha256)
+        for i, (kernel, bias) in enumerate(zip(self.kernels, self.biases)):
+            arrays[f'kernel_{i}'] = kernel.astype(np.float32)
+            arrays[f'bias_{i}'] = bias.astype(np.float32)
+        np.savez(path, **arrays)
+
+    def forward(self, feature_matrix):
+        """Network output for an (N, n_features) matrix, shape (N, units of last layer)"""
+        h = np.asarray(feature_matrix, dtype=self.dtype)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            h = ACTIVATIONS[activation](h @ kernel + bias)
+        return h
+
+    def predict_proba(self, feature_matrix):
+        """sklearn-style (N, 2) class probabilities for a sigmoid output"""
+        p = self.forward(feature_matrix)[:, 0].astype(np.float64)
+        return np.column_stack([1.0 - p, p])
+
+
+def quantize_int8(kernel):
+    """Symmetric per-output-unit int8 quantization: kernel ~= q * scale"""
+    kernel = np.asarray(kernel, dtype=np.float64)
+    scale = np.abs(kernel).max(axis=0) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.rint(kernel / scale), -127, 127).astype(np.int8)
+    return q, scale
+
+
+class QuantizedMLP(NumpyMLP):
+    """
+    NumpyMLP whose kernels are int8 with one scale per output unit
+
+    int8 only reduces the stored size, to a quarter of float32. NumPy has no
+    int8 matrix product, so the kernels are expanded once, on construction, to
+    kernel * scale in dtype, and forward runs the same float matmuls as a
+    NumpyMLP in dtype (with the quantization error). Float kernels are quantized
+    on construction; pass scales to adopt int8 kernels as they are.
+    """
+
+    def __init__(self, kernels, biases, activations, dtype=np.float32, scales=None):
+        super().__init__([], biases, activations, dtype)
+        if scales is None:
+            quantized = [quantize_int8(k) for k in kernels]
+            kernels = [q for q, _ in quantized]
+            scales = [s for _, s in quantized]
+        self.kernels = [np.asarray(k, dtype=np.int8) for k in kernels]
+        self.scales = [np.asarray(s, dtype=self.dtype) for s in scales]
+        self._weights = [kernel.astype(self.dtype) * scale for kernel, scale in zip(self.kernels, self.scales)]
+
+    @classmethod
+    def from_mlp(cls, mlp, dtype=np.float32):
+        return cls(mlp.kernels, mlp.biases, mlp.activations, dtype)
+
+    @classmethod
+    def load(cls, path, dtype=np.float32):
+        """Load int8 weights written by save, or quantize a float export"""
+        with np.load(path, allow_pickle=False) as data:
+            if 'scale_0' not in data.files:
+                return cls.from_mlp(NumpyMLP.load(path), dtype)
+            n_layers = int(data['n_layers'])
+            kernels = [data[f'kernel_{i}'] for i in range(n_layers)]
+            scales = [data[f'scale_{i}'] for i in range(n_layers)]
+            biases = [data[f'bias_{i}'] for i in range(n_layers)]
+            activations = [str(a) for a in data['activations']]
+        return cls(kernels, biases, activations, dtype, scales)
+
+    def save(self, path, source_sha256=None):
+        arrays = {'n_layers': np.array(len(self.kernels)), 'activations': np.array(self.activations)}
+        if source_sha256 is not None:
+            arrays['source_sha256'] = np.array(source_sha256)
+        for i, (kernel, scale, bias) in enumerate(zip(self.kernels, self.scales, self.biases)):
+            arrays[f'kernel_{i}'] = kernel
+            arrays[f'scale_{i}'] = scale.astype(np.float32)
+            arrays[f'bias_{i}'] = bias.astype(np.float32)
+        np.savez(path, **arrays)
+
+    def forward(self, feature_matrix):
+        h = np.asarray(feature_matrix, dtype=self.dtype)
+        for weights, bias, activation in zip(self._weights, self.biases, self.activations):
+            h = ACTIVATIONS[activation](h @ weights + bias)
+        return h
+
+
+def fold_keras_model(model):
+    """Convert a Sequential Keras model into a NumpyMLP, folding BatchNorm forward"""
+
+    kernels, biases, activations = [], [], []
+    pending_scale = None
+    pending_shift = None
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+
+        if kind == 'Dropout':
+            continue
+
+        if kind == 'BatchNormalization':
+            # BN(h) = scale * h + shift, applied to the next Dense layer's input
+            gamma = layer.gamma.numpy() if layer.gamma is not None else 1.0
+            beta = layer.beta.numpy() if layer.beta is not None else 0.0
+            mean = layer.moving_mean.numpy().astype(np.float64)
+            var = layer.moving_variance.numpy().astype(np.float64)
+            scale = gamma / np.sqrt(var + layer.epsilon)
+            shift = beta - mean * scale
+            if pending_scale is not None:
+                scale, shift = pending_scale * scale, pending_shift * scale + shift
+            pending_scale, pending_shift = scale, shift
+            continue
+
+        if kind != 'Dense':
+            raise ValueError(f"Unsupported layer type for NumPy export: {kind}")
+
+        kernel, bias = (w.astype(np.float64) for w in layer.get_weights())
+        if pending_scale is not None:
+            bias = pending_shift @ kernel + bias
+            kernel = pending_scale[:, None] * kernel
+            pending_scale = pending_shift = None
+
+        kernels.append(kernel)
+        biases.append(bias)
+        activations.append(layer.get_config()['activation'])
+
+    if pending_scale is not None:
+        raise ValueError("BatchNormalization after the last Dense layer cannot be folded")
+
+    return NumpyMLP(kernels, biases, activations)
+
+
+def export_keras_model(source_path, output_path):
+    """Load a .h5/.keras model and write its folded weights to an .npz file"""
+    from tensorflow import keras
+    model = keras.models.load_model(source_path)
+    mlp = fold_keras_model(model)
+    mlp.save(output_path, source_sha256=file_sha256(source_path))
+    return model, mlp
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the Keras network to NumPy weights")
+    parser.add_argument('source', help="Keras model (.h5 or .keras)")
+    parser.add_argument('output', help="Output .npz file")
+    parser.add_argument('--check-rows', type=int, default=10000,
+                        help="Random rows used to compare against Keras (default: 10000, 0 to skip)")
+    args = parser.parse_args(argv)
+
+    model, _ = export_keras_model(args.source, args.output)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.check_rows:
+        X = np.random.default_rng(0).normal(size=(args.check_rows, model.input_shape[-1])).astype(np.float32)
+        expected = np.asarray(model(X, training=False), dtype=np.float64)
+        actual = NumpyMLP.load(args.output).forward(X)
+        print(f"Max abs difference vs Keras: {np.abs(expected - actual).max():.2e}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
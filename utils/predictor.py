@@ -1,65 +1,286 @@
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from . import metrics
+from .calibration import calibrate
+from .preprocessor import preprocess_input
+from .prediction_cache import input_key
+from .explainer import explain_prediction, supports_explanations
 
-def predict_readmission(model_data, feature_vector, model_name):
+# Risk bands: probability < 0.3 Low, < 0.6 Medium, otherwise High, unless a
+# model's metadata sets its own 'risk_thresholds' (see utils.tuning)
+RISK_THRESHOLDS = np.array([0.3, 0.6])
+RISK_LEVELS = np.array(["Low", "Medium", "High"])
+RISK_COLORS = np.array(["green", "orange", "red"])
+
+# Message per risk level; {percent} is the probability as a percentage with one decimal
+RISK_MESSAGES = {
+    "Low": "This patient has a **LOW risk** ({percent}%) of being readmitted within 30 days. Continue standard post-discharge care protocols.",
+    "Medium": "This patient has a **MODERATE risk** ({percent}%) of being readmitted within 30 days. Consider enhanced follow-up care and medication adherence monitoring.",
+    "High": "This patient has a **HIGH risk** ({percent}%) of being readmitted within 30 days. Recommend intensive case management, early follow-up appointments, and patient education."
+}
+
+DEFAULT_THRESHOLD = 0.5
+
+# Batches up to this size go through model_data['compiled_model'] when one is loaded;
+# larger batches are faster on the native multithreaded predictor
+COMPILED_MAX_ROWS = 64
+
+# Ensemble members and their entries in model_comparison.json
+ENSEMBLE = 'ensemble'
+ENSEMBLE_MODELS = {
+    'logistic_regression': 'Logistic_Regression',
+    'xgboost': 'XGBoost_Optimized',
+    'neural_network': 'Neural_Network'
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Shared thread pool for running ensemble members concurrently"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=len(ENSEMBLE_MODELS), thread_name_prefix='ensemble')
+    return _executor
+
+def _reset_executor():
+    # Worker threads do not survive fork; a forked child starts its own pool
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_executor)
+
+def predict_probabilities(model, feature_matrix, model_name):
     """
-    Make prediction using the selected model
+    Positive-class probabilities for a batch with a single inference call
     
     Args:
-        model_data: Dictionary containing model and metadata
-        feature_vector: Preprocessed input features
+        model: Loaded model object
+        feature_matrix: Preprocessed (N, 116) feature matrix
         model_name: Name of the model ('logistic_regression', 'xgboost', 'neural_network')
     
     Returns:
-        Dictionary with prediction results
+        float64 array of shape (N,)
     """
     
-    model = model_data['model']
+    if model_name == 'neural_network' and not hasattr(model, 'predict_proba'):
+        # Keras model: direct forward pass in inference mode (dropout off), skipping model.predict overhead
+        output = model(np.asarray(feature_matrix, dtype=np.float32), training=False)
+        return np.asarray(output, dtype=np.float64)[:, 0]
+    
+    # Scikit-learn / XGBoost models and the NumPy network and tree engines
+    return np.asarray(model.predict_proba(feature_matrix)[:, 1], dtype=np.float64)
+
+def assign_risk(probability, thresholds=None):
+    """Map probabilities to indices into RISK_LEVELS / RISK_COLORS (default cut-offs: RISK_THRESHOLDS)"""
+    return np.digitize(probability, RISK_THRESHOLDS if thresholds is None else thresholds)
+
+def ensemble_weights(comparison, method='roc_auc'):
+    """
+    Per-model weights summing to 1
+    
+    Args:
+        comparison: Contents of model_comparison.json
+        method: 'mean' for equal weights or 'roc_auc' to weight by test ROC-AUC
+    """
+    
+    if method == 'mean':
+        weights = {name: 1.0 for name in ENSEMBLE_MODELS}
+    elif method == 'roc_auc':
+        weights = {name: comparison['model_comparison'][key]['roc_auc'] for name, key in ENSEMBLE_MODELS.items()}
+    else:
+        raise ValueError(f"Unknown ensemble method: {method}")
+    
+    total = sum(weights.values())
+    return {name: w / total for name, w in weights.items()}
+
+def predict_ensemble(models_data, feature_matrix, method='roc_auc', parallel=True):
+    """
+    Score all three models on a shared feature matrix and combine their probabilities
+    
+    Args:
+        models_data: Loaded models (as returned by load_models)
+        feature_matrix: Preprocessed (N, 116) feature matrix
+        method: Weighting passed to ensemble_weights
+        parallel: Run the models concurrently on a thread pool (the native code releases the GIL)
+    
+    Returns:
+        Dictionary of arrays like predict_batch, plus 'members' (per-model predict_batch
+        results) and 'weights'
+    """
+    
+    weights = ensemble_weights(models_data['comparison'], method)
+    member_data = {name: models_data[name] for name in ENSEMBLE_MODELS}
+    
+    if parallel:
+        executor = _get_executor()
+        futures = {
+            name: executor.submit(predict_batch, data, feature_matrix, name)
+            for name, data in member_data.items()
+        }
+        members = {name: future.result() for name, future in futures.items()}
+    else:
+        members = {name: predict_batch(data, feature_matrix, name) for name, data in member_data.items()}
+    
+    probability = sum(weights[name] * members[name]['probability'] for name in ENSEMBLE_MODELS)
+    risk = assign_risk(probability)
+    
+    return {
+        'prediction': (probability > DEFAULT_THRESHOLD).astype(np.int64),
+        'probability': probability,
+        'risk_level': RISK_LEVELS[risk],
+        'risk_color': RISK_COLORS[risk],
+        'members': members,
+        'weights': weights
+    }
+
+def predict_batch(model_data, feature_matrix, model_name):
+    """
+    Make predictions for many patients using the selected model
+    
+    Args:
+        model_data: Dictionary containing model and metadata, or all loaded models for 'ensemble'
+        feature_matrix: Preprocessed (N, 116) feature matrix
+        model_name: Name of the model ('logistic_regression', 'xgboost', 'neural_network', 'ensemble')
+    
+    Returns:
+        Dictionary of arrays: prediction, probability, risk_level, risk_color
+    """
+    
+    if model_name == ENSEMBLE:
+        with metrics.timer('predict', model=ENSEMBLE):
+            return predict_ensemble(model_data, feature_matrix)
+    
     metadata = model_data['metadata']
     
+    model = model_data['model']
+    if model_data.get('compiled_model') is not None and len(feature_matrix) <= COMPILED_MAX_ROWS:
+        model = model_data['compiled_model']
+    
+    with metrics.timer('predict', model=model_name):
+        probability = predict_probabilities(model, feature_matrix, model_name)
+    metrics.increment('rows_scored', len(feature_matrix), model=model_name)
+    
+    # Thresholds and bands below apply to the calibrated probability when a map was fitted
+    if 'calibration' in metadata:
+        probability = calibrate(probability, metadata['calibration'])
+    
+    # Apply the model's optimal threshold when one was tuned, else 0.5
+    if 'optimal_threshold' in metadata:
+        prediction = (probability >= metadata['optimal_threshold']).astype(np.int64)
+    else:
+        prediction = (probability > DEFAULT_THRESHOLD).astype(np.int64)
+    
+    risk = assign_risk(probability, metadata.get('risk_thresholds'))
+    
+    return {
+        'prediction': prediction,
+        'probability': probability,
+        'risk_level': RISK_LEVELS[risk],
+        'risk_color': RISK_COLORS[risk]
+    }
+
+def predict_readmission(model_data, feature_vector, model_name):
+    """
+    Make prediction using the selected model
+    
+    Args:
+        model_data: Dictionary containing model and metadata, or all loaded models for 'ensemble'
+        feature_vector: Preprocessed input features
+        model_name: Name of the model ('logistic_regression', 'xgboost', 'neural_network', 'ensemble')
+    
+    Returns:
+        Dictionary with prediction results. Ensemble results have no single
+        'model_performance' and add 'members' (per-model results) and 'weights'.
+    """
+    
     try:
-        if model_name == 'neural_network':
-            # Neural network returns probability directly
-            probability = float(model.predict(feature_vector, verbose=0)[0][0])
-            prediction = 1 if probability > 0.5 else 0
-        else:
-            # Scikit-learn models
-            prediction = int(model.predict(feature_vector)[0])
-            probability = float(model.predict_proba(feature_vector)[0][1])
-            
-            # Apply optimal threshold for XGBoost
-            if model_name == 'xgboost' and 'optimal_threshold' in metadata:
-                optimal_threshold = metadata['optimal_threshold']
-                prediction = 1 if probability >= optimal_threshold else 0
+        batch = predict_batch(model_data, feature_vector, model_name)
+        
+        result = {
+            'prediction': int(batch['prediction'][0]),
+            'probability': float(batch['probability'][0]),
+            'risk_level': str(batch['risk_level'][0]),
+            'risk_color': str(batch['risk_color'][0])
+        }
         
-        # Determine risk level
-        if probability < 0.3:
-            risk_level = "Low"
-            risk_color = "green"
-        elif probability < 0.6:
-            risk_level = "Medium"
-            risk_color = "orange"
+        if model_name == ENSEMBLE:
+            result['model_performance'] = None
+            result['weights'] = batch['weights']
+            result['members'] = {
+                name: {
+                    'prediction': int(member['prediction'][0]),
+                    'probability': float(member['probability'][0]),
+                    'risk_level': str(member['risk_level'][0]),
+                    'model_performance': model_data[name]['metadata']['performance']
+                }
+                for name, member in batch['members'].items()
+            }
         else:
-            risk_level = "High"
-            risk_color = "red"
+            result['model_performance'] = model_data['metadata']['performance']
         
-        return {
-            'prediction': prediction,
-            'probability': probability,
-            'risk_level': risk_level,
-            'risk_color': risk_color,
-            'model_performance': metadata['performance']
-        }
+        return result
     
     except Exception as e:
         raise Exception(f"Prediction error: {str(e)}")
 
+def predict_cached(model_data, user_input, model_name, preprocessing_pipeline, cache, explain=False, monitor=None):
+    """
+    Preprocess and predict a raw user_input, reusing a cached result when the same
+    input was already scored by the same model version
+    
+    Args:
+        model_data: Dictionary containing model and metadata (and 'version' when loaded by the registry),
+            or all loaded models for 'ensemble'
+        user_input: Patient input dict as built by the app
+        model_name: Name of the model ('logistic_regression', 'xgboost', 'neural_network', 'ensemble')
+        preprocessing_pipeline: Loaded preprocessing pipeline
+        cache: PredictionCache instance
+        explain: Also compute form-field attributions (see utils.explainer) and cache them
+            with the prediction; 'explanation' is None for models without an explainer
+        monitor: Optional DriftMonitor (see utils.drift) fed each newly scored input
+            and probability; cache hits repeat an input it has already seen
+    
+    Returns:
+        Dictionary with prediction results, as from predict_readmission
+    """
+    
+    if model_name == ENSEMBLE:
+        version = [model_data[name].get('version') for name in ENSEMBLE_MODELS]
+    else:
+        version = model_data.get('version')
+    
+    # Explained results are a superset, so they get their own entries
+    key = input_key(user_input, model_name, [version, 'explain'] if explain else version)
+    result = cache.get(key)
+    metrics.increment('prediction_cache_lookups', model=model_name, result='miss' if result is None else 'hit')
+    if result is None:
+        feature_vector = preprocess_input(user_input, preprocessing_pipeline)
+        result = predict_readmission(model_data, feature_vector, model_name)
+        if monitor is not None:
+            monitor.observe(feature_vector, model_name, [result['probability']])
+        if explain:
+            result['explanation'] = None
+            if supports_explanations(model_name):
+                with metrics.timer('explain', model=model_name):
+                    result['explanation'] = explain_prediction(
+                        model_data, feature_vector, model_name, preprocessing_pipeline
+                    )
+        cache.put(key, result)
+    
+    # Deep copy: callers may modify nested entries (members, explanation) of the cached result
+    return copy.deepcopy(result)
+
 def get_risk_message(risk_level, probability):
     """Generate a user-friendly risk message"""
     
-    messages = {
-        "Low": f"This patient has a **LOW risk** ({probability*100:.1f}%) of being readmitted within 30 days. Continue standard post-discharge care protocols.",
-        "Medium": f"This patient has a **MODERATE risk** ({probability*100:.1f}%) of being readmitted within 30 days. Consider enhanced follow-up care and medication adherence monitoring.",
-        "High": f"This patient has a **HIGH risk** ({probability*100:.1f}%) of being readmitted within 30 days. Recommend intensive case management, early follow-up appointments, and patient education."
-    }
-    
-    return messages.get(risk_level, "Unable to determine risk level")
\ No newline at end of file
+    template = RISK_MESSAGES.get(risk_level)
+    if template is None:
+        return "Unable to determine risk level"
+    return template.format(percent=f"{probability*100:.1f}")
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""
+Pre-fork multi-process serving
+
+Models are loaded once in the parent process, then worker processes are forked
+from it. Workers inherit the loaded models copy-on-write, and the memory-mapped
+bundle arrays (see utils.bundle) are shared through the page cache, so adding a
+worker costs its own interpreter state rather than another copy of every model.
+Objects that exist at fork time are moved out of the garbage collector's reach
+with gc.freeze(), so collections in the workers do not write to (and thereby
+copy) the shared pages.
+
+Two modes:
+    PreforkPool    dispatches batch jobs (e.g. file chunks) across workers
+    serve_prefork  runs the HTTP scoring service in N workers on one socket
+
+    python -m utils.service --workers 4
+    python -m utils.batch_score in.csv out.csv --model all --workers 4
+
+Requires os.fork (Linux/macOS).
+"""
+
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+
+from .preprocessor import preprocess_batch
+from .predictor import predict_batch, ENSEMBLE
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network']
+
+# Models inherited by forked workers; set in the parent just before forking
+_shared_models = None
+
+
+def _check_fork():
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Pre-fork serving requires os.fork, which this platform does not provide")
+
+
+def _prepare_fork(models_data, model_names):
+    """Load everything workers will need and freeze it out of the GC"""
+    if hasattr(models_data, 'warm_up'):
+        # The ensemble needs every member model
+        models_data.warm_up(None if ENSEMBLE in model_names else model_names)
+    gc.collect()
+    gc.freeze()
+
+
+def score_records(models_data, records, model_name):
+    """Score records (list of user_input dicts or a DataFrame) with one model or the ensemble"""
+    feature_matrix = preprocess_batch(records, models_data['preprocessing'])
+    model_data = models_data if model_name == ENSEMBLE else models_data[model_name]
+    return predict_batch(model_data, feature_matrix, model_name)
+
+
+def _run_job(job):
+    fn, args = job
+    return fn(_shared_models, *args)
+
+
+class PreforkPool:
+    """
+    Worker processes forked after models are loaded, sharing them read-only
+
+    Jobs are functions called as fn(models_data, *args) in a worker; they and
+    their arguments must be picklable (module-level functions).
+
+    Args:
+        models_data: Loaded models (as returned by load_models)
+        workers: Number of worker processes (default: os.cpu_count())
+        model_names: Models to load before forking (default: all)
+    """
+
+    def __init__(self, models_data, workers=None, model_names=None):
+        global _shared_models
+        _check_fork()
+        self.models_data = models_data
+        self.workers = workers or os.cpu_count() or 1
+
+        _prepare_fork(models_data, list(model_names or MODEL_NAMES))
+        _shared_models = models_data
+        try:
+            self._pool = multiprocessing.get_context('fork').Pool(self.workers)
+        finally:
+            gc.unfreeze()
+
+    @property
+    def pids(self):
+        return [process.pid for process in self._pool._pool]
+
+    def submit(self, fn, *args):
+        """Run one job on the next free worker; returns an AsyncResult"""
+        return self._pool.apply_async(_run_job, ((fn, args),))
+
+    def imap(self, fn, args_iterable):
+        """Run fn(models_data, *args) for every args tuple, yielding results in order"""
+        return self._pool.imap(_run_job, ((fn, args) for args in args_iterable))
+
+    def score(self, records, model_name, chunk_size=1024):
+        """Score a list of user_input dicts, split into chunks across the workers"""
+        chunks = [(records[i:i + chunk_size], model_name) for i in range(0, len(records), chunk_size)]
+        results = list(self.imap(score_records, chunks))
+        return {
+            key: [value for result in results for value in result[key]]
+            for key in ('probability', 'prediction', 'risk_level')
+        }
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+
+def serve_prefork(models_data, host='127.0.0.1', port=8000, workers=None, model_names=None, **service_kwargs):
+    """
+    Serve ScoringService from N forked uvicorn workers sharing one listening socket
+
+    The kernel spreads incoming connections across the workers. Each worker
+    builds its own ScoringService (and micro-batchers) around the models the
+    parent loaded. Blocks until SIGINT/SIGTERM, which is forwarded to workers.
+    Given a ModelWatcher, each worker polls for and swaps in new releases on its
+    own; a new bundle is mapped from the same file, so its pages are shared again.
+    """
+    _check_fork()
+    import uvicorn
+    from .service import ScoringService
+
+    workers = workers or os.cpu_count() or 1
+    model_names = list(model_names or MODEL_NAMES)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    _prepare_fork(models_data, model_names)
+
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                app = ScoringService(models_data, model_names=model_names, warm_up=False, **service_kwargs)
+                config = uvicorn.Config(app, lifespan='on', log_level='warning')
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException:
+                status = 1
+                import traceback
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        children.append(pid)
+
+    gc.unfreeze()
+    print(f"Serving on http://{host}:{port} with {workers} workers (pids {', '.join(map(str, children))})",
+          file=sys.stderr)
+
+    def _forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _forward)
+    signal.signal(signal.SIGINT, _forward)
+
+    status = 0
+    for pid in children:
+        _, code = os.waitpid(pid, 0)
+        status = status or os.waitstatus_to_exitcode(code)
+    sock.close()
+    return status
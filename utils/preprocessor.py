@@ -1,150 +1,438 @@
 import pandas as pd
 import numpy as np
+from . import metrics
 
+# Raw numeric inputs: (feature column, user_input key, default)
+NUMERIC_INPUTS = [
+    ('admission_type_id', 'admission_type_id', 1),
+    ('discharge_disposition_id', 'discharge_disposition_id', 1),
+    ('admission_source_id', 'admission_source_id', 7),
+    ('time_in_hospital', 'time_in_hospital', 4),
+    ('medical_specialty', 'medical_specialty', 0),
+    ('num_lab_procedures', 'num_lab_procedures', 45),
+    ('num_procedures', 'num_procedures', 2),
+    ('num_medications', 'num_medications', 15),
+    ('number_outpatient', 'number_outpatient', 0),
+    ('number_emergency', 'number_emergency', 0),
+    ('number_inpatient', 'number_inpatient', 0),
+    ('number_diagnoses', 'number_diagnoses', 9.0),
+    ('num_medications_prescribed', 'num_medications', 15),
+]
+
+# Features that never come from the form: (feature column, fixed value)
+CONSTANT_FEATURES = [
+    ('num_medications_changed', 0.0),
+    ('payer_code_MC', 1.0),  # Payer code (default Medicare)
+]
+
+# Categorical inputs: user_input key -> default
+CATEGORICAL_DEFAULTS = {
+    'race': 'Caucasian',
+    'gender': 'Male',
+    'diabetes_med': 'Yes',
+    'hba1c_category': 'No_HbA1c_Test',
+    'primary_diagnosis': 'Diabetes',
+    'age_group': 'Age_60_plus',
+}
+
+# Field that collects features the form never sets (fixed values, medications, payer codes)
+OTHER_FIELD = 'other'
+
+INTERACTION_HBA1C = ['High_HbA1c_MedChanged', 'High_HbA1c_NoMedChange', 'Normal_HbA1c']
+
+# The scaler was fitted on the first 33 features:
+# - 12 numerical features
+# - 18 medication prescribed features
+# - 2 derived features (num_medications_prescribed, num_medications_changed)
+# - 1 interaction feature (long_stay_high_procedures)
+N_SCALED_FEATURES = 33
+
+
+class FeatureLayout:
+    """
+    Integer column offsets for every (field, category) pair in the 116 features
+    Built once from preprocessing_pipeline['feature_names'] so encoding a patient
+    is a handful of dict lookups and integer writes into a NumPy buffer
+    """
+
+    def __init__(self, feature_names, n_scaled=N_SCALED_FEATURES, scaler=None):
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.column_index = {name: i for i, name in enumerate(self.feature_names)}
+        self.scaled = slice(0, n_scaled)
+
+        # StandardScaler folded into a plain affine transform (x - mean) / scale
+        self.scale_mean = None
+        self.scale_std = None
+        if scaler is not None:
+            if getattr(scaler, 'with_mean', True) and getattr(scaler, 'mean_', None) is not None:
+                self.scale_mean = np.array(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, 'with_std', True) and getattr(scaler, 'scale_', None) is not None:
+                self.scale_std = np.array(scaler.scale_, dtype=np.float64)
+
+        index = self.column_index
+
+        self.numeric = [(index[feature], key, default) for feature, key, default in NUMERIC_INPUTS]
+        self.constants = [(index[feature], value) for feature, value in CONSTANT_FEATURES if feature in index]
+        self.long_stay_high_procedures = index['long_stay_high_procedures']
+        self.elderly_polypharmacy = index['elderly_polypharmacy']
+
+        # Race (AfricanAmerican has no column of its own, it was folded into Other)
+        race = self._prefix_lookup('race_')
+        if 'Other' in race:
+            race['AfricanAmerican'] = race['Other']
+
+        # Gender (Female is baseline - no column for it)
+        gender = self._prefix_lookup('gender_')
+        gender.pop('Female', None)
+
+        # Diabetes medication
+        diabetes_med = {'Yes': index['diabetesMed_Yes']}
+
+        # HbA1c category
+        hba1c = self._category_lookup('HbA1c_category_', ['High_HbA1c_NoMedChange', 'Normal_HbA1c'])
+
+        # diag_1 (Circulatory doesn't exist, use Other)
+        diag_1 = self._prefix_lookup('diag_1_grouped_')
+        diag_1.pop('Circulatory', None)
+        if 'Other' in diag_1:
+            diag_1['Circulatory'] = diag_1['Other']
+
+        # Age group
+        age_group = self._category_lookup('age_group_', ['Age_30_60', 'Age_60_plus'])
+
+        # (user_input key, lookup) pairs, each lookup maps category -> column
+        self.one_hot = [
+            ('race', race),
+            ('gender', gender),
+            ('diabetes_med', diabetes_med),
+            ('hba1c_category', hba1c),
+            ('primary_diagnosis', diag_1),
+            ('primary_diagnosis', self._prefix_lookup('diag_2_grouped_')),
+            ('primary_diagnosis', self._prefix_lookup('diag_3_grouped_')),
+            ('age_group', age_group),
+        ]
+
+        # Same lookups as pandas Index + column array for batch encoding
+        self._one_hot_indexers = [
+            (key, pd.Index(list(lookup.keys()), dtype=object), np.fromiter(lookup.values(), dtype=np.intp, count=len(lookup)))
+            for key, lookup in self.one_hot
+        ]
+
+        # Interaction features: (hba1c_category, primary_diagnosis) -> column
+        self.interaction = {}
+        for cat in INTERACTION_HBA1C:
+            for diag, i in self._prefix_lookup(f'HbA1c_Diag_interaction_{cat}_').items():
+                self.interaction[(cat, diag)] = i
+
+        diagnoses = sorted({diag for _, diag in self.interaction})
+        self._interaction_hba1c = pd.Index(INTERACTION_HBA1C, dtype=object)
+        self._interaction_diag = pd.Index(diagnoses, dtype=object)
+        self._interaction_table = np.full((len(INTERACTION_HBA1C), len(diagnoses)), -1, dtype=np.intp)
+        for (cat, diag), i in self.interaction.items():
+            self._interaction_table[INTERACTION_HBA1C.index(cat), diagnoses.index(diag)] = i
+
+        self.fields, self.field_matrix = self._field_groups()
+
+    @classmethod
+    def from_pipeline(cls, preprocessing_pipeline):
+        """Build the layout and scaling parameters matching a loaded preprocessing pipeline"""
+        scaler = preprocessing_pipeline['scaler']
+        n_scaled = getattr(scaler, 'n_features_in_', N_SCALED_FEATURES)
+        return cls(preprocessing_pipeline['feature_names'], n_scaled, scaler)
+
+    def _field_groups(self):
+        """
+        Form fields and an (n_features, n_fields) matrix mapping columns onto them
+
+        One-hot columns belong to the field they encode; derived and interaction
+        features are split equally between their two source fields; features the
+        form never sets fall under OTHER_FIELD. Each row sums to 1, so
+        contributions @ field_matrix keeps their total.
+        """
+        fields = list(dict.fromkeys(key for _, key, _ in NUMERIC_INPUTS))
+        fields += list(CATEGORICAL_DEFAULTS) + [OTHER_FIELD]
+        position = {field: j for j, field in enumerate(fields)}
+        matrix = np.zeros((self.n_features, len(fields)))
+
+        for i, key, _ in self.numeric:
+            matrix[i, position[key]] = 1.0
+        for key, lookup in self.one_hot:
+            matrix[list(lookup.values()), position[key]] = 1.0
+        for i in self.interaction.values():
+            matrix[i, [position['hba1c_category'], position['primary_diagnosis']]] = 0.5
+        matrix[self.long_stay_high_procedures, [position['time_in_hospital'], position['num_procedures']]] = 0.5
+        matrix[self.elderly_polypharmacy, [position['age_group'], position['num_medications']]] = 0.5
+
+        matrix[matrix.sum(axis=1) == 0, position[OTHER_FIELD]] = 1.0
+        return fields, matrix
+
+    def _prefix_lookup(self, prefix):
+        """Map category -> column for every feature starting with prefix"""
+        return {name[len(prefix):]: i for name, i in self.column_index.items() if name.startswith(prefix)}
+
+    def _category_lookup(self, prefix, categories):
+        """Map category -> column for the listed categories that have a column"""
+        return {cat: self.column_index[prefix + cat] for cat in categories if prefix + cat in self.column_index}
+
+    def scale(self, X):
+        """Standardize the scaled slice of X in place, same arithmetic as scaler.transform"""
+        block = X[:, self.scaled]
+        if self.scale_mean is not None:
+            block -= self.scale_mean
+        if self.scale_std is not None:
+            block /= self.scale_std
+        return X
+
+    def encode_record(self, user_input, row):
+        """Write one patient's unscaled features into a zeroed 1-D row"""
+
+        for i, key, default in self.numeric:
+            row[i] = float(user_input.get(key, default))
+        for i, value in self.constants:
+            row[i] = value
+
+        # Derived features
+        long_stay = user_input.get('time_in_hospital', 4) > 7
+        high_proc = user_input.get('num_procedures', 2) > 3
+        row[self.long_stay_high_procedures] = 1.0 if (long_stay and high_proc) else 0.0
+
+        is_elderly = user_input.get('age_group', 'Age_60_plus') == 'Age_60_plus'
+        many_meds = user_input.get('num_medications', 15) >= 5
+        row[self.elderly_polypharmacy] = 1.0 if (is_elderly and many_meds) else 0.0
+
+        # One-hot categories
+        for key, lookup in self.one_hot:
+            i = lookup.get(user_input.get(key, CATEGORICAL_DEFAULTS[key]))
+            if i is not None:
+                row[i] = 1.0
+
+        # Interaction features
+        i = self.interaction.get((
+            user_input.get('hba1c_category', CATEGORICAL_DEFAULTS['hba1c_category']),
+            user_input.get('primary_diagnosis', CATEGORICAL_DEFAULTS['primary_diagnosis']),
+        ))
+        if i is not None:
+            row[i] = 1.0
+
+    def _batch_inputs(self, records):
+        """Numeric inputs as float64 arrays and categorical inputs as arrays, each pulled out once"""
+        numeric = {
+            key: np.asarray(_batch_column(records, key, default), dtype=np.float64)
+            for _, key, default in self.numeric
+        }
+        columns = {key: _batch_column(records, key, default) for key, default in CATEGORICAL_DEFAULTS.items()}
+        return numeric, columns
+
+    def _batch_flags(self, numeric, columns):
+        """Derived features as (column, (N,) bool array) pairs"""
+        return [
+            (self.long_stay_high_procedures, (numeric['time_in_hospital'] > 7) & (numeric['num_procedures'] > 3)),
+            (self.elderly_polypharmacy, (columns['age_group'] == 'Age_60_plus') & (numeric['num_medications'] >= 5)),
+        ]
+
+    def _batch_categories(self, columns):
+        """Column set by each one-hot lookup and by the interaction, as (N,) arrays (-1 where none)"""
+        set_columns = []
+        for key, keys, cols in self._one_hot_indexers:
+            positions = keys.get_indexer(pd.Index(columns[key], dtype=object))
+            set_columns.append(np.where(positions >= 0, cols[positions], -1))
+
+        h = self._interaction_hba1c.get_indexer(pd.Index(columns['hba1c_category'], dtype=object))
+        d = self._interaction_diag.get_indexer(pd.Index(columns['primary_diagnosis'], dtype=object))
+        set_columns.append(np.where((h >= 0) & (d >= 0), self._interaction_table[h, d], -1))
+        return set_columns
+
+    def encode_batch(self, records, X):
+        """Write unscaled features for a list of dicts or a DataFrame into a zeroed (N, 116) matrix"""
+
+        numeric, columns = self._batch_inputs(records)
+        for i, key, _ in self.numeric:
+            X[:, i] = numeric[key]
+        for i, value in self.constants:
+            X[:, i] = value
+
+        # Derived features
+        for i, flag in self._batch_flags(numeric, columns):
+            X[:, i] = flag
+
+        # One-hot categories and interaction features
+        for cols in self._batch_categories(columns):
+            rows = np.flatnonzero(cols >= 0)
+            X[rows, cols[rows]] = 1.0
+
+    def encode_sparse(self, records, dense):
+        """
+        Sparse counterpart of encode_batch
+
+        Writes the unscaled features of the scaled block into a zeroed (N, n_scaled)
+        matrix. Every feature past the block is a 0/1 flag, so those are returned as
+        an (N, k) int32 array holding each row's set columns, one slot per lookup
+        and derived flag, with n_features in slots that set nothing. Constant
+        features past the block are the same for every row (see sparse_offset).
+        """
+        n_dense = dense.shape[1]
+        numeric, columns = self._batch_inputs(records)
+        for i, key, _ in self.numeric:
+            dense[:, i] = numeric[key]
+        for i, value in self.constants:
+            if i < n_dense:
+                dense[:, i] = value
+
+        slots = []
+        for i, flag in self._batch_flags(numeric, columns):
+            if i < n_dense:
+                dense[:, i] = flag
+            else:
+                slots.append(np.where(flag, i, -1))
+        slots += self._batch_categories(columns)
+
+        active = np.empty((len(dense), len(slots)), dtype=np.int32)
+        for j, cols in enumerate(slots):
+            active[:, j] = np.where(cols >= 0, cols, self.n_features)
+        return active
+
+    def sparse_offset(self, dtype=np.float64):
+        """(n_features,) vector of the constant features past the scaled block, zero elsewhere"""
+        offset = np.zeros(self.n_features, dtype=dtype)
+        for i, value in self.constants:
+            if i >= self.scaled.stop:
+                offset[i] = value
+        return offset
+
+
+def get_feature_layout(preprocessing_pipeline):
+    """Return the compiled FeatureLayout, building and caching it on first use"""
+    layout = preprocessing_pipeline.get('feature_layout')
+    if layout is None:
+        layout = FeatureLayout.from_pipeline(preprocessing_pipeline)
+        preprocessing_pipeline['feature_layout'] = layout
+    return layout
+
+
+def _batch_column(records, key, default):
+    """Pull one input field out of a DataFrame or a list of dicts"""
+    if isinstance(records, pd.DataFrame):
+        if key in records.columns:
+            column = records[key]
+            if column.dtype.kind in 'biuf':
+                # Plain numbers, checked for blanks without going through pandas
+                values = column.to_numpy()
+                if values.dtype.kind in 'biu' or (values.dtype.kind == 'f' and not np.isnan(values).any()):
+                    return values
+            # Blank cells (e.g. a key absent from some JSON records) fall back to the default
+            if column.isna().any():
+                column = column.astype(object).where(column.notna(), default)
+            return column.to_numpy()
+        return np.full(len(records), default, dtype=object)
+    return np.array([record.get(key, default) for record in records], dtype=object)
+
+
+@metrics.timed('preprocess_input')
 def preprocess_input(user_input, preprocessing_pipeline):
     """
     Create feature vector with EXACT 116 features matching training data
     Returns numpy array in exact feature order
     """
-    
-    # Get exact feature names from saved pipeline
-    feature_names = preprocessing_pipeline['feature_names']
-    
+
+    layout = get_feature_layout(preprocessing_pipeline)
+
     # Initialize ALL 116 features with 0
-    feature_vector = pd.DataFrame(0.0, index=[0], columns=feature_names)
-    
-    # ========================================================================
-    # FILL IN ALL FEATURE VALUES
-    # ========================================================================
-    
-    # Numerical features
-    feature_vector.loc[0, 'admission_type_id'] = float(user_input.get('admission_type_id', 1))
-    feature_vector.loc[0, 'discharge_disposition_id'] = float(user_input.get('discharge_disposition_id', 1))
-    feature_vector.loc[0, 'admission_source_id'] = float(user_input.get('admission_source_id', 7))
-    feature_vector.loc[0, 'time_in_hospital'] = float(user_input.get('time_in_hospital', 4))
-    feature_vector.loc[0, 'medical_specialty'] = float(user_input.get('medical_specialty', 0))
-    feature_vector.loc[0, 'num_lab_procedures'] = float(user_input.get('num_lab_procedures', 45))
-    feature_vector.loc[0, 'num_procedures'] = float(user_input.get('num_procedures', 2))
-    feature_vector.loc[0, 'num_medications'] = float(user_input.get('num_medications', 15))
-    feature_vector.loc[0, 'number_outpatient'] = float(user_input.get('number_outpatient', 0))
-    feature_vector.loc[0, 'number_emergency'] = float(user_input.get('number_emergency', 0))
-    feature_vector.loc[0, 'number_inpatient'] = float(user_input.get('number_inpatient', 0))
-    feature_vector.loc[0, 'number_diagnoses'] = 9.0
-    
-    # Medication prescribed features (all stay 0 - already initialized)
-    # These are: metformin_prescribed through glipizide-metformin_prescribed
-    
-    feature_vector.loc[0, 'num_medications_prescribed'] = float(user_input.get('num_medications', 15))
-    feature_vector.loc[0, 'num_medications_changed'] = 0.0
-    
-    # Derived features
-    long_stay = user_input.get('time_in_hospital', 4) > 7
-    high_proc = user_input.get('num_procedures', 2) > 3
-    feature_vector.loc[0, 'long_stay_high_procedures'] = 1.0 if (long_stay and high_proc) else 0.0
-    
-    is_elderly = user_input.get('age_group', 'Age_60_plus') == 'Age_60_plus'
-    many_meds = user_input.get('num_medications', 15) >= 5
-    feature_vector.loc[0, 'elderly_polypharmacy'] = 1.0 if (is_elderly and many_meds) else 0.0
-    
-    # Race
-    race = user_input.get('race', 'Caucasian')
-    if race == 'AfricanAmerican':
-        race = 'Other'
-    race_col = f'race_{race}'
-    if race_col in feature_vector.columns:
-        feature_vector.loc[0, race_col] = 1.0
-    
-    # Gender (Female is baseline - no column for it)
-    gender = user_input.get('gender', 'Male')
-    if gender != 'Female':
-        gender_col = f'gender_{gender}'
-        if gender_col in feature_vector.columns:
-            feature_vector.loc[0, gender_col] = 1.0
-    
-    # Payer code (default Medicare)
-    if 'payer_code_MC' in feature_vector.columns:
-        feature_vector.loc[0, 'payer_code_MC'] = 1.0
-    
-    # Diabetes medication
-    if user_input.get('diabetes_med', 'Yes') == 'Yes':
-        feature_vector.loc[0, 'diabetesMed_Yes'] = 1.0
-    
-    # HbA1c category
-    hba1c_cat = user_input.get('hba1c_category', 'No_HbA1c_Test')
-    if hba1c_cat == 'High_HbA1c_NoMedChange':
-        if 'HbA1c_category_High_HbA1c_NoMedChange' in feature_vector.columns:
-            feature_vector.loc[0, 'HbA1c_category_High_HbA1c_NoMedChange'] = 1.0
-    elif hba1c_cat == 'Normal_HbA1c':
-        if 'HbA1c_category_Normal_HbA1c' in feature_vector.columns:
-            feature_vector.loc[0, 'HbA1c_category_Normal_HbA1c'] = 1.0
-    
-    # Primary diagnosis
-    primary_diag = user_input.get('primary_diagnosis', 'Diabetes')
-    
-    # diag_1 (Circulatory doesn't exist, use Other)
-    if primary_diag == 'Circulatory':
-        if 'diag_1_grouped_Other' in feature_vector.columns:
-            feature_vector.loc[0, 'diag_1_grouped_Other'] = 1.0
-    else:
-        col = f'diag_1_grouped_{primary_diag}'
-        if col in feature_vector.columns:
-            feature_vector.loc[0, col] = 1.0
-    
-    # diag_2
-    col = f'diag_2_grouped_{primary_diag}'
-    if col in feature_vector.columns:
-        feature_vector.loc[0, col] = 1.0
-    
-    # diag_3
-    col = f'diag_3_grouped_{primary_diag}'
-    if col in feature_vector.columns:
-        feature_vector.loc[0, col] = 1.0
-    
-    # Age group
-    age_group = user_input.get('age_group', 'Age_60_plus')
-    if age_group == 'Age_30_60':
-        if 'age_group_Age_30_60' in feature_vector.columns:
-            feature_vector.loc[0, 'age_group_Age_30_60'] = 1.0
-    elif age_group == 'Age_60_plus':
-        if 'age_group_Age_60_plus' in feature_vector.columns:
-            feature_vector.loc[0, 'age_group_Age_60_plus'] = 1.0
-    
-    # Interaction features
-    interaction_col = None
-    if hba1c_cat == 'High_HbA1c_MedChanged':
-        interaction_col = f'HbA1c_Diag_interaction_High_HbA1c_MedChanged_{primary_diag}'
-    elif hba1c_cat == 'High_HbA1c_NoMedChange':
-        interaction_col = f'HbA1c_Diag_interaction_High_HbA1c_NoMedChange_{primary_diag}'
-    elif hba1c_cat == 'Normal_HbA1c':
-        interaction_col = f'HbA1c_Diag_interaction_Normal_HbA1c_{primary_diag}'
-    
-    if interaction_col and interaction_col in feature_vector.columns:
-        feature_vector.loc[0, interaction_col] = 1.0
-    
+    feature_vector = np.zeros((1, layout.n_features), dtype=np.float64)
+    layout.encode_record(user_input, feature_vector[0])
+
     # ========================================================================
     # CRITICAL FIX: Scale the FIRST 33 features (what scaler was trained on)
     # ========================================================================
-    
-    scaler = preprocessing_pipeline['scaler']
-    
-    # The scaler was fitted on the first 33 features:
-    # - 12 numerical features
-    # - 18 medication prescribed features
-    # - 2 derived features (num_medications_prescribed, num_medications_changed)
-    # - 1 interaction feature (long_stay_high_procedures)
-    
-    # Extract first 33 features
-    first_33_features = feature_names[:33]
-    first_33_values = feature_vector[first_33_features].values
-    
-    # Scale them
-    scaled_33_values = scaler.transform(first_33_values)
-    
-    # Put scaled values back
-    feature_vector[first_33_features] = scaled_33_values
-    
-    # ========================================================================
-    # RETURN AS NUMPY ARRAY in exact column order
-    # ========================================================================
-    
-    return feature_vector[feature_names].values
\ No newline at end of file
+
+    with metrics.timer('scale'):
+        layout.scale(feature_vector)
+
+    return feature_vector
+
+
+@metrics.timed('preprocess_batch')
+def preprocess_batch(records, preprocessing_pipeline):
+    """
+    Vectorized version of preprocess_input for many patients at once
+    Accepts a list of user_input dicts or a DataFrame with the same keys as columns
+    Returns numpy array of shape (N, 116); each row matches preprocess_input exactly
+    """
+
+    layout = get_feature_layout(preprocessing_pipeline)
+    n_rows = len(records)
+
+    X = np.zeros((n_rows, layout.n_features), dtype=np.float64)
+    layout.encode_batch(records, X)
+
+    # Scale the first 33 features in one vectorized pass
+    with metrics.timer('scale'):
+        layout.scale(X)
+
+    metrics.increment('rows_preprocessed', n_rows)
+    return X
+
+
+class SparseBatch:
+    """
+    Encoded batch with the scaled block dense and the one-hot features as column indices
+
+    Attributes:
+        dense: (N, n_scaled) scaled features
+        active: (N, k) int32 columns past the block that are 1 (n_features in unused slots)
+        offset: (n_features,) constant features past the block, shared by every row
+    """
+
+    def __init__(self, dense, active, offset):
+        self.dense = dense
+        self.active = active
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.dense)
+
+    def __getitem__(self, rows):
+        """The batch restricted to a slice of rows"""
+        return SparseBatch(self.dense[rows], self.active[rows], self.offset)
+
+    @property
+    def shape(self):
+        return (len(self.dense), len(self.offset))
+
+    def toarray(self, dtype=None):
+        """Dense (N, n_features) matrix equal to preprocess_batch's, in dtype (default: the block's)"""
+        n_rows, n_dense = self.dense.shape
+        X = np.empty(self.shape, dtype=self.dense.dtype if dtype is None else dtype)
+        X[:, :n_dense] = self.dense
+        X[:, n_dense:] = self.offset[n_dense:]
+        rows = np.repeat(np.arange(n_rows), self.active.shape[1])
+        cols = self.active.ravel()
+        keep = cols < X.shape[1]
+        X[rows[keep], cols[keep]] = 1.0
+        return X
+
+
+@metrics.timed('preprocess_sparse')
+def preprocess_sparse(records, preprocessing_pipeline, dtype=np.float32):
+    """
+    Encode records like preprocess_batch, as a SparseBatch with a dtype dense block
+
+    At float32 a row takes 33 * 4 bytes plus 4 per one-hot slot instead of 116 * 8,
+    so large batches move a fraction of the memory through the models that accept
+    it (see utils.precision).
+    """
+
+    layout = get_feature_layout(preprocessing_pipeline)
+    n_rows = len(records)
+
+    dense = np.zeros((n_rows, layout.scaled.stop), dtype=np.float64)
+    active = layout.encode_sparse(records, dense)
+
+    # Scaled in float64 and rounded once, so float32 values match what
+    # XGBoost makes of preprocess_batch's output (its split thresholds sit on them)
+    with metrics.timer('scale'):
+        layout.scale(dense)
+        dense = dense.astype(dtype, copy=False)
+
+    metrics.increment('rows_preprocessed', n_rows)
+    return SparseBatch(dense, active, layout.sparse_offset(dtype))
@@ -0,0 +1,92 @@
+"""
+What-if sensitivity grids
+
+From one patient's user_input, every combination of values for the selected
+fields is laid out as rows of a DataFrame, encoded with a single
+preprocess_batch call and scored with one predict_batch call per model, so a
+grid of hundreds of variations costs about as much as one prediction.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .preprocessor import preprocess_batch
+from .predictor import predict_batch, ENSEMBLE
+
+# Sweepable numeric form fields: (label, min, max, step) matching the app's inputs
+SWEEP_FIELDS = {
+    'time_in_hospital': ('Time in Hospital (days)', 1, 14, 1),
+    'num_medications': ('Number of Medications', 0, 50, 1),
+    'num_lab_procedures': ('Number of Lab Procedures', 0, 100, 5),
+    'number_inpatient': ('Previous Inpatient Visits', 0, 20, 1),
+    'number_emergency': ('Previous Emergency Visits', 0, 20, 1),
+}
+
+# Input keys that carry a copy of another field and must move with it
+LINKED_FIELDS = {
+    'num_medications': ['num_medications_prescribed'],
+}
+
+
+def field_values(field, start=None, stop=None, step=None):
+    """Inclusive range of values for a sweepable field, defaulting to its full form range"""
+    _, low, high, default_step = SWEEP_FIELDS[field]
+    start = low if start is None else start
+    stop = high if stop is None else stop
+    step = default_step if step is None else step
+    return np.arange(start, stop + step / 2, step)
+
+
+def build_grid(base_input, sweeps):
+    """
+    DataFrame of base_input variations, one row per combination of swept values
+
+    Args:
+        base_input: Patient input dict as built by the app
+        sweeps: Mapping of field -> sequence of values; the first field varies slowest
+
+    Returns:
+        DataFrame with the user_input keys as columns
+    """
+    fields = list(sweeps)
+    axes = np.meshgrid(*(np.asarray(sweeps[f]) for f in fields), indexing='ij')
+    n_rows = axes[0].size if axes else 1
+
+    grid = pd.DataFrame(base_input, index=pd.RangeIndex(n_rows))
+    for field, values in zip(fields, axes):
+        grid[field] = values.ravel()
+        for linked in LINKED_FIELDS.get(field, []):
+            if linked in grid.columns:
+                grid[linked] = values.ravel()
+    return grid
+
+
+def sensitivity_grid(models_data, base_input, sweeps, model_names):
+    """
+    Score every variation of base_input over the swept fields
+
+    Args:
+        models_data: Loaded models (as returned by load_models)
+        base_input: Patient input dict as built by the app
+        sweeps: Mapping of field -> sequence of values (one or two fields for plotting)
+        model_names: Models to score with (names as for predict_batch, including 'ensemble')
+
+    Returns:
+        Dictionary with 'grid' (swept columns plus <model>_probability and
+        <model>_risk_level per model), 'fields', and 'surfaces' mapping each model
+        to its probabilities reshaped to the grid's (len(values), ...) shape
+    """
+    grid = build_grid(base_input, sweeps)
+    feature_matrix = preprocess_batch(grid, models_data['preprocessing'])
+    shape = tuple(len(values) for values in sweeps.values())
+
+    out = grid[list(sweeps)].reset_index(drop=True)
+    surfaces = {}
+    for model_name in model_names:
+        model_data = models_data if model_name == ENSEMBLE else models_data[model_name]
+        result = predict_batch(model_data, feature_matrix, model_name)
+        out[f'{model_name}_probability'] = result['probability']
+        out[f'{model_name}_risk_level'] = result['risk_level']
+        surfaces[model_name] = np.asarray(result['probability']).reshape(shape)
+
+    return {'grid': out, 'fields': list(sweeps), 'surfaces': surfaces}
@@ -0,0 +1,396 @@
+"""
+Local HTTP/JSON scoring service
+
+A plain ASGI application over load_models / preprocess_batch / predict_batch.
+Concurrent requests for the same model that arrive within a short window are
+coalesced into one vectorized model call.
+
+Endpoints:
+    GET  /health          liveness, always 200 once the process is up
+    GET  /ready           200 when every served model is loaded, 503 otherwise; reports the model version
+    GET  /version         active model version and recent reloads (with --reload-interval)
+    GET  /metrics         stage timings and counters in Prometheus text format
+    GET  /drift           feature and score drift snapshot (with --drift, see utils.drift)
+    POST /predict         {"model": "xgboost", "input": {...user_input...}}
+    POST /predict/batch   {"model": "xgboost", "inputs": [{...}, ...]}
+
+Inputs are checked against the input schema (utils.schema). A record with
+errors (unparseable or out-of-range numbers, unknown categories) gets an
+'error' and its 'validation' issues instead of a prediction, and a single
+/predict answers 422. Warnings (omitted fields, remapped categories) are
+returned under 'validation' next to the prediction.
+
+Every prediction carries the 'model_version' that produced it. With
+--reload-interval the models directory is watched and new releases are swapped
+in without a restart (see utils.hot_reload).
+
+Run with uvicorn:
+    python -m utils.service --port 8000 --window-ms 2 --max-batch-size 256
+    python -m utils.service --workers 4     # pre-fork workers sharing one model load
+    python -m utils.service --reload-interval 5
+    python -m utils.service --drift
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import threading
+
+import numpy as np
+
+from . import metrics
+from .drift import DriftMonitor, load_reference
+from .hot_reload import ModelWatcher
+from .model_loader import load_models
+from .preprocessor import preprocess_batch
+from .predictor import predict_batch
+from .schema import validate_batch
+
+MODEL_NAMES = ['logistic_regression', 'xgboost', 'neural_network']
+DEFAULT_MODEL = 'xgboost'
+
+
+class MicroBatcher:
+    """
+    Queue of pending requests for one model, flushed as a single batch when the
+    window elapses or max_batch_size rows have been collected
+
+    No batch exceeds max_batch_size rows: larger submits are queued in chunks of
+    that size, and a request that would overflow a batch starts the next one.
+    """
+
+    def __init__(self, score_fn, window=0.002, max_batch_size=256):
+        self.score_fn = score_fn
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.rows = 0
+        self._queue = None
+        self._task = None
+        # Request held back from a full batch, to start the next one
+        self._carry = None
+
+    async def submit(self, records):
+        """Score a list of user_input dicts, sharing a model call with concurrent submits"""
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+        futures = []
+        for start in range(0, len(records), self.max_batch_size):
+            future = loop.create_future()
+            await self._queue.put((records[start:start + self.max_batch_size], future))
+            futures.append(future)
+        return [result for results in await asyncio.gather(*futures) for result in results]
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._carry = None
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        if self._carry is not None:
+            pending, self._carry = [self._carry], None
+        else:
+            pending = [await self._queue.get()]
+        n_rows = len(pending[0][0])
+        deadline = loop.time() + self.window
+
+        while n_rows < self.max_batch_size:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if n_rows + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            pending.append(item)
+            n_rows += len(item[0])
+
+        return pending
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await self._collect()
+            records = [record for batch, _ in pending for record in batch]
+
+            try:
+                # Model call runs off the event loop so new requests keep queueing
+                results = await loop.run_in_executor(None, self.score_fn, records)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(records)
+
+            offset = 0
+            for batch, future in pending:
+                if not future.done():
+                    future.set_result(results[offset:offset + len(batch)])
+                offset += len(batch)
+
+
+class ScoringService:
+    """
+    ASGI application serving readmission predictions over JSON
+
+    models_data is a loaded registry, or a ModelWatcher whose current registry is
+    taken once per coalesced batch (its polling starts with the app's lifespan).
+    drift_monitor, when given, observes every scored batch; after a reload it is
+    replaced by a fresh monitor on the new version's preprocessing, against the
+    same reference.
+    """
+
+    def __init__(self, models_data, model_names=None, window_ms=2.0, max_batch_size=256, warm_up=True,
+                 drift_monitor=None):
+        self.models_data = models_data
+        self.model_names = list(model_names or MODEL_NAMES)
+        self.warm_up = warm_up
+        self.drift_monitor = drift_monitor
+        self._drift_version = getattr(self.models(), 'version', None)
+        self._drift_lock = threading.Lock()
+        self.batchers = {
+            name: MicroBatcher(self._scorer(name), window_ms / 1000.0, max_batch_size)
+            for name in self.model_names
+        }
+
+    def _scorer(self, model_name):
+        def score(records):
+            models = self.models()
+            version = getattr(models, 'version', None)
+            validation = validate_batch(records, models['preprocessing'])
+            results = [{'model': model_name, 'model_version': version} for _ in records]
+
+            # Rows with errors are answered with their issues instead of a prediction
+            valid = [i for i, error in enumerate(validation.errors) if not error]
+            if valid:
+                feature_matrix = preprocess_batch([validation.records[i] for i in valid], models['preprocessing'])
+                result = predict_batch(models[model_name], feature_matrix, model_name)
+                if self.drift_monitor is not None:
+                    self._monitor_for(models).observe(feature_matrix, model_name, result['probability'])
+                for i, prediction, probability, risk_level in zip(
+                    valid, result['prediction'], result['probability'], result['risk_level']
+                ):
+                    results[i].update({
+                        'prediction': int(prediction),
+                        'probability': float(probability),
+                        'risk_level': str(risk_level),
+                    })
+
+            for i in np.flatnonzero(validation.errors | validation.warnings):
+                issues = validation.row_issues(i)
+                if issues['errors']:
+                    results[i]['error'] = 'Invalid input'
+                results[i]['validation'] = issues
+            return results
+        return score
+
+    def _monitor_for(self, models):
+        """The drift monitor for models' version, starting a new one when the version changed"""
+        with self._drift_lock:
+            version = getattr(models, 'version', None)
+            if version != self._drift_version:
+                self.drift_monitor = DriftMonitor(models['preprocessing'], self.drift_monitor.reference)
+                self._drift_version = version
+            return self.drift_monitor
+
+    def models(self):
+        """The registry to score from: the watcher's current one, or models_data itself"""
+        return getattr(self.models_data, 'current', self.models_data)
+
+    def model_status(self):
+        """Model name -> loaded flag (plain dicts of models count as loaded)"""
+        is_loaded = getattr(self.models(), 'is_loaded', None)
+        return {name: True if is_loaded is None else is_loaded(name) for name in self.model_names}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'] == '/metrics' and scope['method'] == 'GET':
+            status, content_type, body = 200, b'text/plain; version=0.0.4', metrics.prometheus_text().encode()
+        else:
+            status, payload = await self._dispatch(scope, receive)
+            content_type, body = b'application/json', json.dumps(payload).encode()
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.warm_up and hasattr(self.models_data, 'warm_up'):
+                    self.models_data.warm_up(self.model_names, background=True)
+                if isinstance(self.models_data, ModelWatcher):
+                    self.models_data.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if isinstance(self.models_data, ModelWatcher):
+                    self.models_data.stop()
+                for batcher in self.batchers.values():
+                    await batcher.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _dispatch(self, scope, receive):
+        method = scope['method']
+        path = scope['path'].rstrip('/') or '/'
+
+        if path == '/health' and method == 'GET':
+            return 200, {'status': 'ok'}
+
+        if path == '/ready' and method == 'GET':
+            models = self.model_status()
+            ready = all(models.values())
+            version = getattr(self.models(), 'version', None)
+            return (200 if ready else 503), {'ready': ready, 'version': version, 'models': models}
+
+        if path == '/version' and method == 'GET':
+            history = getattr(self.models_data, 'history', [])
+            return 200, {'version': getattr(self.models(), 'version', None), 'history': history}
+
+        if path == '/drift' and method == 'GET':
+            if self.drift_monitor is None:
+                return 404, {'error': 'Drift monitoring is not enabled'}
+            return 200, self.drift_monitor.snapshot()
+
+        if path in ('/predict', '/predict/batch'):
+            if method != 'POST':
+                return 405, {'error': 'Method not allowed'}
+            try:
+                request = json.loads(await _read_body(receive) or b'{}')
+            except ValueError as e:
+                return 400, {'error': f"Invalid JSON: {str(e)}"}
+            return await self._predict(request, batch=path == '/predict/batch')
+
+        return 404, {'error': 'Not found'}
+
+    async def _predict(self, request, batch):
+        if not isinstance(request, dict):
+            return 400, {'error': 'Request body must be a JSON object'}
+
+        model_name = request.get('model', DEFAULT_MODEL)
+        if model_name not in self.batchers:
+            return 400, {'error': f"Unknown model: {model_name}"}
+
+        records = request.get('inputs') if batch else [request.get('input')]
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            message = "'inputs' must be a list of objects" if batch else "'input' must be an object"
+            return 400, {'error': message}
+        if not records:
+            return 200, {'results': []}
+
+        try:
+            results = await self.batchers[model_name].submit(records)
+        except Exception as e:
+            return 500, {'error': f"Prediction error: {str(e)}"}
+
+        if not batch and 'error' in results[0]:
+            return 422, results[0]
+        return 200, ({'results': results} if batch else results[0])
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            return body
+
+
+def _load(models_dir, reload_interval=None):
+    """A ModelWatcher when reloading, else the cached registry (None on failure)"""
+    if reload_interval:
+        return ModelWatcher(models_dir, interval=reload_interval)
+    return load_models(models_dir)
+
+
+def _drift_monitor(models_data, models_dir):
+    """DriftMonitor against the saved reference profile, or the scaler's training moments"""
+    preprocessing = getattr(models_data, 'current', models_data)['preprocessing']
+    return DriftMonitor(preprocessing, load_reference(models_dir))
+
+
+def create_app(models_dir='models', reload_interval=None, drift=False, **kwargs):
+    """
+    Load models (lazily, or through a ModelWatcher when reload_interval is set) and
+    build a ScoringService, monitoring drift when drift is set
+    """
+    models_data = _load(models_dir, reload_interval)
+    if models_data is None:
+        raise RuntimeError(f"Failed to load models from {models_dir}")
+    if drift:
+        kwargs['drift_monitor'] = _drift_monitor(models_data, models_dir)
+    return ScoringService(models_data, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve readmission predictions over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--window-ms', type=float, default=2.0, help="Micro-batching window (default: 2 ms)")
+    parser.add_argument('--max-batch-size', type=int, default=256, help="Most rows per coalesced model call (default: 256)")
+    parser.add_argument('--metrics', action='store_true', help="Collect stage timings for GET /metrics")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes forked after loading the models once (default: 1)")
+    parser.add_argument('--drift', action='store_true', help="Monitor input and score drift for GET /drift")
+    parser.add_argument('--reload-interval', type=float, default=None,
+                        help="Poll the models directory every N seconds and hot-swap new releases")
+    args = parser.parse_args(argv)
+
+    if args.metrics:
+        metrics.enable()
+
+    try:
+        import uvicorn
+    except ImportError:
+        print("uvicorn is required to run the service: pip install uvicorn", file=sys.stderr)
+        return 1
+
+    if args.workers > 1:
+        from .prefork import serve_prefork
+        models_data = _load(args.models_dir, args.reload_interval)
+        if models_data is None:
+            print(f"Failed to load models from {args.models_dir}", file=sys.stderr)
+            return 1
+        drift_monitor = _drift_monitor(models_data, args.models_dir) if args.drift else None
+        return serve_prefork(models_data, args.host, args.port, args.workers,
+                             window_ms=args.window_ms, max_batch_size=args.max_batch_size,
+                             drift_monitor=drift_monitor)
+
+    app = create_app(args.models_dir, args.reload_interval, args.drift,
+                     window_ms=args.window_ms, max_batch_size=args.max_batch_size)
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,461 @@
+"""
+Streaming scoring of an append-only encounter feed
+
+Tails a JSON-lines/CSV file, or a spool directory that such files are dropped
+into, and scores new records in micro-batches as they arrive. A batch is
+flushed when it reaches --max-batch-rows or its oldest record has waited
+--max-wait-ms. Results are appended to a .csv or .jsonl output, with the
+model_version that scored them, then the byte offset reached in every source
+file is checkpointed.
+
+Records are validated against the input schema while they are scored, as
+with batch_score --validate: invalid values are scored as their defaults and
+named in the input_errors column. A batch that still fails to score is retried
+row by row, and rows that fail on their own are appended to
+<output>.rejects.jsonl with their source, offset and error. Their offsets are
+committed like any other, so one bad record cannot stall the feed.
+
+The checkpoint also records the output and rejects sizes at that point. On
+restart both are truncated back to them, dropping rows written after the last
+checkpoint, and every source is resumed from its checkpointed offset. Each
+record is therefore written exactly once, even after a crash.
+
+Usage:
+    python -m utils.stream_score feed.jsonl scores.csv --model xgboost
+    python -m utils.stream_score spool/ scores.jsonl --model all --keep-columns encounter_id
+    python -m utils.stream_score spool/ scores.csv --once     # drain what is there and exit
+
+Only complete (newline-terminated) lines are consumed; a partially written
+last line is picked up on a later poll. Lines end at \n only, and blank lines
+are skipped. CSV fields may not contain newlines.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from . import metrics
+from .batch_score import score_chunk, MODEL_NAMES
+from .model_loader import load_models
+from .predictor import ENSEMBLE
+
+SOURCE_SUFFIXES = ('.jsonl', '.json', '.ndjson', '.csv')
+CHECKPOINT_VERSION = 1
+
+# Bytes read from one source file per poll
+READ_BYTES = 1 << 20
+
+
+def _is_csv(path):
+    return path.lower().endswith('.csv')
+
+
+def parse_lines(path, lines, header=None):
+    """
+    Decode complete lines from one source into a DataFrame
+
+    Returns:
+        Tuple of (DataFrame, mask of lines that parsed); blank and unparseable lines are dropped
+    """
+    if _is_csv(path):
+        # Blank lines hold no record; they are skipped here so the mask stays aligned with the rows
+        parsed = [bool(line.strip()) for line in lines]
+        records = [line for line, ok in zip(lines, parsed) if ok]
+        try:
+            frame = pd.read_csv(io.BytesIO(b''.join(records)), names=header, header=None, skip_blank_lines=False)
+            if len(frame) == len(records):
+                return frame, parsed
+        except ValueError:
+            pass
+        # Some line is malformed: parse them one by one to find it
+        frames = []
+        for i, line in enumerate(lines):
+            if not parsed[i]:
+                continue
+            try:
+                frames.append(pd.read_csv(io.BytesIO(line), names=header, header=None))
+            except ValueError:
+                parsed[i] = False
+        return (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=header)), parsed
+
+    records, parsed = [], []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        ok = isinstance(record, dict)
+        parsed.append(ok)
+        if ok:
+            records.append(record)
+    return pd.DataFrame.from_records(records), parsed
+
+
+class Checkpoint:
+    """Committed source offsets and output size, saved atomically as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        self.output_bytes = 0
+        self.rejects_bytes = 0
+        self.rows = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get('version') != CHECKPOINT_VERSION:
+                raise ValueError(f"Unsupported checkpoint version in {path}")
+            self.offsets = {name: int(offset) for name, offset in state['offsets'].items()}
+            self.output_bytes = int(state['output_bytes'])
+            self.rejects_bytes = int(state.get('rejects_bytes', 0))
+            self.rows = int(state['rows'])
+
+    def save(self):
+        if not self.path:
+            return
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'offsets': self.offsets,
+            'output_bytes': self.output_bytes,
+            'rejects_bytes': self.rejects_bytes,
+            'rows': self.rows,
+        }
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class StreamScorer:
+    """
+    Incremental scorer for a tailed file or spool directory
+
+    Args:
+        source: JSON-lines/CSV file, or a directory of them (processed in name order)
+        output_path: .csv or .jsonl file that results are appended to
+        models_data: Loaded models (as returned by load_models)
+        model_names: Models to score with (names as for predict_batch, including 'ensemble')
+        checkpoint_path: Where offsets are committed (default: <output_path>.checkpoint.json)
+        max_batch_rows: Flush once this many records are pending
+        max_wait: Flush once the oldest pending record has waited this many seconds
+        keep_columns: Input columns copied to the output
+        rejects_path: JSON-lines file for records that fail to score (default: <output_path>.rejects.jsonl)
+    """
+
+    def __init__(self, source, output_path, models_data, model_names, checkpoint_path=None,
+                 max_batch_rows=1024, max_wait=0.5, keep_columns=(), log=None, rejects_path=None):
+        self.source = source
+        self.output_path = output_path
+        self.models_data = models_data
+        self.model_names = list(model_names)
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait
+        self.keep_columns = list(keep_columns)
+        self.log = log or (lambda msg: None)
+
+        self.checkpoint = Checkpoint(checkpoint_path or f'{output_path}.checkpoint.json')
+        self._is_csv_output = _is_csv(output_path)
+        self._output = self._open_output(output_path, self.checkpoint.output_bytes)
+        self._rejects = self._open_output(rejects_path or f'{output_path}.rejects.jsonl', self.checkpoint.rejects_bytes)
+
+        # Read-ahead state: offsets consumed into pending batches, not yet committed
+        self._offsets = dict(self.checkpoint.offsets)
+        self._headers = {}
+        self._pending = []
+        self._pending_rows = 0
+        self._oldest_pending = None
+
+        self.started = time.monotonic()
+        self.rows = 0
+        self.batches = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.last_latency = 0.0
+
+    def _open_output(self, path, committed_bytes):
+        """Open an output for appending, cut back to its last committed size"""
+        output = open(path, 'ab')
+        size = output.seek(0, os.SEEK_END)
+        if size != committed_bytes:
+            if size < committed_bytes:
+                output.close()
+                raise ValueError(
+                    f"{path} is smaller than its checkpoint says ({size} < "
+                    f"{committed_bytes} bytes); refusing to resume"
+                )
+            self.log(f"discarding {size - committed_bytes} uncommitted bytes of {path}")
+            output.truncate(committed_bytes)
+            output.seek(committed_bytes)
+        return output
+
+    def source_files(self):
+        if os.path.isdir(self.source):
+            names = sorted(n for n in os.listdir(self.source) if n.lower().endswith(SOURCE_SUFFIXES))
+            return [os.path.join(self.source, n) for n in names]
+        return [self.source] if os.path.exists(self.source) else []
+
+    def _key(self, path):
+        return os.path.relpath(path, self.source) if os.path.isdir(self.source) else os.path.basename(path)
+
+    def _header(self, path, f):
+        """CSV header of a source file, or None until its first line is complete"""
+        if path not in self._headers:
+            f.seek(0)
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                return None
+            self._headers[path] = (pd.read_csv(io.BytesIO(line)).columns.tolist(), len(line))
+        return self._headers[path]
+
+    def _read_source(self, path, budget):
+        """Consume up to budget complete lines from one file into the pending batch"""
+        key = self._key(path)
+        offset = self._offsets.get(key, 0)
+        size = os.path.getsize(path)
+        if size < offset:
+            self.log(f"{key} shrank below its checkpointed offset; rescanning from the start")
+            offset = 0
+            self._headers.pop(path, None)
+        if size == offset:
+            return 0
+
+        with open(path, 'rb') as f:
+            header = None
+            if _is_csv(path):
+                header = self._header(path, f)
+                if header is None:
+                    return 0
+                header, header_bytes = header
+                offset = max(offset, header_bytes)
+
+            f.seek(offset)
+            data = f.read(min(READ_BYTES, size - offset))
+
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return 0
+        # Split on \n only: a bare \r is valid inside a record (e.g. JSON whitespace)
+        lines = [line + b'\n' for line in data[:end - 1].split(b'\n', budget)[:budget]]
+
+        # Byte offset of each line start, for traceability in the output
+        starts = []
+        position = offset
+        for line in lines:
+            starts.append(position)
+            position += len(line)
+
+        frame, parsed = parse_lines(path, lines, header)
+        self.skipped += len(lines) - sum(parsed)
+        frame['source'] = key
+        frame['offset'] = [start for start, ok in zip(starts, parsed) if ok]
+
+        self._offsets[key] = position
+        if len(frame):
+            self._pending.append(frame)
+            self._pending_rows += len(frame)
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+        return len(lines)
+
+    def poll(self):
+        """Read newly appended complete lines from every source; returns lines consumed"""
+        consumed = 0
+        for path in self.source_files():
+            budget = self.max_batch_rows - self._pending_rows
+            if budget <= 0:
+                break
+            consumed += self._read_source(path, budget)
+        return consumed
+
+    def due(self):
+        """True when the pending batch should be flushed"""
+        if self._pending_rows >= self.max_batch_rows:
+            return True
+        return self._oldest_pending is not None and time.monotonic() - self._oldest_pending >= self.max_wait
+
+    def _score(self, batch):
+        """
+        Score a batch, falling back to one row at a time when the batch fails
+
+        Returns:
+            Tuple of (rows that scored, their scores, rejects JSON lines)
+        """
+        try:
+            return batch, score_chunk(self.models_data, batch, self.model_names, validate=True), b''
+        except Exception:
+            pass
+
+        kept, scored, rejects = [], [], []
+        for i in range(len(batch)):
+            row = batch.iloc[i:i + 1].reset_index(drop=True)
+            try:
+                scored.append(score_chunk(self.models_data, row, self.model_names, validate=True))
+                kept.append(i)
+            except Exception as e:
+                source, offset = batch['source'].iat[i], int(batch['offset'].iat[i])
+                self.log(f"rejected {source}@{offset}: {e}")
+                rejects.append(json.dumps({'source': source, 'offset': offset, 'error': str(e)}) + '\n')
+        batch = batch.iloc[kept].reset_index(drop=True)
+        scored = pd.concat(scored, ignore_index=True) if scored else pd.DataFrame(index=batch.index)
+        return batch, scored, ''.join(rejects).encode()
+
+    def _append(self, batch, scored):
+        """Append scored rows to the output"""
+        out = pd.DataFrame({'source': batch['source'].to_numpy(), 'offset': batch['offset'].to_numpy()})
+        for col in self.keep_columns:
+            out[col] = batch[col].to_numpy() if col in batch.columns else None
+        out['model_version'] = getattr(self.models_data, 'version', None)
+        out = pd.concat([out, scored], axis=1)
+
+        buffer = io.StringIO()
+        if self._is_csv_output:
+            out.to_csv(buffer, header=self.checkpoint.output_bytes == 0, index=False)
+        else:
+            out.to_json(buffer, orient='records', lines=True)
+            if not buffer.getvalue().endswith('\n'):
+                buffer.write('\n')
+        data = buffer.getvalue().encode()
+        self._output.write(data)
+        self._output.flush()
+        os.fsync(self._output.fileno())
+
+        self.checkpoint.output_bytes += len(data)
+        self.checkpoint.rows += len(out)
+        self.rows += len(out)
+        self.batches += 1
+        self.last_latency = time.monotonic() - self._oldest_pending
+        metrics.increment('rows_streamed', len(out))
+
+    def flush(self):
+        """Score pending records, append them (and any rejects) to the outputs and commit offsets"""
+        if self._pending:
+            batch = pd.concat(self._pending, ignore_index=True)
+            with metrics.timer('stream_flush'):
+                batch, scored, rejects = self._score(batch)
+
+            if rejects:
+                self._rejects.write(rejects)
+                self._rejects.flush()
+                os.fsync(self._rejects.fileno())
+                self.checkpoint.rejects_bytes += len(rejects)
+                self.rejected += rejects.count(b'\n')
+
+            if len(batch):
+                self._append(batch, scored)
+
+        # Offsets advance even when every consumed line was skipped as malformed
+        if self._offsets != self.checkpoint.offsets:
+            self.checkpoint.offsets = dict(self._offsets)
+            self.checkpoint.save()
+
+        self._pending = []
+        self._pending_rows = 0
+        self._oldest_pending = None
+
+    def backlog_bytes(self):
+        """Bytes appended to the sources that have not been committed yet"""
+        total = 0
+        for path in self.source_files():
+            total += max(os.path.getsize(path) - self.checkpoint.offsets.get(self._key(path), 0), 0)
+        return total
+
+    def stats(self):
+        elapsed = time.monotonic() - self.started
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'skipped_lines': self.skipped,
+            'rejected_rows': self.rejected,
+            'rows_per_second': self.rows / elapsed if elapsed > 0 else 0.0,
+            'last_batch_latency_s': self.last_latency,
+            'backlog_bytes': self.backlog_bytes(),
+            'committed_rows': self.checkpoint.rows,
+        }
+
+    def run(self, poll_interval=0.2, once=False, report_interval=10.0, stop=None):
+        """
+        Poll, flush and checkpoint until stopped
+
+        Args:
+            poll_interval: Seconds to sleep when no new data arrived
+            once: Return after the sources have been drained instead of tailing them
+            report_interval: Seconds between stats lines passed to log
+            stop: Optional callable; the loop exits when it returns True
+        """
+        next_report = time.monotonic() + report_interval
+        try:
+            while stop is None or not stop():
+                consumed = self.poll()
+                if self.due() or (once and consumed == 0):
+                    self.flush()
+                if once and consumed == 0:
+                    break
+
+                now = time.monotonic()
+                if now >= next_report:
+                    self.log(json.dumps(self.stats()))
+                    next_report = now + report_interval
+                if consumed == 0:
+                    # Wake up in time to flush a pending batch at its deadline
+                    wait = poll_interval
+                    if self._oldest_pending is not None:
+                        wait = min(wait, max(self._oldest_pending + self.max_wait - now, 0.0))
+                    time.sleep(wait)
+        finally:
+            self.flush()
+        return self.stats()
+
+    def close(self):
+        self._output.close()
+        self._rejects.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score an append-only encounter feed incrementally")
+    parser.add_argument('source', help="JSON-lines/CSV file to tail, or a spool directory of them")
+    parser.add_argument('output', help="Output .csv or .jsonl file (appended to)")
+    parser.add_argument('--model', default='xgboost', choices=MODEL_NAMES + [ENSEMBLE, 'all'])
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint.json)")
+    parser.add_argument('--max-batch-rows', type=int, default=1024, help="Flush after this many records (default: 1024)")
+    parser.add_argument('--max-wait-ms', type=float, default=500, help="Flush after the oldest record waited this long (default: 500)")
+    parser.add_argument('--poll-interval-ms', type=float, default=200, help="Sleep between polls when idle (default: 200)")
+    parser.add_argument('--report-interval', type=float, default=10, help="Seconds between stats lines (default: 10)")
+    parser.add_argument('--keep-columns', default='', help="Comma-separated input columns to copy to the output")
+    parser.add_argument('--once', action='store_true', help="Drain the sources and exit instead of tailing")
+    parser.add_argument('--models-dir', default='models')
+    args = parser.parse_args(argv)
+
+    models_data = load_models(args.models_dir)
+    if models_data is None:
+        print("Failed to load models", file=sys.stderr)
+        return 1
+
+    model_names = MODEL_NAMES if args.model == 'all' else [args.model]
+    scorer = StreamScorer(
+        args.source, args.output, models_data, model_names,
+        checkpoint_path=args.checkpoint,
+        max_batch_rows=args.max_batch_rows,
+        max_wait=args.max_wait_ms / 1000.0,
+        keep_columns=[col for col in args.keep_columns.split(',') if col],
+        log=lambda msg: print(msg, file=sys.stderr),
+    )
+    try:
+        stats = scorer.run(args.poll_interval_ms / 1000.0, once=args.once, report_interval=args.report_interval)
+    except KeyboardInterrupt:
+        stats = scorer.stats()
+    finally:
+        scorer.close()
+
+    print(json.dumps(stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Flat-array evaluator for the XGBoost readmission model
+
+The booster's trees are dumped once into contiguous NumPy arrays (feature index,
+threshold, left/right child, default direction, leaf value) and every tree is
+walked in lockstep, one level per step, for all rows at once. This skips the
+sklearn wrapper and DMatrix construction that dominate single-row latency.
+"""
+
+import json
+
+import numpy as np
+
+
+def _parse_base_score(value):
+    # Stored as "5E-1" by older versions and "[5E-1]" by newer ones
+    return float(str(value).strip('[]'))
+
+
+class TreeEnsemble:
+    """Binary-logistic gradient-boosted trees evaluated with vectorized traversal"""
+
+    def __init__(self, feature, threshold, left, right, default_left, value, roots, base_margin, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.default_left = default_left
+        self.value = value
+        self.roots = roots
+        self.base_margin = base_margin
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """Compile an XGBClassifier or Booster with a binary:logistic objective"""
+
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        learner = json.loads(booster.save_raw('json'))['learner']
+
+        objective = learner['objective']['name']
+        if objective != 'binary:logistic':
+            raise ValueError(f"Unsupported objective for tree evaluator: {objective}")
+
+        base_score = _parse_base_score(learner['learner_model_param']['base_score'])
+        base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+        feature, threshold, left, right, default_left, value, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for tree in learner['gradient_booster']['model']['trees']:
+            if any(tree.get('split_type', [])):
+                raise ValueError("Categorical splits are not supported by the tree evaluator")
+
+            lc = np.asarray(tree['left_children'], dtype=np.int64)
+            rc = np.asarray(tree['right_children'], dtype=np.int64)
+            is_leaf = lc == -1
+
+            # Leaves point at themselves so extra traversal steps are no-ops
+            own = np.arange(len(lc), dtype=np.int64)
+            left.append(np.where(is_leaf, own, lc) + offset)
+            right.append(np.where(is_leaf, own, rc) + offset)
+            feature.append(np.where(is_leaf, 0, tree['split_indices']))
+            threshold.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+            default_left.append(np.asarray(tree['default_left'], dtype=bool))
+            value.append(np.where(is_leaf, np.asarray(tree['split_conditions'], dtype=np.float32), 0.0))
+            roots.append(offset)
+
+            depth = np.zeros(len(lc), dtype=np.int64)
+            for node in range(len(lc)):
+                if not is_leaf[node]:
+                    depth[lc[node]] = depth[rc[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+            offset += len(lc)
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float32),
+            left=np.concatenate(left).astype(np.intp),
+            right=np.concatenate(right).astype(np.intp),
+            default_left=np.concatenate(default_left),
+            value=np.concatenate(value).astype(np.float32),
+            roots=np.asarray(roots, dtype=np.intp),
+            base_margin=base_margin,
+            max_depth=max_depth,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def leaf_indices(self, feature_matrix):
+        """Global leaf index reached in every tree, shape (N, n_trees)"""
+
+        # XGBoost compares in float32
+        X = np.ascontiguousarray(feature_matrix, dtype=np.float32)
+        n_rows, n_features = X.shape
+        flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.intp) * n_features)[:, None]
+        has_missing = bool(np.isnan(flat).any())
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+
+        for _ in range(self.max_depth):
+            x = flat.take(row_offset + self.feature.take(nodes))
+            go_left = x < self.threshold.take(nodes)
+            if has_missing:
+                go_left = np.where(np.isnan(x), self.default_left.take(nodes), go_left)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+
+        return nodes
+
+    def predict_margin(self, feature_matrix):
+        leaf_values = self.value[self.leaf_indices(feature_matrix)]
+        return self.base_margin + leaf_values.sum(axis=1, dtype=np.float64)
+
+    def predict_proba(self, feature_matrix):
+        """sklearn-style (N, 2) class probabilities"""
+        p = 1.0 / (1.0 + np.exp(-self.predict_margin(feature_matrix)))
+        return np.column_stack([1.0 - p, p])
@@ -0,0 +1,365 @@
+"""
+Re-tune decision thresholds, risk bands and calibration on labeled outcomes
+
+optimal_threshold and the 0.3 / 0.6 risk band cut-offs were set once at
+training time. This command scores a labeled encounter file with the current
+models and holds out a seeded, stratified share of the rows (--holdout, 0.3 by
+default). Per model, it fits a calibration map (see utils.calibration) on the
+raw probabilities of the remaining rows and, from their calibrated
+probabilities, chooses:
+
+    - the F1-optimal threshold and the threshold with the lowest
+      cost_fp * FP + cost_fn * FN
+    - risk band cut-offs, kept as they are or set so each band gets the
+      requested share of patients
+
+Everything reported is measured on the held-out rows: Brier scores, the full
+ROC and precision-recall curves with every distinct score as a threshold,
+ROC-AUC, average precision, each chosen threshold's precision / recall / cost
+and the outcome rate per band. Every curve comes from one sort of the scores
+plus cumulative sums.
+
+The result is published as a new release (see model_loader.resolve_artifacts):
+unchanged artifacts are hard-linked into <models_dir>/releases/<name>, the
+tuned metadata is written next to them, the bundle is re-exported when one is
+being served, and manifest.json is replaced last. A ModelWatcher then swaps
+the new version in without a restart. Point the manifest back to roll back.
+
+Usage:
+    python -m utils.tuning outcomes.csv --label readmitted --positive '<30' --calibration isotonic
+    python -m utils.tuning outcomes.parquet --objective cost --cost-fn 5 --band-shares 0.6,0.3,0.1 --dry-run
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .batch_score import MODEL_NAMES, read_chunks
+from .bundle import BUNDLE_FILE, export_bundle
+from .calibration import CALIBRATION_METHODS, calibrate, fit_calibration
+from .cohort import threshold_curve, threshold_sweep
+from .model_loader import MANIFEST_FILE, MODEL_FILES, load_models, open_bundle, resolve_artifacts, source_digests
+from .preprocessor import preprocess_batch
+from .predictor import RISK_LEVELS, RISK_THRESHOLDS, assign_risk, predict_probabilities
+
+# Release directories created by publish_release, relative to models_dir
+RELEASES_DIR = 'releases'
+DEFAULT_LABEL = 'readmitted_30days'
+OBJECTIVES = ('f1', 'cost')
+DEFAULT_HOLDOUT = 0.3
+
+
+def outcome_labels(column, positive=None):
+    """
+    Boolean outcomes and a missing mask for a label column
+
+    With positive, rows equal to it (as text) are positive, e.g. '<30' for the
+    UCI 'readmitted' column. Without it the column must be numeric or boolean
+    and non-zero is positive.
+    """
+    missing = column.isna().to_numpy()
+    if positive is not None:
+        return (column.astype(str) == str(positive)).to_numpy(), missing
+    values = pd.to_numeric(column, errors='coerce')
+    if (values.isna().to_numpy() & ~missing).any():
+        raise ValueError(f"Label column '{column.name}' is not numeric; pass the positive value")
+    return values.fillna(0).to_numpy() != 0, missing
+
+
+def score_labeled(models_data, input_path, model_names, label=DEFAULT_LABEL, positive=None, chunk_size=50000):
+    """
+    Raw (uncalibrated) probabilities of every model for a labeled file, read in chunks
+
+    Returns:
+        Tuple of ({model name: probabilities}, labels, rows skipped for a missing label)
+    """
+    probabilities = {name: [] for name in model_names}
+    labels = []
+    skipped = 0
+    for chunk in read_chunks(input_path, chunk_size):
+        if label not in chunk.columns:
+            raise ValueError(f"No '{label}' column in {input_path}")
+        outcome, missing = outcome_labels(chunk[label], positive)
+        if missing.any():
+            chunk = chunk[~missing]
+            skipped += int(missing.sum())
+        feature_matrix = preprocess_batch(chunk, models_data['preprocessing'])
+        for name in model_names:
+            probabilities[name].append(predict_probabilities(models_data[name]['model'], feature_matrix, name))
+        labels.append(outcome[~missing])
+
+    return (
+        {name: np.concatenate(parts) if parts else np.empty(0) for name, parts in probabilities.items()},
+        np.concatenate(labels).astype(bool) if labels else np.empty(0, dtype=bool),
+        skipped,
+    )
+
+
+def holdout_split(labels, fraction=DEFAULT_HOLDOUT, seed=0):
+    """Boolean mask of held-out rows: a seeded random fraction of the positives and of the negatives"""
+    if not 0 < fraction < 1:
+        raise ValueError(f"Holdout fraction must be between 0 and 1, got {fraction}")
+    labels = np.asarray(labels).astype(bool)
+    rng = np.random.default_rng(seed)
+    held_out = np.zeros(len(labels), dtype=bool)
+    for rows in (np.flatnonzero(labels), np.flatnonzero(~labels)):
+        held_out[rng.choice(rows, int(round(fraction * len(rows))), replace=False)] = True
+    return held_out
+
+
+def curve_summary(curve):
+    """ROC-AUC (trapezoidal) and average precision (step-wise) of a threshold_curve"""
+    fpr = np.concatenate([[0.0], curve['fpr'].to_numpy()])
+    tpr = np.concatenate([[0.0], curve['recall'].to_numpy()])
+    recall_gain = np.diff(tpr)
+    return {
+        'roc_auc': float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+        'average_precision': float(np.sum(recall_gain * curve['precision'].to_numpy())),
+    }
+
+
+def _operating_point(curve, i, cost_fp, cost_fn):
+    row = curve.iloc[i]
+    return {
+        'threshold': float(row['threshold']),
+        'flagged': int(row['flagged']),
+        'precision': float(row['precision']),
+        'recall': float(row['recall']),
+        'f1': float(row['f1']),
+        'cost': float(cost_fp * row['fp'] + cost_fn * row['fn']),
+    }
+
+
+def optimal_thresholds(curve, cost_fp=1.0, cost_fn=1.0):
+    """Operating points with the highest F1 and the lowest cost_fp * FP + cost_fn * FN"""
+    cost = cost_fp * curve['fp'].to_numpy() + cost_fn * curve['fn'].to_numpy()
+    return {
+        'f1': _operating_point(curve, int(np.argmax(curve['f1'].to_numpy())), cost_fp, cost_fn),
+        'cost': _operating_point(curve, int(np.argmin(cost)), cost_fp, cost_fn),
+    }
+
+
+def band_cutoffs(probability, shares):
+    """Risk band cut-offs giving each band (Low, Medium, High) its share of the patients"""
+    shares = np.asarray(shares, dtype=np.float64)
+    if len(shares) != len(RISK_LEVELS) or np.any(shares < 0):
+        raise ValueError(f"Expected {len(RISK_LEVELS)} non-negative band shares, got {shares.tolist()}")
+    return np.quantile(probability, np.cumsum(shares / shares.sum())[:-1]).tolist()
+
+
+def band_report(probability, labels, thresholds):
+    """Patients and observed outcome rate per risk band"""
+    risk = assign_risk(probability, thresholds)
+    patients = np.bincount(risk, minlength=len(RISK_LEVELS))
+    observed = np.bincount(risk, weights=labels.astype(np.float64), minlength=len(RISK_LEVELS))
+    return {
+        level: {'patients': int(n), 'observed_rate': float(o / n) if n else None}
+        for level, n, o in zip(RISK_LEVELS.tolist(), patients, observed)
+    }
+
+
+def tune_model(probability, labels, metadata, calibration='platt', objective='f1', cost_fp=1.0, cost_fn=1.0,
+               band_shares=None, holdout=DEFAULT_HOLDOUT, seed=0):
+    """
+    Calibration, threshold and band cut-offs for one model from its raw probabilities
+
+    The calibration map, threshold and band cut-offs are fitted on the rows
+    outside holdout_split(labels, holdout, seed); the report's metrics, the
+    optima's precision / recall / F1 / cost and the band rates are measured on
+    the held-out rows.
+
+    Returns:
+        Tuple of (updated metadata, report, threshold_curve of the held-out calibrated probabilities)
+    """
+    held_out = holdout_split(labels, holdout, seed)
+    for part in (labels[~held_out], labels[held_out]):
+        if len(part) == 0 or part.all() or not part.any():
+            raise ValueError("Tuning needs both positive and negative outcomes in the fitted and held-out rows")
+
+    fit_probability, fit_labels = probability[~held_out], labels[~held_out]
+    calibration_map = fit_calibration(fit_probability, fit_labels, calibration) if calibration is not None else None
+    calibrated = calibrate(probability, calibration_map) if calibration_map is not None else probability
+
+    fitted = optimal_thresholds(threshold_curve(calibrated[~held_out], fit_labels), cost_fp, cost_fn)
+    previous_bands = metadata.get('risk_thresholds', RISK_THRESHOLDS.tolist())
+    if band_shares is not None:
+        risk_thresholds = band_cutoffs(calibrated[~held_out], band_shares)
+    else:
+        risk_thresholds = list(previous_bands)
+
+    # Evaluated on the held-out rows, at the thresholds chosen on the fitted ones
+    test_probability, test_calibrated, test_labels = probability[held_out], calibrated[held_out], labels[held_out]
+    curve = threshold_curve(test_calibrated, test_labels)
+    points = threshold_sweep(test_calibrated, test_labels, [fitted[key]['threshold'] for key in OBJECTIVES])
+    optima = {key: _operating_point(points, i, cost_fp, cost_fn) for i, key in enumerate(OBJECTIVES)}
+
+    report = {
+        'rows': int(len(labels)),
+        'positives': int(labels.sum()),
+        'holdout_rows': int(held_out.sum()),
+        'holdout_positives': int(test_labels.sum()),
+        'calibration': calibration,
+        'brier': {
+            'raw': float(np.mean((test_probability - test_labels) ** 2)),
+            'calibrated': float(np.mean((test_calibrated - test_labels) ** 2)),
+        },
+        **curve_summary(curve),
+        'optima': optima,
+        'optimal_threshold': {'previous': metadata.get('optimal_threshold'),
+                              'new': optima[objective]['threshold']},
+        'risk_thresholds': {'previous': list(previous_bands), 'new': risk_thresholds},
+        'bands': band_report(test_calibrated, test_labels, risk_thresholds),
+    }
+
+    updated = dict(metadata)
+    updated['optimal_threshold'] = optima[objective]['threshold']
+    updated['risk_thresholds'] = risk_thresholds
+    if calibration_map is not None:
+        updated['calibration'] = calibration_map
+    else:
+        updated.pop('calibration', None)
+    updated['tuning'] = {
+        'tuned_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'rows': report['rows'],
+        'positives': report['positives'],
+        'holdout': holdout,
+        'holdout_rows': report['holdout_rows'],
+        'seed': seed,
+        'calibration': calibration,
+        'objective': objective,
+        'cost_fp': cost_fp,
+        'cost_fn': cost_fn,
+        'roc_auc': report['roc_auc'],
+        'average_precision': report['average_precision'],
+        'previous_threshold': metadata.get('optimal_threshold'),
+    }
+    return updated, report, curve
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def publish_release(models_dir, metadata, release=None, use_bundle=True):
+    """
+    Write updated model metadata as a new release and point manifest.json at it
+
+    Args:
+        models_dir: Models directory served by load_models / ModelWatcher
+        metadata: Model name -> full updated metadata dict
+        release: Release name (default: tuned-<timestamp>)
+        use_bundle: Re-export the bundle when the current artifacts include one
+
+    Returns:
+        The new release directory
+    """
+    artifact_dir, _ = resolve_artifacts(models_dir)
+    release = release or time.strftime('tuned-%Y%m%d-%H%M%S')
+    release_path = os.path.join(RELEASES_DIR, release)
+    release_dir = os.path.join(models_dir, release_path)
+    os.makedirs(release_dir)
+
+    unchanged = ['preprocessing_pipeline.pkl', 'model_comparison.json']
+    for name, (candidates, metadata_file) in MODEL_FILES.items():
+        unchanged += candidates
+        if name not in metadata:
+            unchanged.append(metadata_file)
+    for filename in unchanged:
+        source = os.path.join(artifact_dir, filename)
+        if os.path.exists(source):
+            _link_or_copy(source, os.path.join(release_dir, filename))
+
+    for name, model_metadata in metadata.items():
+        with open(os.path.join(release_dir, MODEL_FILES[name][1]), 'w') as f:
+            json.dump(model_metadata, f, indent=4)
+
+    bundle_path = os.path.join(artifact_dir, BUNDLE_FILE)
+    if use_bundle and os.path.exists(bundle_path):
+        # The bundle embeds every model's metadata, so it is rebuilt with the new one
+        registry = open_bundle(bundle_path)
+        models_data = {'preprocessing': registry['preprocessing'], 'comparison': registry['comparison']}
+        for name in MODEL_FILES:
+            entry = registry[name]
+            models_data[name] = {**entry, 'metadata': metadata.get(name, entry['metadata'])}
+        export_bundle(models_data, os.path.join(release_dir, BUNDLE_FILE), source_digests(release_dir))
+
+    # Replaced last and atomically: pollers see either the old release or the complete new one
+    manifest_path = os.path.join(models_dir, MANIFEST_FILE)
+    tmp_path = f"{manifest_path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': release, 'path': release_path}, f)
+    os.replace(tmp_path, manifest_path)
+    return release_dir
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-tune thresholds, risk bands and calibration on labeled outcomes")
+    parser.add_argument('input', help="Labeled encounters (.csv or .parquet, user_input keys plus the label)")
+    parser.add_argument('--label', default=DEFAULT_LABEL, help=f"Outcome column (default: {DEFAULT_LABEL})")
+    parser.add_argument('--positive', default=None,
+                        help="Label value that counts as readmitted, e.g. '<30' (default: non-zero)")
+    parser.add_argument('--model', choices=MODEL_NAMES + ['all'], default='all')
+    parser.add_argument('--calibration', choices=CALIBRATION_METHODS + ('none',), default='platt')
+    parser.add_argument('--objective', choices=OBJECTIVES, default='f1',
+                        help="Which optimum becomes optimal_threshold (default: f1)")
+    parser.add_argument('--cost-fp', type=float, default=1.0, help="Cost of flagging a patient who is not readmitted")
+    parser.add_argument('--cost-fn', type=float, default=1.0, help="Cost of missing a readmission")
+    parser.add_argument('--band-shares', default=None,
+                        help="Low,Medium,High shares of patients for new band cut-offs (default: keep cut-offs)")
+    parser.add_argument('--holdout', type=float, default=DEFAULT_HOLDOUT,
+                        help=f"Share of rows held out to report on, not fitted (default: {DEFAULT_HOLDOUT})")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the holdout split (default: 0)")
+    parser.add_argument('--curves-dir', default=None,
+                        help="Write each model's held-out threshold curve as CSV here")
+    parser.add_argument('--release', default=None, help="Release name (default: tuned-<timestamp>)")
+    parser.add_argument('--dry-run', action='store_true', help="Report only; do not publish a release")
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--models-dir', default='models')
+    args = parser.parse_args(argv)
+
+    model_names = MODEL_NAMES if args.model == 'all' else [args.model]
+    calibration = None if args.calibration == 'none' else args.calibration
+    band_shares = [float(s) for s in args.band_shares.split(',')] if args.band_shares else None
+
+    models_data = load_models(args.models_dir)
+    if models_data is None:
+        print(f"Failed to load models from {args.models_dir}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    probabilities, labels, skipped = score_labeled(
+        models_data, args.input, model_names, args.label, args.positive, args.chunk_size
+    )
+    print(f"Scored {len(labels):,} labeled rows in {time.perf_counter() - start:.2f}s"
+          + (f" ({skipped:,} without a label skipped)" if skipped else ""), file=sys.stderr)
+
+    metadata = {}
+    report = {}
+    for name in model_names:
+        metadata[name], report[name], curve = tune_model(
+            probabilities[name], labels, models_data[name]['metadata'], calibration,
+            args.objective, args.cost_fp, args.cost_fn, band_shares, args.holdout, args.seed,
+        )
+        if args.curves_dir:
+            os.makedirs(args.curves_dir, exist_ok=True)
+            curve.to_csv(os.path.join(args.curves_dir, f'{name}_threshold_curve.csv'), index=False)
+    print(json.dumps(report, indent=2))
+
+    if not args.dry_run:
+        release_dir = publish_release(args.models_dir, metadata, args.release)
+        print(f"Published {release_dir}; {os.path.join(args.models_dir, MANIFEST_FILE)} now points to it",
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())